@@ -0,0 +1,131 @@
+"""Import time of the dbt plugin and each of its commands, cold and warm
+
+palm imports the plugin on every invocation, and `palm --help` imports every
+command module. Each measurement runs `python -X importtime` in a fresh process
+that loads the plugin and one command module the way palm does. Cold runs start
+with an empty bytecode cache, for the standard library too, warm runs with a
+populated one:
+
+    python benchmarks/cli_startup.py --repeat 5
+    python benchmarks/cli_startup.py --budget-ms 400
+
+With --budget-ms, exits 1 when the warm import time of the plugin and any one
+command exceeds the budget, or when slow modules that are only needed by a few
+commands are imported at startup.
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Slow to import, only a few commands need them
+LAZY_MODULES = ('pkg_resources', 'semver', 'sqlparse')
+HELP = 'help'
+PLUGIN = 'plugin'
+
+
+def command_names() -> List[str]:
+    spec = importlib.util.find_spec('palm.plugins.dbt')
+    commands_dir = Path(spec.origin).parent / 'commands'
+    return sorted(path.stem[len('cmd_') :] for path in commands_dir.glob('cmd_*.py'))
+
+
+def import_code(command: str) -> str:
+    """What palm imports to run a command, or every command for HELP"""
+    if command == PLUGIN:
+        commands = []
+    elif command == HELP:
+        commands = command_names()
+    else:
+        commands = [command]
+    return (
+        "import importlib.util\n"
+        "import palm.plugins.dbt as plugin\n"
+        f"for name in {commands!r}:\n"
+        "    spec = plugin.Plugin.get_command(name)\n"
+        "    spec.loader.exec_module(importlib.util.module_from_spec(spec))\n"
+    )
+
+
+def measure(command: str, pycache: Path) -> Tuple[float, Dict[str, float]]:
+    """Total import time in ms, and the cumulative ms of each imported module"""
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if key not in ('PYTHONDONTWRITEBYTECODE', 'PYTHONPYCACHEPREFIX')
+    }
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-X', f'pycache_prefix={pycache}']
+        + ['-c', import_code(command)],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    modules = {}
+    total = 0.0
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split(':', 1)[1].split('|')
+        modules[name.strip()] = int(cumulative_us) / 1000
+        # Nested imports are indented, the top-level ones add up to the total
+        if len(name) - len(name.lstrip()) == 1:
+            total += int(cumulative_us) / 1000
+    return total, modules
+
+
+def benchmark(command: str, repeat: int) -> Tuple[float, float, Dict[str, float]]:
+    """Median cold and warm import time of a command"""
+    cold = []
+    warm = []
+    modules = {}
+    with tempfile.TemporaryDirectory() as warm_cache:
+        measure(command, Path(warm_cache))
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as cold_cache:
+                cold.append(measure(command, Path(cold_cache))[0])
+            total, modules = measure(command, Path(warm_cache))
+            warm.append(total)
+    return statistics.median(cold), statistics.median(warm), modules
+
+
+def slowest(modules: Dict[str, float], count: int = 3) -> str:
+    own = {name: ms for name, ms in modules.items() if name.startswith('palm')}
+    top = sorted(own.items(), key=lambda item: -item[1])[:count]
+    return ", ".join(f"{name} {ms:.0f}" for name, ms in top)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--command", action='append', help="Only these commands")
+    parser.add_argument("--budget-ms", type=float)
+    args = parser.parse_args(argv)
+
+    failures = []
+    print(f"{'command':<16} {'cold ms':>8} {'warm ms':>8}  slowest palm modules (ms)")
+    for command in args.command or [PLUGIN, HELP] + command_names():
+        cold, warm, modules = benchmark(command, args.repeat)
+        print(f"{command:<16} {cold:>8.0f} {warm:>8.0f}  {slowest(modules)}")
+        if args.budget_ms is None:
+            continue
+        if command != HELP and warm > args.budget_ms:
+            failures.append(f"{command} takes {warm:.0f} ms to import")
+        if command in (PLUGIN, HELP):
+            for module in LAZY_MODULES:
+                if module in modules:
+                    failures.append(f"{module} is imported by `palm {command}`")
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Image rebuild time after a one-line model change, before and after layering
+
+Generates a small dbt project with the Dockerfile `palm containerize` generated
+before and after the layered template, builds each image once to warm the
+cache, appends a line to a model and times the rebuild. Requires docker with
+BuildKit and network access to pull the dbt-core image and the requirements:
+
+    python benchmarks/docker_build.py --dbt-version 1.3.1
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from jinja2 import Template
+
+TEMPLATES_DIR = Path(__file__).parents[1] / 'palm/plugins/dbt/templates/containerize'
+# The template before layering: the project was copied before installing anything
+UNLAYERED_DOCKERFILE = """FROM ghcr.io/dbt-labs/dbt-core:{{dbt_version}}
+COPY . /app/
+WORKDIR /app
+ENV PYTHONPATH=${PYTHONPATH}:${PWD}
+
+RUN ./scripts/entrypoint.sh
+RUN dbt clean && dbt deps
+
+ENTRYPOINT [ "" ]
+"""
+TEMPLATE_FILES = {
+    'entrypoint.sh.txt': 'scripts/entrypoint.sh',
+    'dbt_deps.sh.txt': 'scripts/dbt_deps.sh',
+    'dockerignore.txt': '.dockerignore',
+}
+
+
+def write_project(
+    project_dir: Path, dockerfile: str, replacements: dict, requirements: str
+) -> None:
+    (project_dir / 'models').mkdir(parents=True)
+    (project_dir / 'dbt_project.yml').write_text(
+        "name: bench\nversion: '1.0'\nprofile: bench\nconfig-version: 2\n"
+    )
+    (project_dir / 'packages.yml').write_text(
+        "packages:\n  - package: dbt-labs/dbt_utils\n    version: [\">=0.8.0\"]\n"
+    )
+    (project_dir / 'requirements.txt').write_text(requirements.replace(',', '\n'))
+    for i in range(200):
+        (project_dir / 'models' / f"model_{i}.sql").write_text(f"select {i} as id\n")
+
+    (project_dir / 'Dockerfile').write_text(Template(dockerfile).render(replacements))
+    for template, target in TEMPLATE_FILES.items():
+        path = project_dir / target
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            Template((TEMPLATES_DIR / template).read_text()).render(replacements)
+        )
+    (project_dir / 'scripts' / 'entrypoint.sh').chmod(0o755)
+
+
+def build(project_dir: Path, tag: str) -> float:
+    started = time.perf_counter()
+    subprocess.run(
+        ['docker', 'build', '-q', '-t', tag, str(project_dir)],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        env={**os.environ, 'DOCKER_BUILDKIT': '1'},
+    )
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dbt-version", default="1.3.1")
+    parser.add_argument(
+        "--requirements",
+        default="sqlfluff,pandas",
+        help="Comma separated requirements.txt entries",
+    )
+    args = parser.parse_args()
+
+    replacements = {
+        'dbt_version': args.dbt_version,
+        'package_manager': 'pip3',
+        'packages_dir': 'dbt_packages',
+        'slim': False,
+    }
+    dockerfiles = {
+        'unlayered': UNLAYERED_DOCKERFILE,
+        'layered': (TEMPLATES_DIR / 'Dockerfile.txt').read_text(),
+    }
+    print(f"{'Dockerfile':<12} {'cold (s)':>9} {'rebuild (s)':>12}")
+    for name, dockerfile in dockerfiles.items():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            project_dir = Path(tmp_dir)
+            write_project(project_dir, dockerfile, replacements, args.requirements)
+            tag = f"palm-build-benchmark-{name}"
+            cold_seconds = build(project_dir, tag)
+            with (project_dir / 'models' / 'model_0.sql').open('a') as model:
+                model.write("-- one line change\n")
+            rebuild_seconds = build(project_dir, tag)
+            subprocess.run(['docker', 'rmi', '-f', tag], stdout=subprocess.DEVNULL)
+        print(f"{name:<12} {cold_seconds:>9.1f} {rebuild_seconds:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Peak memory and load time of manifest.json loading strategies
+
+Generates a synthetic manifest and loads it in a fresh process per strategy:
+
+    python benchmarks/manifest_loading.py --nodes 10000
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+STRATEGIES = ('json_load', 'parse_manifest')
+
+
+def synthetic_manifest(node_count: int) -> dict:
+    """A manifest shaped like a real one: compiled SQL, columns and macros"""
+    nodes = {}
+    for i in range(node_count):
+        unique_id = f"model.proj.model_{i}"
+        parents = [f"model.proj.model_{j}" for j in (i // 2, i // 3) if j < i]
+        nodes[unique_id] = {
+            'unique_id': unique_id,
+            'resource_type': 'model',
+            'package_name': 'proj',
+            'name': f"model_{i}",
+            'fqn': ['proj', f"folder_{i % 50}", f"model_{i}"],
+            'original_file_path': f"models/folder_{i % 50}/model_{i}.sql",
+            'tags': ['nightly'] if i % 3 else ['hourly'],
+            'config': {'materialized': 'table' if i % 5 else 'view'},
+            'checksum': {'name': 'sha256', 'checksum': f"{i:064x}"},
+            'depends_on': {'nodes': parents, 'macros': ['macro.proj.helper']},
+            'raw_code': "select * from {{ ref('x') }}\n" * 40,
+            'compiled_code': "select * from analytics.x\n" * 40,
+            'columns': {
+                f"column_{c}": {'name': f"column_{c}", 'description': 'x' * 80}
+                for c in range(20)
+            },
+        }
+    parent_map = {u: n['depends_on']['nodes'] for u, n in nodes.items()}
+    child_map = {u: [] for u in nodes}
+    for unique_id, parents in parent_map.items():
+        for parent in parents:
+            child_map[parent].append(unique_id)
+    return {
+        'metadata': {'dbt_version': '1.5.2', 'project_name': 'proj'},
+        'nodes': nodes,
+        'sources': {},
+        'macros': {
+            f"macro.proj.macro_{i}": {'macro_sql': '{% macro m() %}{% endmacro %}' * 20}
+            for i in range(node_count // 2)
+        },
+        'docs': {},
+        'parent_map': parent_map,
+        'child_map': child_map,
+    }
+
+
+def load(strategy: str, manifest_path: Path) -> None:
+    """Runs in the child process, prints its timings as JSON"""
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if strategy == 'json_load':
+        with manifest_path.open() as manifest_file:
+            manifest = json.load(manifest_file)
+        node_count = len(manifest['nodes'])
+    else:
+        from palm.plugins.dbt.parsers import parse_manifest
+
+        node_count = len(parse_manifest(manifest_path).nodes)
+    seconds = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(
+        json.dumps(
+            {
+                'strategy': strategy,
+                'nodes': node_count,
+                'seconds': seconds,
+                'peak_rss_mb': peak_kb / 1024,
+                'added_rss_mb': (peak_kb - baseline_kb) / 1024,
+            }
+        )
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--load", choices=STRATEGIES, help=argparse.SUPPRESS)
+    parser.add_argument("--manifest", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--generate", action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load:
+        load(args.load, args.manifest)
+        return
+    if args.generate:
+        args.manifest.write_text(json.dumps(synthetic_manifest(args.nodes)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manifest_path = Path(tmp_dir, 'manifest.json')
+        # Generated in a child process, ru_maxrss of this process carries over
+        # to the processes it starts
+        subprocess.run(
+            [sys.executable, __file__, '--generate', '--nodes', str(args.nodes)]
+            + ['--manifest', str(manifest_path)],
+            check=True,
+        )
+        size_mb = manifest_path.stat().st_size / 1024 / 1024
+        print(f"Synthetic manifest: {args.nodes} nodes, {size_mb:.1f} MB")
+        print(f"{'strategy':<16} {'seconds':>8} {'peak RSS':>10} {'added RSS':>10}")
+        for strategy in STRATEGIES:
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    '--load',
+                    strategy,
+                    '--manifest',
+                    str(manifest_path),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output)
+            print(
+                f"{result['strategy']:<16} {result['seconds']:>8.2f} "
+                f"{result['peak_rss_mb']:>8.0f}MB {result['added_rss_mb']:>8.0f}MB"
+            )
+
+
+if __name__ == '__main__':
+    main()
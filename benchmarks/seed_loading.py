@@ -0,0 +1,112 @@
+"""Rows/sec of dbt seed style batched inserts vs. palm's bulk seed path
+
+Loads a synthetic seed into an in-memory DuckDB, as a local stand-in for the
+warehouse. Requires duckdb, pyarrow is used for the bulk path when installed:
+
+    python benchmarks/seed_loading.py --rows 100000
+"""
+import argparse
+import csv
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+from jinja2 import Environment
+
+from palm.plugins.dbt.bulk_seeds import convert_seed
+
+MACRO_PATH = (
+    Path(__file__).parents[1] / 'palm/plugins/dbt/macros/palm_bulk_load_seeds.sql'
+)
+# dbt seed inserts rows in batches, bounded by the number of bind parameters
+BATCH_SIZE = 1000
+
+
+def write_seed(path: Path, rows: int) -> None:
+    with path.open('w', newline='') as seed_file:
+        writer = csv.writer(seed_file)
+        writer.writerow(['id', 'customer', 'amount', 'created_at'])
+        for i in range(rows):
+            writer.writerow([i, f"customer_{i % 997}", i * 0.25, '2023-11-20'])
+
+
+def insert_path(connection, seed_path: Path) -> None:
+    """What dbt seed does: read the CSV, then one multi-row insert per batch"""
+    with seed_path.open(newline='') as seed_file:
+        reader = csv.reader(seed_file)
+        columns = next(reader)
+        connection.execute(
+            f"create table inserted ({', '.join(f'{c} varchar' for c in columns)})"
+        )
+        row_placeholders = f"({', '.join('?' for _ in columns)})"
+        batch = []
+        for row in reader:
+            batch.append(row)
+            if len(batch) == BATCH_SIZE:
+                _insert_batch(connection, batch, row_placeholders)
+                batch = []
+        if batch:
+            _insert_batch(connection, batch, row_placeholders)
+
+
+def _insert_batch(connection, batch, row_placeholders: str) -> None:
+    values = ', '.join(row_placeholders for _ in batch)
+    bindings = [value for row in batch for value in row]
+    connection.execute(f"insert into inserted values {values}", bindings)
+
+
+def bulk_path(connection, seed_path: Path, output_dir: Path) -> str:
+    """palm seed --bulk: convert, then the duckdb variant of the bulk copy macro"""
+    macros = (
+        Environment(extensions=['jinja2.ext.do'])
+        .from_string(MACRO_PATH.read_text())
+        .make_module()
+    )
+    output_path, file_format = convert_seed(seed_path, output_dir)
+    connection.execute(
+        str(
+            macros.duckdb__palm_bulk_copy_sql(
+                'bulk', output_path.as_posix(), file_format
+            )
+        )
+    )
+    return file_format
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        seed_path = Path(tmp_dir, 'seed.csv')
+        write_seed(seed_path, args.rows)
+        size_mb = seed_path.stat().st_size / 1024 / 1024
+        print(f"Synthetic seed: {args.rows} rows, {size_mb:.1f} MB")
+
+        connection = duckdb.connect()
+        started = time.perf_counter()
+        insert_path(connection, seed_path)
+        insert_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        file_format = bulk_path(connection, seed_path, Path(tmp_dir, 'bulk'))
+        bulk_seconds = time.perf_counter() - started
+
+        for table in ('inserted', 'bulk'):
+            count = connection.execute(f"select count(*) from {table}").fetchone()[0]
+            assert count == args.rows, f"{table} has {count} rows"
+
+        print(f"{'path':<24} {'seconds':>8} {'rows/sec':>12}")
+        print(
+            f"{'batched inserts':<24} {insert_seconds:>8.2f} {args.rows / insert_seconds:>12,.0f}"
+        )
+        print(
+            f"{f'bulk copy ({file_format})':<24} {bulk_seconds:>8.2f} "
+            f"{args.rows / bulk_seconds:>12,.0f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,40 @@
-from palm.plugins.dbt.dbt_plugin import DbtPlugin
-from .dbt_palm_utils import *
-from .sql_to_dbt import *
-from .local_user_lookup import *
+from importlib import import_module
 from pathlib import Path
-import yaml
+from palm.plugins.dbt.dbt_plugin import DbtPlugin
+
+# Not lazy: importing the submodule, which other modules do, would set this
+# name to the submodule. It only imports os.
+from palm.plugins.dbt.local_user_lookup import local_user_lookup
 
 Plugin = DbtPlugin
+
+# Helpers re-exported from their modules, which are only imported when one of
+# them is used: palm imports this package on every invocation
+_LAZY_EXPORTS = {
+    'yaml': 'yaml',
+    'dbt_env_vars': 'palm.plugins.dbt.dbt_palm_utils',
+    'palm_cache_dir': 'palm.plugins.dbt.dbt_palm_utils',
+    'to_schema_name': 'palm.plugins.dbt.dbt_palm_utils',
+    'create_dbt_sql_file': 'palm.plugins.dbt.sql_to_dbt',
+    'create_ref_files': 'palm.plugins.dbt.sql_to_dbt',
+    'get_ref_file': 'palm.plugins.dbt.sql_to_dbt',
+    'get_replacements': 'palm.plugins.dbt.sql_to_dbt',
+    'get_replacements_for_file': 'palm.plugins.dbt.sql_to_dbt',
+    'lower_repl': 'palm.plugins.dbt.sql_to_dbt',
+    'return_regex': 'palm.plugins.dbt.sql_to_dbt',
+    'sql_to_md': 'palm.plugins.dbt.sql_to_dbt',
+    'sql_to_yml': 'palm.plugins.dbt.sql_to_dbt',
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = import_module(_LAZY_EXPORTS[name])
+    value = module if module.__name__ == name else getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
@@ -0,0 +1,205 @@
+import click
+import json
+import shlex
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from palm.plugins.dbt.dbt_executor import run_dbt
+from palm.plugins.dbt.dbt_palm_utils import (
+    MAX_COMMAND_BYTES,
+    MAX_SELECTION_BYTES,
+    compile_args,
+    selection_bytes,
+    skip_selection,
+)
+from palm.plugins.dbt.manifest_index import load_manifest_index
+from palm.plugins.dbt.parallel import resolve_selection
+from palm.plugins.dbt.parsers import parse_manifest
+from palm.plugins.dbt.partitioning import selected_parents
+from palm.plugins.dbt.run_hooks import MANIFEST_FILE, local_artifact_path
+from palm.plugins.dbt.schema_state import SCHEMA_ENV_VAR, SchemaState, model_fingerprint
+
+""" Skips rebuilding models whose compiled SQL, config and upstream models are unchanged """
+
+# Logged by the palm_missing_relations macro, followed by the missing unique_ids
+MISSING_RELATIONS_MARKER = "PALM_MISSING_RELATIONS:"
+DEVELOPMENT_ENV = 'DEVELOPMENT'
+
+
+def chunk_selectors(selectors: Sequence[str], max_bytes: int) -> List[List[str]]:
+    """Split selectors into chunks of at most max_bytes on a command line"""
+    chunks: List[List[str]] = []
+    size = 0
+    for selector in selectors:
+        length = len(selector.encode()) + 4  # quotes, comma and space in JSON
+        if not chunks or size + length > max_bytes:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(selector)
+        size += length
+    return chunks
+
+
+class BuildCacheSelection(NamedTuple):
+    """The selected models, split by whether they need to be rebuilt"""
+
+    # Selectors of the models that are skipped
+    unchanged: List[str]
+    # Selectors of the models that are rebuilt, ephemeral models aren't built
+    rebuilt: List[str]
+
+    def run_selection(
+        self, select: Sequence[str], exclude: Sequence[str]
+    ) -> Tuple[List[str], List[str]]:
+        """--select and --exclude arguments that skip the unchanged models"""
+        return skip_selection(select, exclude, self.unchanged, self.rebuilt)
+
+
+class MissingRelations:
+    """Collects the PALM_MISSING_RELATIONS line logged by palm_missing_relations"""
+
+    def __init__(self):
+        self.missing: Optional[set] = None
+
+    def __call__(self, line: str) -> None:
+        if MISSING_RELATIONS_MARKER in line:
+            # Logged once per chunk of checked models
+            missing = line.split(MISSING_RELATIONS_MARKER, 1)[1].split()
+            self.missing = (self.missing or set()).union(missing)
+
+
+def skip_unchanged_models(
+    environment, env_vars: Dict, select: Sequence[str], exclude: Sequence[str]
+) -> BuildCacheSelection:
+    """Find the selected models that don't need to be rebuilt in the branch schema
+
+    A model is unchanged when its fingerprint, see model_fingerprint, matches
+    the one recorded when palm last built it in the branch schema and its
+    relation still exists. Models with a recorded fingerprint are compiled and
+    checked for their relation in one invocation. A model is rebuilt when any
+    selected model upstream of it is rebuilt.
+
+    Only used in development, it needs the local manifest to resolve the
+    selection and dbt >= 1.5 for the compiled SQL in run_results.json; without
+    them every model is rebuilt. So is every model when the selection skipping
+    the unchanged ones is longer than MAX_SELECTION_BYTES.
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        env_vars (Dict): The dbt env vars, with the branch schema
+        select (Sequence[str]): --select arguments
+        exclude (Sequence[str]): --exclude arguments
+
+    Returns:
+        BuildCacheSelection: Selectors of the unchanged and rebuilt models, both
+            empty when the cache isn't used
+    """
+    plugin_config = environment.plugin_config('dbt')
+    if (
+        env_vars.get('PALM_DBT_ENV') != DEVELOPMENT_ENV
+        or not local_artifact_path(environment, MANIFEST_FILE)
+        or not plugin_config.is_dbt_version_greater_than("1.5.0", or_equal=True)
+    ):
+        return BuildCacheSelection([], [])
+    try:
+        index, selected = resolve_selection(
+            environment, env_vars, select, exclude, ['model'], parallel=False
+        )
+    except click.UsageError:
+        return BuildCacheSelection([], [])
+
+    state = SchemaState(env_vars[SCHEMA_ENV_VAR])
+    candidates = [
+        i
+        for i in selected
+        if index.unique_ids[i] in state.fingerprints
+        and index.materializations[i] != 'ephemeral'
+    ]
+    if not candidates:
+        return BuildCacheSelection([], [])
+
+    unique_ids = [index.unique_ids[i] for i in candidates]
+    relations = MissingRelations()
+    # Each --args is a single argument, it can't be moved into a script
+    checks = [
+        "dbt run-operation palm_missing_relations "
+        f"--args {shlex.quote(json.dumps({'unique_ids': chunk}))}"
+        for chunk in chunk_selectors(unique_ids, MAX_COMMAND_BYTES)
+    ]
+    compile_cmd = " ".join(
+        [
+            "dbt compile",
+            *compile_args([index.label(i) for i in candidates], select, exclude),
+        ]
+    )
+    cmd = " && ".join([compile_cmd, *checks])
+    success, msg = run_dbt(environment, cmd, env_vars, on_line=relations)
+    if not success or relations.missing is None:
+        click.secho(f"{msg}\nCheck failed, rebuilding every model", fg="yellow")
+        return BuildCacheSelection([], [])
+
+    # The compiled manifest has the current checksums of seeds and other parents
+    manifest_path = local_artifact_path(environment, MANIFEST_FILE)
+    manifest = parse_manifest(manifest_path)
+    selected_ids = [index.unique_ids[i] for i in selected]
+    index = load_manifest_index(manifest_path)
+    positions = {unique_id: i for i, unique_id in enumerate(index.unique_ids)}
+    selected = [positions[u] for u in selected_ids if u in positions]
+    unchanged = set()
+    for unique_id in unique_ids:
+        i = positions.get(unique_id)
+        node = manifest.nodes.get(unique_id)
+        if i is None or not node or not node.compiled_checksum:
+            continue
+        if unique_id in relations.missing:
+            continue
+        fingerprint = model_fingerprint(
+            index, i, node.compiled_checksum, state.fingerprints
+        )
+        if fingerprint == state.fingerprints[unique_id]:
+            unchanged.add(i)
+
+    parents = selected_parents(index, selected)
+    # Ephemeral models aren't built, their SQL is in their children's
+    built_parents = {
+        i: [p for p in parents[i] if index.materializations[p] != 'ephemeral']
+        for i in selected
+    }
+    # An unchanged model is skipped when its parents are. The walk uses a
+    # stack, chains of models can be deeper than Python's recursion limit
+    skipped: Dict[int, bool] = {}
+    for root in selected:
+        stack = [(root, False)]
+        while stack:
+            i, parents_done = stack.pop()
+            if parents_done:
+                skipped[i] = all(skipped[p] for p in built_parents[i])
+            elif i not in skipped:
+                if i not in unchanged:
+                    skipped[i] = False
+                    continue
+                stack.append((i, True))
+                stack.extend((p, False) for p in built_parents[i] if p not in skipped)
+
+    result = BuildCacheSelection(
+        [index.label(i) for i in selected if skipped[i]],
+        [
+            index.label(i)
+            for i in selected
+            if not skipped[i] and index.materializations[i] != 'ephemeral'
+        ],
+    )
+    run_select, run_exclude = result.run_selection(select, exclude)
+    if selection_bytes(run_select + run_exclude) > MAX_SELECTION_BYTES:
+        click.secho(
+            f"Build cache: {len(result.unchanged)} unchanged models are too many "
+            "to skip in one command, rebuilding every model",
+            fg="yellow",
+        )
+        return BuildCacheSelection([], [])
+    click.secho(
+        f"Build cache: {len(result.unchanged)} of {len(selected_ids)} models are "
+        f"unchanged since they were built in {env_vars[SCHEMA_ENV_VAR]}, "
+        "skipping them",
+        fg="cyan",
+    )
+    return result
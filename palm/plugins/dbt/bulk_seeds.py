@@ -0,0 +1,107 @@
+import click
+import gzip
+import json
+import os
+import shlex
+import shutil
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Tuple
+
+from palm.plugins.dbt.dbt_palm_utils import palm_cache_dir
+from palm.plugins.dbt.seed_cache import FULL_SEED_CMD
+
+""" Loads large seeds with the warehouse's bulk copy instead of dbt's inserts """
+
+BULK_SEEDS_DIR = "bulk_seeds"
+DEFAULT_BULK_THRESHOLD_MB = 10.0
+# The project is mounted here in the container, Snowflake's PUT needs absolute paths
+CONTAINER_PROJECT_DIR = PurePosixPath("/app")
+
+
+def convert_seed(csv_path: Path, output_dir: Path) -> Tuple[Path, str]:
+    """Convert a seed CSV to a compressed file for bulk loading
+
+    Seeds are converted to parquet when pyarrow is installed, gzipped CSV
+    otherwise. The conversion is skipped when the output is newer than the CSV.
+
+    Args:
+        csv_path (Path): The seed CSV
+        output_dir (Path): Where to write the converted file
+
+    Returns:
+        Tuple[Path, str]: The converted file and its format, parquet or csv
+    """
+    try:
+        from pyarrow import csv as pa_csv
+        from pyarrow import parquet
+    except ImportError:
+        pa_csv = None
+
+    file_format = 'parquet' if pa_csv else 'csv'
+    suffix = '.parquet' if pa_csv else '.csv.gz'
+    output_path = output_dir / f"{csv_path.stem}{suffix}"
+    if output_path.exists() and output_path.stat().st_mtime >= csv_path.stat().st_mtime:
+        return output_path, file_format
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if pa_csv:
+        parquet.write_table(
+            pa_csv.read_csv(csv_path), output_path, compression='snappy'
+        )
+    else:
+        with csv_path.open('rb') as source, gzip.open(output_path, 'wb') as target:
+            shutil.copyfileobj(source, target)
+    return output_path, file_format
+
+
+def large_seeds(seeds: Dict[str, Path], threshold_mb: float) -> List[str]:
+    """Names of the seeds too large for dbt seed's batched inserts"""
+    threshold_bytes = threshold_mb * 1024 * 1024
+    return sorted(
+        name for name, path in seeds.items() if path.stat().st_size >= threshold_bytes
+    )
+
+
+def bulk_seed_command(
+    seeds: Dict[str, Path], threshold_mb: float = DEFAULT_BULK_THRESHOLD_MB
+) -> str:
+    """Build the command to bulk load large seeds and dbt seed the rest
+
+    Args:
+        seeds (Dict[str, Path]): Seed name -> CSV path of every seed
+        threshold_mb (float): Seeds of at least this size are bulk loaded
+
+    Returns:
+        str: The command to run in the container
+    """
+    bulk = large_seeds(seeds, threshold_mb)
+    if not bulk:
+        return FULL_SEED_CMD
+
+    output_dir = palm_cache_dir() / BULK_SEEDS_DIR
+    bulk_args = []
+    for name in bulk:
+        output_path, file_format = convert_seed(seeds[name], output_dir)
+        relative_path = Path(os.path.relpath(output_path, Path.cwd())).as_posix()
+        bulk_args.append(
+            {
+                'name': name,
+                'path': str(CONTAINER_PROJECT_DIR / relative_path),
+                'format': file_format,
+            }
+        )
+
+    formats = sorted(set(seed['format'] for seed in bulk_args))
+    click.secho(f"Bulk loading {', '.join(bulk)} as {' and '.join(formats)}", fg="cyan")
+    if 'csv' in formats:
+        click.secho(
+            "Install pyarrow (pip install 'palm-dbt[bulk]') to bulk load parquet",
+            fg="yellow",
+        )
+
+    # JSON is valid YAML for --args
+    return (
+        f"dbt run-operation palm_bulk_load_seeds "
+        f"--args {shlex.quote(json.dumps({'seeds': bulk_args}))} "
+        f"&& {FULL_SEED_CMD} --exclude {' '.join(bulk)}"
+    )
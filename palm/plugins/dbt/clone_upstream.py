@@ -0,0 +1,156 @@
+import click
+import json
+import shlex
+import uuid
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from palm.plugins.dbt.dbt_executor import run_dbt
+from palm.plugins.dbt.manifest_index import ManifestIndex
+from palm.plugins.dbt.parallel import resolve_selection
+from palm.plugins.dbt.parsers import Manifest, parse_manifest
+from palm.plugins.dbt.run_hooks import MANIFEST_FILE
+from palm.plugins.dbt.schema_state import SCHEMA_ENV_VAR, SchemaState
+
+""" Clones the unselected upstream relations of a selection from prod into the branch schema """
+
+# Logged by the palm_clone_upstream macro after each clone, with its unique_id
+CLONED_RELATION_MARKER = "PALM_CLONED_RELATION:"
+CLONED_RESOURCE_TYPES = ('model', 'seed', 'snapshot')
+
+
+class ClonedRelations:
+    """Collects the PALM_CLONED_RELATION lines logged by palm_clone_upstream"""
+
+    def __init__(self):
+        self.cloned: List[str] = []
+
+    def __call__(self, line: str) -> None:
+        if CLONED_RELATION_MARKER in line:
+            self.cloned.extend(line.split(CLONED_RELATION_MARKER, 1)[1].split())
+
+
+def upstream_nodes(index: ManifestIndex, selected: Sequence[int]) -> List[int]:
+    """Unselected models, seeds and snapshots the selected nodes read from
+
+    Ephemeral models are compiled into their children, so the relations they
+    read from are upstream of the selection as well. Sources are read where
+    they are in every environment.
+    """
+    selected_set = set(selected)
+    upstream = set()
+    seen = set()
+    stack = [parent for i in selected for parent in index.parents(i)]
+    while stack:
+        parent = stack.pop()
+        if parent in seen or parent in selected_set:
+            continue
+        seen.add(parent)
+        if index.resource_types[parent] not in CLONED_RESOURCE_TYPES:
+            continue
+        if index.materializations[parent] == 'ephemeral':
+            stack.extend(index.parents(parent))
+        else:
+            upstream.add(parent)
+    return sorted(upstream, key=lambda i: index.unique_ids[i])
+
+
+def clone_upstream_args(
+    index: ManifestIndex, upstream: Sequence[int], prod_manifest: Manifest
+) -> Tuple[List[Dict], List[str]]:
+    """The prod relation of each upstream node, as palm_clone_upstream arguments
+
+    Returns:
+        Tuple[List[Dict], List[str]]: Relations to clone, and the unique_ids of
+            upstream nodes that have no relation in prod
+    """
+    relations = []
+    not_in_prod = []
+    for i in upstream:
+        unique_id = index.unique_ids[i]
+        node = prod_manifest.nodes.get(unique_id)
+        if not node or not node.relation:
+            not_in_prod.append(unique_id)
+            continue
+        database, schema, identifier = node.relation
+        relations.append(
+            {
+                'unique_id': unique_id,
+                'database': database,
+                'schema': schema,
+                'identifier': identifier,
+            }
+        )
+    return relations, not_in_prod
+
+
+def clone_upstream_relations(
+    environment, env_vars: Dict, select: Sequence[str], exclude: Sequence[str]
+) -> Tuple[bool, str]:
+    """Clone the relations the selected models read from prod into the branch schema
+
+    Unselected upstream models, seeds and snapshots are zero-copy cloned, or
+    created as views where the warehouse can't clone, by the palm_clone_upstream
+    macro. Relations that already exist in the branch schema are kept. The prod
+    relations are taken from the manifest in dbt_artifacts_prod.
+
+    Cloned relations are recorded as built from prod, so neither the build
+    cache nor the test cache mistake them for a branch build.
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        env_vars (Dict): The dbt env vars, with the branch schema
+        select (Sequence[str]): --select arguments
+        exclude (Sequence[str]): --exclude arguments
+
+    Returns:
+        Tuple[bool, str]: success, summary message
+    """
+    prod_artifacts = getattr(
+        environment.plugin_config('dbt'), 'dbt_artifacts_prod', None
+    )
+    prod_manifest_path = Path(prod_artifacts or '', MANIFEST_FILE)
+    if not prod_artifacts or not prod_manifest_path.exists():
+        raise click.ClickException(
+            "--clone-upstream requires a manifest.json in dbt_artifacts_prod"
+        )
+
+    index, selected = resolve_selection(
+        environment, env_vars, select, exclude, ['model'], parallel=False
+    )
+    upstream = upstream_nodes(index, selected)
+    if not upstream:
+        return True, "Nothing upstream of the selection to clone"
+
+    relations, not_in_prod = clone_upstream_args(
+        index, upstream, parse_manifest(prod_manifest_path)
+    )
+    if not_in_prod:
+        click.secho(
+            "Not in prod, build these in the branch schema if they are missing: "
+            + " ".join(not_in_prod),
+            fg="yellow",
+        )
+    if not relations:
+        return True, "None of the upstream relations are in prod"
+
+    collector = ClonedRelations()
+    cmd = (
+        "dbt run-operation palm_clone_upstream "
+        f"--args {shlex.quote(json.dumps({'relations': relations}))}"
+    )
+    success, msg = run_dbt(environment, cmd, env_vars, on_line=collector)
+    if collector.cloned and SCHEMA_ENV_VAR in env_vars:
+        build_id = f"clone:{uuid.uuid4()}"
+        SchemaState(env_vars[SCHEMA_ENV_VAR]).record(
+            {unique_id: build_id for unique_id in collector.cloned},
+            {},
+            {},
+            forget=collector.cloned,
+        )
+    if not success:
+        return False, msg
+    return True, (
+        f"Cloned {len(collector.cloned)} of {len(relations)} upstream relations "
+        "from prod, the others already exist in the branch schema or not in prod"
+    )
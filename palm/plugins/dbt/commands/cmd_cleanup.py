@@ -2,18 +2,69 @@ import click
 import subprocess
 from pathlib import Path
 from palm.plugins.dbt.dbt_palm_utils import dbt_env_vars
+from palm.plugins.dbt.dbt_executor import compose_run_args, run_dbt
+from palm.plugins.dbt.dbt_daemon import DbtDaemon
+from palm.plugins.dbt.deps_cache import clean_command, deps_cache_enabled
+from palm.plugins.dbt.parse_state import prune_parse_state_command
+from palm.plugins.dbt.schema_gc import collect_schema_garbage, parse_age
+import sys
 
 
 @click.command("cleanup")
+@click.option(
+    "--gc",
+    is_flag=True,
+    help="Drop the schemas of merged and stale branches of every user instead",
+)
+@click.option(
+    "--older-than",
+    default="14d",
+    show_default=True,
+    help="With --gc, schemas unchanged for this long are stale, e.g. 12h, 14d, 2w",
+)
+@click.option("--dry-run", is_flag=True, help="With --gc, only list the schemas")
+@click.option("--yes", "-y", is_flag=True, help="With --gc, don't ask to confirm")
 @click.pass_context
-def cli(ctx):
-    """Removes any artifacts from Snowflake related to the current branch."""
+def cli(ctx, gc: bool, older_than: str, dry_run: bool, yes: bool):
+    """Removes any artifacts from Snowflake related to the current branch.
+
+    With --gc, drops the branch schemas of merged and stale branches of every
+    user in the TEST database instead, see `palm cleanup --gc --dry-run`.
+    """
+    if gc:
+        success, msg = collect_schema_garbage(
+            ctx.obj,
+            dbt_env_vars(ctx.obj.palm.branch),
+            parse_age(older_than),
+            dry_run=dry_run,
+            yes=yes,
+        )
+        click.secho(msg, fg="green" if success else "red")
+        if not success:
+            sys.exit(1)
+        return
 
     cmd = "dbt run-operation drop_branch_schemas && dbt clean && dbt deps"
+    if deps_cache_enabled():
+        # Cached packages are kept, run_dbt only runs dbt deps if they changed
+        clean = clean_command()
+        cmd = "dbt run-operation drop_branch_schemas"
+        if clean:
+            cmd += f" && {clean}"
     env_vars = dbt_env_vars(ctx.obj.palm.branch)
-    success, msg = ctx.obj.run_in_docker(cmd, env_vars)
+    success, msg = run_dbt(ctx.obj, cmd, env_vars)
     click.secho(msg, fg="green" if success else "red")
 
     click.echo("Remote cleanup complete! Cleaning your local docker env...")
+    DbtDaemon(ctx.obj.palm.image_name, ctx.obj.palm.branch).stop()
+    prune_parse_state(ctx.obj.palm.image_name)
     subprocess.run("docker-compose down", check=True, shell=True, cwd=Path.cwd())
     click.echo("Congratulations, you are squeaky clean!")
+
+
+def prune_parse_state(image_name: str) -> None:
+    """Remove partial parse state that wasn't used recently"""
+    subprocess.run(
+        compose_run_args(image_name, prune_parse_state_command(), {}),
+        capture_output=True,
+    )
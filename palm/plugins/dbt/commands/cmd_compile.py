@@ -1,6 +1,11 @@
 import click
 from typing import Optional, Tuple
 from palm.plugins.dbt.dbt_palm_utils import dbt_env_vars
+from palm.plugins.dbt.dbt_executor import run_dbt
+from palm.plugins.dbt.manifest_index import selection_is_empty
+
+# Resource types dbt compile writes SQL for
+COMPILED_TYPES = ('model', 'test', 'analysis', 'snapshot')
 
 
 @click.command("compile")
@@ -33,5 +38,9 @@ def cli(
         cmd.append('--exclude')
         cmd.extend(exclude)
 
-    success, msg = environment.run_in_docker(" ".join(cmd), env_vars)
+    if selection_is_empty(environment, targets, exclude, selector, COMPILED_TYPES):
+        click.secho("No nodes match the selection, skipping dbt compile", fg="yellow")
+        return
+
+    success, msg = run_dbt(environment, " ".join(cmd), env_vars)
     click.secho(msg, fg="green" if success else "red")
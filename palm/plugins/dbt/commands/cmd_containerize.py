@@ -10,11 +10,16 @@ from palm.plugins.dbt.dbt_containerizer import DbtContainerizer
     multiple=False,
     help="dbt version to use (e.g. 1.0.1)",
 )
+@click.option(
+    "--slim",
+    is_flag=True,
+    help="Build a multi-stage runtime image without build tools",
+)
 @click.pass_context
-def cli(ctx, version: Optional[str]):
+def cli(ctx, version: Optional[str], slim: bool):
     if not version:
         version = click.prompt("Enter dbt version to use", type=str, default="1.0.1")
 
     template_dir = Path(Path(__file__).parents[1], "templates") / "containerize"
-    DbtContainerizer(ctx, template_dir, version).run()
+    DbtContainerizer(ctx, template_dir, version, slim).run()
     click.secho(f"Containerized {ctx.obj.palm.image_name}", fg="green")
@@ -1,9 +1,12 @@
 import click
+import time
 from typing import Optional, Tuple
 from palm.plugins.dbt.dbt_palm_utils import dbt_env_vars
-
-# TODO: Refactor this command to reduce branching logic and simply join a list of
-# commands once, before running. Also use f-strings instead of concat
+from palm.plugins.dbt.dbt_executor import run_dbt
+from palm.plugins.dbt.run_hooks import after_dbt_invocation
+from palm.plugins.dbt.schema_state import record_invocation
+from palm.plugins.dbt.seed_cache import FULL_SEED_CMD, cached_seed_command, record_seeds
+from palm.plugins.dbt.test_cache import skip_cached_tests
 
 
 @click.command("cycle")
@@ -14,50 +17,87 @@ from palm.plugins.dbt.dbt_palm_utils import dbt_env_vars
 @click.option("--models", multiple=True, help="see dbt docs on models flag")
 @click.option("--select", multiple=True, help="see dbt docs on select flag")
 @click.option("--seed", is_flag=True, help="will skip seed full refresh")
+@click.option(
+    "--no-seed-cache",
+    is_flag=True,
+    help="Reload every seed, not just the ones that changed",
+)
+@click.option(
+    "--no-test-cache",
+    is_flag=True,
+    help="Run every test, also the ones that passed against the same inputs",
+)
 @click.pass_context
 def cli(
     ctx,
     count: int,
     persist: bool,
     seed: bool,
+    no_seed_cache: bool,
+    no_test_cache: bool = False,
     models: Optional[Tuple] = tuple(),
     select: Optional[Tuple] = tuple(),
 ):
-    """Consecutive run-test of the dbt repo. `count` is the number of run/test cycles to execute, defaults to 2"""
+    """Consecutive run-test of the dbt repo. `count` is the number of run/test cycles to execute, defaults to 2
+
+    Every run and test is its own dbt invocation, so each gets a timing report
+    and tests that passed against unchanged inputs can be skipped.
+    """
 
     def add_models(command: str) -> str:
         if models:
             command += " --models " + " ".join(models)
         return command
 
-    def add_select(command: str) -> str:
-        if select:
-            command += " --select " + " ".join(select)
-        return command
-
-    def run_test():
-        return " && ".join(
-            (
-                add_models("dbt run"),
-                add_models("dbt test"),
-            )
-            * count
+    def run_step(cmd: str) -> bool:
+        started_at = time.time()
+        success, msg = run_dbt(ctx.obj, cmd, env_vars)
+        click.secho(msg, fg="green" if success else "red")
+        # Report before the next step, every invocation overwrites run_results.json
+        run_results = after_dbt_invocation(
+            ctx.obj, started_at, {'models': models, 'select': select}
         )
+        record_invocation(ctx.obj, env_vars, run_results)
+        return success
 
-    def make_cmd():
-        commands = []
-        if seed:
-            seed_cmd = "dbt seed --full-refresh"
-            commands.append(add_select(seed_cmd))
-
-        commands.append(run_test())
+    env_vars = dbt_env_vars(ctx.obj.palm.branch)
+    seed_cmd, seed_hashes = None, {}
+    if seed and select:
+        # Selected seeds are always reloaded, the cache covers all seeds
+        seed_cmd = f"{FULL_SEED_CMD} --select {' '.join(select)}"
+    elif seed:
+        seed_cmd, seed_hashes = cached_seed_command(env_vars, no_seed_cache)
 
-        if not persist:
-            commands.append("dbt run-operation drop_branch_schemas")
+    success = True
+    for cycle in range(count):
+        run_cmd = add_models("dbt run")
+        if seed_cmd and cycle == 0:
+            run_cmd = f"{seed_cmd} && {run_cmd}"
+        success = run_step(run_cmd)
+        if not success:
+            break
+        if cycle == 0:
+            record_seeds(env_vars, seed_hashes)
 
-        return " && ".join(list(filter(None, commands)))
+        test_cmd = add_models("dbt test")
+        if not no_test_cache:
+            test_cache = skip_cached_tests(ctx.obj, env_vars, models, ())
+            if test_cache.cached and not test_cache.run:
+                click.secho("All selected tests are cached", fg="green")
+                continue
+            if test_cache.cached:
+                test_select, test_exclude = test_cache.test_selection(models, ())
+                test_cmd = "dbt test"
+                if test_select:
+                    test_cmd += " --models " + " ".join(test_select)
+                if test_exclude:
+                    test_cmd += " --exclude " + " ".join(test_exclude)
+        success = run_step(test_cmd)
+        if not success:
+            break
 
-    env_vars = dbt_env_vars(ctx.obj.palm.branch)
-    cmd = make_cmd()
-    success, msg = ctx.obj.run_in_docker(cmd, env_vars)
-    click.secho(msg, fg="green" if success else "red")
+    if success and not persist:
+        success, msg = run_dbt(
+            ctx.obj, "dbt run-operation drop_branch_schemas", env_vars
+        )
+        click.secho(msg, fg="green" if success else "red")
@@ -0,0 +1,50 @@
+import click
+from palm.plugins.dbt.dbt_daemon import DbtDaemon
+
+
+@click.group("dbt-daemon")
+def cli():
+    """Keep a warm dbt container running for the current branch
+
+    While the daemon is running, palm dbt commands are executed in it with
+    `docker exec` instead of starting a new container every time.
+    """
+    pass
+
+
+@cli.command("start")
+@click.pass_obj
+def start(environment):
+    """Start the dbt daemon for the current branch"""
+    success, msg = _daemon(environment).start()
+    click.secho(msg, fg="green" if success else "red")
+
+
+@cli.command("stop")
+@click.pass_obj
+def stop(environment):
+    """Stop the dbt daemon for the current branch"""
+    success, msg = _daemon(environment).stop()
+    click.secho(msg, fg="green" if success else "red")
+
+
+@cli.command("status")
+@click.pass_obj
+def status(environment):
+    """Show the status of the dbt daemon for the current branch"""
+    daemon = _daemon(environment)
+    daemon_status = daemon.status()
+    if not daemon_status or not daemon_status["running"]:
+        click.secho(f"dbt daemon {daemon.container_name} is not running", fg="yellow")
+    elif daemon.is_stale(daemon_status):
+        click.secho(
+            f"dbt daemon {daemon.container_name} is running, but the image or .env "
+            "has changed. It will be recycled on the next command.",
+            fg="yellow",
+        )
+    else:
+        click.secho(f"dbt daemon {daemon.container_name} is running", fg="green")
+
+
+def _daemon(environment) -> DbtDaemon:
+    return DbtDaemon(environment.palm.image_name, environment.palm.branch)
@@ -1,8 +1,14 @@
-from email.policy import default
-from unittest.result import failfast
 import click
+import time
 from typing import Optional, Tuple
 from palm.plugins.dbt.dbt_palm_utils import dbt_env_vars
+from palm.plugins.dbt.dbt_executor import run_dbt
+from palm.plugins.dbt.run_hooks import after_dbt_invocation
+from palm.plugins.dbt.schema_state import record_invocation
+from palm.plugins.dbt.seed_cache import cached_seed_command, record_seeds
+
+# dbt commands that get a timing report after they run
+REPORTED_COMMANDS = ('build', 'run', 'test')
 
 
 @click.command("dbt")
@@ -33,6 +39,11 @@ from palm.plugins.dbt.dbt_palm_utils import dbt_env_vars
     default=False,
     help='Create seeds before running the command.',
 )
+@click.option(
+    "--no-seed-cache",
+    is_flag=True,
+    help="Reload every seed, not just the ones that changed",
+)
 @click.option(
     "--options",
     '-o',
@@ -48,6 +59,7 @@ def cli(
     fail_fast: bool,
     full_refresh: bool,
     seed: bool,
+    no_seed_cache: bool,
     cleanup: bool,
     options,
     args: Tuple,
@@ -68,10 +80,13 @@ def cli(
         click.secho("You must provide a dbt command", fg="red")
         return
 
+    env_vars = dbt_env_vars(ctx.obj.palm.branch)
     cmd = [f'dbt {" ".join(args)}']
 
+    seed_hashes = {}
     if seed:
-        cmd.insert(0, f"dbt seed --full-refresh &&")
+        seed_cmd, seed_hashes = cached_seed_command(env_vars, no_seed_cache)
+        cmd.insert(0, f"{seed_cmd} &&")
     if select:
         cmd.append(f" --select {' '.join(select)}")
     if exclude:
@@ -84,9 +99,20 @@ def cli(
         cmd.append(f" --full-refresh")
     if options:
         cmd.append(f" {options}")
-    if cleanup:
-        cmd.append(" && dbt run-operation drop_branch_schemas")
 
-    env_vars = dbt_env_vars(ctx.obj.palm.branch)
-    success, msg = ctx.obj.run_in_docker(" ".join(cmd), env_vars)
+    started_at = time.time()
+    success, msg = run_dbt(ctx.obj, " ".join(cmd), env_vars)
+    if success:
+        record_seeds(env_vars, seed_hashes)
     click.secho(msg, fg="green" if success else "red")
+    if args[0] in REPORTED_COMMANDS:
+        selection = {'select': select, 'exclude': exclude, 'selector': selector}
+        run_results = after_dbt_invocation(ctx.obj, started_at, selection)
+        record_invocation(ctx.obj, env_vars, run_results)
+
+    # Run separately so the run-operation doesn't overwrite run_results.json
+    if success and cleanup:
+        success, msg = run_dbt(
+            ctx.obj, "dbt run-operation drop_branch_schemas", env_vars
+        )
+        click.secho(msg, fg="green" if success else "red")
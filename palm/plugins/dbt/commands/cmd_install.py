@@ -20,13 +20,41 @@ def cli(ctx):
     flag is provided. Only runs against a TEST database. Drops schemas matching
     the current git branch name.
 
+    palm_drop_schemas - Used by drop_branch_schemas and `palm cleanup --gc` to
+    drop schemas in batches, and list the schemas to garbage collect.
+
+    palm_missing_seeds - Used to find seeds that palm's seed cache skipped, but
+    whose table is missing.
+
+    palm_bulk_load_seeds - Used by `palm seed --bulk` to load large seeds with the
+    warehouse's bulk copy.
+
+    palm_consolidated_tests - Used by `palm test --consolidate` to run a model's
+    not_null, unique and accepted_values tests in a single query.
+
+    palm_missing_relations - Used by the build cache of `palm run` to find
+    unchanged models whose relation is missing.
+
+    palm_clone_upstream - Used by `palm run --clone-upstream` to clone the prod
+    relations upstream of the selection into the branch schema.
+
     """
 
     macro_template_path = Path(Path(__file__).parent.parent, "macros")
     macros_path = Path.cwd() / "macros"
-    macros = ['drop_branch_schemas.sql', 'generate_schema_name.sql']
+    macros = [
+        'drop_branch_schemas.sql',
+        'palm_drop_schemas.sql',
+        'generate_schema_name.sql',
+        'palm_missing_seeds.sql',
+        'palm_bulk_load_seeds.sql',
+        'palm_consolidated_tests.sql',
+        'palm_missing_relations.sql',
+        'palm_clone_upstream.sql',
+    ]
 
-    if macros_are_installed(macros_path, macros):
+    missing_macros = macros_to_install(macros_path, macros)
+    if not missing_macros:
         click.secho("It looks like you already installed palm-dbt macros!", fg="green")
         return
 
@@ -35,18 +63,13 @@ def cli(ctx):
 
     # Note: we are not using ctx.obj.generate for this because generating jinja marcros
     # is not easy nor fun. Simple file copying is preferable!
-    for macro in macros:
+    for macro in missing_macros:
         shutil.copy(Path(macro_template_path, macro), Path(macros_path, macro))
 
     click.secho("Palm dbt macros installed!", fg="green")
 
 
-def macros_are_installed(macros_path: Path, macros: List[str]) -> bool:
-    if not macros_path.exists():
-        return False
-
-    for macro in macros:
-        if Path(macros_path / macro).exists():
-            return True
-
-    return False
+def macros_to_install(macros_path: Path, macros: List[str]) -> List[str]:
+    """Macros not yet installed, macros added in newer palm-dbt versions are
+    installed without overwriting the ones already customized"""
+    return [macro for macro in macros if not Path(macros_path / macro).exists()]
@@ -0,0 +1,90 @@
+import click
+import sys
+from pathlib import Path
+from typing import Optional, Tuple
+from palm.plugins.dbt.manifest_index import (
+    OUTPUT_FORMATS,
+    UnsupportedSelectorError,
+    load_manifest_index,
+    manifest_is_fresh,
+)
+from palm.plugins.dbt.run_hooks import (
+    MANIFEST_FILE,
+    load_run_results,
+    local_artifact_path,
+)
+
+
+@click.command('ls')
+@click.option("--models", "-m", multiple=True, help="See dbt docs on models flag")
+@click.option("--select", "-s", multiple=True, help="See dbt docs on select flag")
+@click.option("--exclude", "-e", multiple=True, help="See dbt docs on exclude flag")
+@click.option(
+    "--resource-type",
+    "resource_types",
+    multiple=True,
+    help="Only list these resource types, e.g. model or test",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Choice(OUTPUT_FORMATS),
+    default='selector',
+    help="How to describe each node",
+)
+@click.option(
+    "--state",
+    type=click.Path(exists=True, file_okay=False),
+    help="Artifacts dir for state: selectors, defaults to the prod artifacts",
+)
+@click.pass_obj
+def cli(
+    environment,
+    output: str,
+    state: Optional[str],
+    models: Optional[Tuple] = tuple(),
+    select: Optional[Tuple] = tuple(),
+    exclude: Optional[Tuple] = tuple(),
+    resource_types: Optional[Tuple] = tuple(),
+):
+    """Lists the nodes a selection resolves to, without running dbt
+
+    Selections are resolved on the host from an index of the local
+    manifest.json, run palm compile to refresh it after changing the project.
+    """
+    manifest_path = local_artifact_path(environment, MANIFEST_FILE)
+    if not manifest_path or not manifest_path.exists():
+        click.secho("No manifest.json found, run palm compile first!", fg="red")
+        sys.exit(1)
+    if not manifest_is_fresh(manifest_path):
+        click.secho(
+            "manifest.json is older than the project files, "
+            "run palm compile to refresh it",
+            fg="yellow",
+            err=True,
+        )
+
+    index = load_manifest_index(manifest_path)
+    state_dir = state or getattr(
+        environment.plugin_config('dbt'), 'dbt_artifacts_prod', None
+    )
+    state_index = None
+    if state_dir and Path(state_dir, MANIFEST_FILE).exists():
+        state_index = load_manifest_index(Path(state_dir, MANIFEST_FILE))
+
+    # --select and --models are interchangeable on dbt >= v1, combine the lists of selections
+    targets = list(set(models + select))
+    try:
+        nodes = index.select(
+            targets,
+            exclude,
+            resource_types,
+            state=state_index,
+            run_results=load_run_results(environment),
+        )
+    except UnsupportedSelectorError as e:
+        click.secho(str(e), fg="red")
+        sys.exit(1)
+
+    for i in nodes:
+        click.echo(index.label(i, output))
@@ -0,0 +1,158 @@
+import click
+from pathlib import Path
+from typing import Optional
+
+from palm.plugins.dbt.dbt_palm_utils import palm_cache_dir
+from palm.plugins.dbt.parsers import parse_manifest, parse_run_results
+from palm.plugins.dbt.perf.critical_path import CriticalPathAnalysis
+from palm.plugins.dbt.perf.history import HISTORY_DB, RunHistory
+from palm.plugins.dbt.perf.report import TimingReport
+from palm.plugins.dbt.run_hooks import (
+    MANIFEST_FILE,
+    local_artifact_path,
+    local_run_results_path,
+)
+
+
+@click.group()
+def cli():
+    """dbt performance tools"""
+    pass
+
+
+@cli.command('report')
+@click.option(
+    "--run-results",
+    type=click.Path(exists=True, dir_okay=False),
+    help="run_results.json to report on, defaults to the local artifacts",
+)
+@click.option("--limit", "-n", type=int, help="Only include the N slowest nodes")
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(['table', 'json', 'csv']),
+    default='table',
+    help="Output format, json and csv require --output",
+)
+@click.option("--output", "-o", type=click.Path(dir_okay=False), help="Export path")
+@click.pass_obj
+def report(
+    environment,
+    run_results: Optional[str],
+    limit: Optional[int],
+    output_format: str,
+    output: Optional[str],
+):
+    """Ranked timing report for the last dbt invocation
+
+    Shows the slowest models and tests, the total thread time vs. wall time and
+    the parallelism dbt achieved.
+    """
+    path = Path(run_results) if run_results else local_run_results_path(environment)
+    if not path or not path.exists():
+        click.secho("No run_results.json found, run dbt first!", fg="red")
+        return
+
+    timing_report = TimingReport(parse_run_results(path))
+    if output_format == 'table':
+        click.echo(timing_report.format_table(limit))
+        return
+
+    if not output:
+        click.secho(f"--output is required for {output_format} reports", fg="red")
+        return
+    if output_format == 'json':
+        timing_report.to_json(Path(output), limit)
+    else:
+        timing_report.to_csv(Path(output), limit)
+    click.secho(f"Timing report written to {output}", fg="green")
+
+
+@cli.command('history')
+@click.option("--model", "-m", help="Show the duration trend of a node")
+@click.option(
+    "--top-regressions",
+    is_flag=True,
+    help="Show the nodes that slowed down the most in their latest run",
+)
+@click.option("--limit", "-n", type=int, default=20, help="Number of rows to show")
+@click.option(
+    "--window",
+    type=int,
+    default=10,
+    help="Number of earlier runs to compare against for --top-regressions",
+)
+def history(model: Optional[str], top_regressions: bool, limit: int, window: int):
+    """Query the local run history
+
+    Every palm run, test, cycle and dbt build is recorded in a local database,
+    use this to find out whether a model got slow gradually or in one change.
+    """
+    if not model and not top_regressions:
+        click.secho("Use --model or --top-regressions", fg="red")
+        return
+
+    with RunHistory(palm_cache_dir() / HISTORY_DB) as run_history:
+        if model:
+            rows = run_history.node_history(model, limit)
+            if not rows:
+                click.secho(f"No history for {model}", fg="yellow")
+            for row in rows:
+                click.echo(
+                    f"{row['generated_at']}  {row['execution_time']:>9.2f}s  "
+                    f"{row['status']:<8}  {row['node_id']}  "
+                    f"({row['branch']}, dbt {row['dbt_version']})"
+                )
+
+        if top_regressions:
+            rows = run_history.top_regressions(limit, window)
+            if not rows:
+                click.secho("No regressions found", fg="green")
+            for row in rows:
+                click.secho(
+                    f"{row['ratio']:>6.2f}x  {row['latest_time']:>9.2f}s  "
+                    f"(avg {row['baseline_time']:.2f}s over {row['baseline_runs']} runs)  "
+                    f"{row['node_id']}",
+                    fg="red" if row['ratio'] >= 2 else "yellow",
+                )
+
+
+@cli.command('critical-path')
+@click.option(
+    "--run-results",
+    type=click.Path(exists=True, dir_okay=False),
+    help="run_results.json to analyse, defaults to the local artifacts",
+)
+@click.option(
+    "--manifest",
+    type=click.Path(exists=True, dir_okay=False),
+    help="manifest.json with the dependency graph, defaults to the local artifacts",
+)
+@click.option("--limit", "-n", type=int, default=10, help="Number of bottlenecks")
+@click.pass_obj
+def critical_path(
+    environment, run_results: Optional[str], manifest: Optional[str], limit: int
+):
+    """Critical path and bottlenecks of the last dbt invocation
+
+    The critical path is the longest chain of dependent nodes, the invocation
+    can't finish faster than it no matter how many threads dbt uses. Slack is
+    how long a node could take longer without delaying the invocation.
+    """
+    run_results_path = (
+        Path(run_results) if run_results else local_run_results_path(environment)
+    )
+    manifest_path = (
+        Path(manifest) if manifest else local_artifact_path(environment, MANIFEST_FILE)
+    )
+    if not run_results_path or not run_results_path.exists():
+        click.secho("No run_results.json found, run dbt first!", fg="red")
+        return
+    if not manifest_path or not manifest_path.exists():
+        click.secho("No manifest.json found, run dbt first!", fg="red")
+        return
+
+    analysis = CriticalPathAnalysis(
+        parse_manifest(manifest_path), parse_run_results(run_results_path)
+    )
+    click.echo(analysis.format_report(limit))
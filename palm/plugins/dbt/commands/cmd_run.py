@@ -1,6 +1,22 @@
 import click
-from typing import Optional, Tuple
+import time
+from typing import List, Optional, Tuple
+from palm.plugins.dbt.build_cache import skip_unchanged_models
+from palm.plugins.dbt.clone_upstream import clone_upstream_relations
 from palm.plugins.dbt.dbt_palm_utils import dbt_env_vars
+from palm.plugins.dbt.dbt_executor import run_dbt
+from palm.plugins.dbt.manifest_index import selection_is_empty
+from palm.plugins.dbt.parallel import expected_durations, resolve_selection, run_stages
+from palm.plugins.dbt.partitioning import plan_split
+from palm.plugins.dbt.run_hooks import (
+    after_dbt_invocation,
+    check_perf_baseline,
+    load_run_results,
+    perf_options,
+    pull_prod_artifacts,
+)
+from palm.plugins.dbt.schema_state import record_invocation
+from palm.plugins.dbt.seed_cache import FULL_SEED_CMD, cached_seed_command, record_seeds
 import sys
 
 
@@ -25,7 +41,29 @@ import sys
     help="Will perform a full refresh on incremental models",
 )
 @click.option("--seed", is_flag=True, help="Run dbt seed before dbt run")
+@click.option(
+    "--no-seed-cache",
+    is_flag=True,
+    help="Reload every seed, not just the ones that changed",
+)
 @click.option("--lightdash", '-ld', is_flag=True, help="Run dbt with lightdash enabled")
+@perf_options
+@click.option(
+    "--split",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Split the selected models over this many parallel dbt containers",
+)
+@click.option(
+    "--no-build-cache",
+    is_flag=True,
+    help="Rebuild every selected model, also the ones that are unchanged",
+)
+@click.option(
+    "--clone-upstream",
+    is_flag=True,
+    help="Clone the unselected upstream relations from prod into the branch schema",
+)
 @click.pass_obj
 def cli(
     environment,
@@ -35,50 +73,108 @@ def cli(
     iterative: bool,
     defer: bool,
     seed: bool,
+    no_seed_cache: bool,
     lightdash: bool,
     models: Optional[Tuple] = tuple(),
     select: Optional[Tuple] = tuple(),
     selector: Optional[Tuple] = tuple(),
     exclude: Optional[Tuple] = tuple(),
     vars: Optional[str] = None,
+    perf_baseline: Optional[str] = None,
+    perf_max_ratio: float = 2.0,
+    perf_max_increase: Optional[float] = None,
+    perf_warn_only: bool = False,
+    split: int = 1,
+    no_build_cache: bool = False,
+    clone_upstream: bool = False,
 ):
     """Runs the dbt repo."""
     stateful = iterative or defer
+    if split > 1 and (iterative or selector):
+        raise click.UsageError("--split can't be used with --iterative or --selector")
+    if clone_upstream and (defer or selector):
+        raise click.UsageError(
+            "--clone-upstream can't be used with --defer or --selector"
+        )
 
     if defer:
-        click.secho("Running 'palm prod-artifacts'...", fg='yellow')
-        exit_code, _, _ = environment.run_on_host("palm prod-artifacts")
-        if exit_code == 2:
-            click.secho(
-                "'palm prod-artifacts' not implemented. Can't use --defer without it!",
-                fg='red',
-            )
-            sys.exit(1)
-        elif exit_code != 0:
-            click.secho(
-                "Something went wrong while pulling the prod artifacts.", fg='red'
-            )
-            sys.exit(1)
+        pull_prod_artifacts(environment, "--defer")
+    elif clone_upstream:
+        pull_prod_artifacts(environment, "--clone-upstream")
 
     env_vars = set_env_vars(environment, stateful, defer)
 
     # --select and --models are interchangeable on dbt >= v1, combine the lists of selections
     targets = list(set(models + select))
 
+    seed_cmd, seed_hashes = (
+        cached_seed_command(env_vars, no_seed_cache) if seed else (None, {})
+    )
+
+    # dbt seed runs regardless of the selection, --defer selects modified models
+    # when there are no targets
+    host_resolvable = not seed and (targets or not defer)
+    if host_resolvable and selection_is_empty(
+        environment, targets, exclude, selector, ['model']
+    ):
+        click.secho("No models match the selection, skipping dbt run", fg="yellow")
+        return
+
+    # A deferred run builds against prod, a full refresh rebuilds on purpose
+    run_targets, run_exclude = targets, exclude
+    if not (no_build_cache or defer or full_refresh or selector or vars):
+        build_cache = skip_unchanged_models(environment, env_vars, targets, exclude)
+        if build_cache.unchanged and not build_cache.rebuilt and not seed:
+            click.secho(
+                "All selected models are unchanged, skipping dbt run", fg="green"
+            )
+            return
+        run_targets, run_exclude = build_cache.run_selection(targets, exclude)
+
+    if clone_upstream:
+        success, msg = clone_upstream_relations(
+            environment, env_vars, run_targets, run_exclude
+        )
+        click.secho(msg, fg="green" if success else "red")
+        if not success:
+            sys.exit(1)
+
     run_cmd = build_run_command(
         # Is there a better way to pass these args in?
         full_refresh=full_refresh,
         seed=seed,
+        seed_cmd=seed_cmd,
         no_fail_fast=(no_fail_fast or iterative),
-        targets=targets,
+        targets=run_targets,
         selector=selector,
-        exclude=exclude,
+        exclude=run_exclude,
         defer=defer,
         vars=vars,
         lightdash=lightdash,
     )
 
-    success, msg = environment.run_in_docker(run_cmd, env_vars)
+    started_at = time.time()
+    if split > 1:
+        success, msg = True, ""
+        if seed:
+            success, msg = run_dbt(environment, seed_cmd, env_vars)
+        if success:
+            success, msg = run_split(
+                environment,
+                split,
+                env_vars,
+                run_targets,
+                run_exclude,
+                full_refresh=full_refresh,
+                no_fail_fast=no_fail_fast,
+                defer=defer,
+                vars=vars,
+                lightdash=lightdash,
+            )
+    else:
+        success, msg = run_dbt(environment, run_cmd, env_vars)
+    if success:
+        record_seeds(env_vars, seed_hashes)
 
     if iterative:
         while not success:
@@ -88,26 +184,47 @@ def cli(
             if not cycle:
                 break
 
+            # The next attempt overwrites run_results.json, keep its builds
+            record_invocation(
+                environment, env_vars, load_run_results(environment, since=started_at)
+            )
             env_vars = set_env_vars(environment, stateful)
             stateful_run_cmd = build_run_command(
                 targets=["result:error", "result:skipped"],
                 seed=False,
                 no_fail_fast=iterative,
             )
-            success, msg = environment.run_in_docker(stateful_run_cmd, env_vars)
+            started_at = time.time()
+            success, msg = run_dbt(environment, stateful_run_cmd, env_vars)
 
     click.secho(msg, fg="green" if success else "red")
+    selection = {'select': targets, 'selector': selector, 'exclude': exclude}
+    run_results = after_dbt_invocation(environment, started_at, selection)
+    record_invocation(environment, env_vars, run_results)
 
     if clean:
-        success, msg = environment.run_in_docker(
-            "dbt run-operation drop_branch_schemas", env_vars
+        success, msg = run_dbt(
+            environment, "dbt run-operation drop_branch_schemas", env_vars
         )
         click.secho(msg, fg="green" if success else "red")
 
+    if perf_baseline:
+        perf_ok = check_perf_baseline(
+            environment,
+            run_results,
+            perf_baseline,
+            perf_max_ratio,
+            perf_max_increase,
+        )
+        if not perf_ok and not perf_warn_only:
+            click.secho("Performance regressions found!", fg="red")
+            sys.exit(1)
+
 
 def build_run_command(
     full_refresh: bool = False,
     seed: bool = True,
+    seed_cmd: Optional[str] = None,
     no_fail_fast: bool = False,
     targets: Optional[list] = None,
     selector: Optional[Tuple] = None,
@@ -120,7 +237,7 @@ def build_run_command(
     full_refresh_option = " --full-refresh" if full_refresh else ""
 
     if seed:
-        cmd.append(f"dbt seed --full-refresh")
+        cmd.append(seed_cmd or FULL_SEED_CMD)
         cmd.append("&&")
 
     if lightdash:
@@ -149,6 +266,67 @@ def build_run_command(
     return " ".join(cmd)
 
 
+def run_split(
+    environment,
+    split: int,
+    env_vars: dict,
+    targets: List[str],
+    exclude: Tuple,
+    **run_options,
+) -> Tuple[bool, str]:
+    """Run the selected models in up to `split` parallel dbt containers
+
+    The selection is resolved on the host from the manifest index and
+    partitioned along the dependency graph, see plan_split. Each partition is
+    a build_run_command selecting its models. The run results of all
+    partitions are merged into the local run_results.json.
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        split (int): Maximum number of parallel containers
+        env_vars (dict): The dbt env vars
+        targets (List[str]): --select arguments
+        exclude (Tuple): --exclude arguments
+        run_options: Passed on to build_run_command
+
+    Returns:
+        Tuple[bool, str]: success, summary message
+    """
+    if run_options.get('defer') and not targets:
+        raise click.UsageError("--split with --defer requires --select")
+
+    index, selected = resolve_selection(
+        environment, env_vars, targets, exclude, ['model']
+    )
+    if not selected:
+        return True, "No models match the selection"
+
+    plan = plan_split(index, selected, split, expected_durations(index, selected))
+    click.secho(
+        f"Split {len(selected)} models into {plan.partition_count} partitions "
+        f"over {len(plan.stages)} stage(s) ({plan.strategy})",
+        fg="cyan",
+    )
+    stages = [
+        [
+            build_run_command(
+                seed=False,
+                targets=[index.label(i) for i in partition],
+                **run_options,
+            )
+            for partition in stage
+        ]
+        for stage in plan.stages
+    ]
+    return run_stages(
+        environment,
+        stages,
+        env_vars,
+        fail_fast=not run_options.get('no_fail_fast'),
+        name="split",
+    )
+
+
 def set_env_vars(environment, stateful: bool, defer: bool = False) -> dict:
     plugin_config = environment.plugin_config('dbt')
     env_vars = dbt_env_vars(environment.palm.branch)
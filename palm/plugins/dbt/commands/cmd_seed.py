@@ -1,6 +1,14 @@
 import click
 from typing import Optional, Tuple
 from palm.plugins.dbt.dbt_palm_utils import dbt_env_vars
+from palm.plugins.dbt.dbt_executor import run_dbt
+from palm.plugins.dbt.bulk_seeds import DEFAULT_BULK_THRESHOLD_MB, bulk_seed_command
+from palm.plugins.dbt.seed_cache import (
+    cached_seed_command,
+    record_seeds,
+    seed_files,
+    seed_hashes,
+)
 
 
 @click.command('seed')
@@ -16,18 +24,67 @@ from palm.plugins.dbt.dbt_palm_utils import dbt_env_vars
     is_flag=True,
     help="Insert seeds instead of recreating the table",
 )
+@click.option(
+    "--no-seed-cache",
+    is_flag=True,
+    help="Reload every seed, not just the ones that changed",
+)
+@click.option(
+    "--bulk",
+    is_flag=True,
+    help="Load large seeds with the warehouse's bulk copy instead of inserts",
+)
+@click.option(
+    "--bulk-threshold",
+    type=float,
+    default=DEFAULT_BULK_THRESHOLD_MB,
+    show_default=True,
+    help="Size in MB from which --bulk loads a seed with the bulk copy",
+)
 @click.pass_obj
 def cli(
     environment,
     clean: bool,
     no_full_refresh: bool,
+    no_seed_cache: bool,
+    bulk: bool,
+    bulk_threshold: float,
     select: Optional[Tuple] = tuple(),
     selector: Optional[Tuple] = tuple(),
     exclude: Optional[Tuple] = tuple(),
 ):
-    """Run dbt seeds"""
+    """Run dbt seeds
+
+    Without a selection only the seeds that changed since they were loaded into
+    the branch schema, or whose table is missing, are reloaded.
 
-    cmd = ['dbt', 'seed']
+    With --bulk every seed is reloaded, large seeds are converted to parquet
+    and loaded with the palm_bulk_load_seeds macro.
+    """
+    env_vars = dbt_env_vars(environment.palm.branch)
+    if bulk:
+        if select or selector or exclude or no_full_refresh:
+            click.secho(
+                "--bulk can't be combined with a selection or --no-full-refresh",
+                fg="red",
+            )
+            return
+        cmd = bulk_seed_command(seed_files(), bulk_threshold)
+        if clean:
+            cmd += ' && dbt run-operation drop_branch_schemas'
+        success, msg = run_dbt(environment, cmd, env_vars)
+        if success and not clean:
+            record_seeds(env_vars, seed_hashes())
+        click.secho(msg, fg="green" if success else "red")
+        return
+
+    hashes = {}
+    cached = not (select or selector or exclude or no_full_refresh)
+    if cached:
+        seed_cmd, hashes = cached_seed_command(env_vars, no_seed_cache)
+        cmd = [seed_cmd]
+    else:
+        cmd = ['dbt', 'seed']
     if select:
         cmd.append('--select')
         cmd.extend(select)
@@ -37,11 +94,13 @@ def cli(
     if exclude:
         cmd.append('--exclude')
         cmd.extend(exclude)
-    if not no_full_refresh:
+    if not no_full_refresh and not cached:
         cmd.append('--full-refresh')
     if clean:
         cmd.append('&& dbt run-operation drop_branch_schemas')
 
-    env_vars = dbt_env_vars(environment.palm.branch)
-    success, msg = environment.run_in_docker(" ".join(cmd), env_vars)
+    success, msg = run_dbt(environment, " ".join(cmd), env_vars)
+    # --clean drops the seeds again
+    if success and not clean:
+        record_seeds(env_vars, hashes)
     click.secho(msg, fg="green" if success else "red")
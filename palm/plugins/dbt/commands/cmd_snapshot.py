@@ -1,6 +1,7 @@
 import click
 from typing import Optional, Tuple
 from palm.plugins.dbt.dbt_palm_utils import dbt_env_vars
+from palm.plugins.dbt.dbt_executor import run_dbt
 
 
 @click.command("snapshot")
@@ -25,11 +26,11 @@ def cli(
         cmd.append('--exclude')
         cmd.extend(exclude)
 
-    success, msg = environment.run_in_docker(" ".join(cmd), env_vars)
+    success, msg = run_dbt(environment, " ".join(cmd), env_vars)
     click.secho(msg, fg="green" if success else "red")
 
     if clean:
-        success, msg = environment.run_in_docker(
-            "dbt run-operation drop_branch_schemas", env_vars
+        success, msg = run_dbt(
+            environment, "dbt run-operation drop_branch_schemas", env_vars
         )
         click.secho(msg, fg="green" if success else "red")
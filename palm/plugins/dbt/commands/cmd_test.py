@@ -1,6 +1,28 @@
 import click
-from typing import Optional, Tuple
+import time
+from typing import List, Optional, Tuple
+from palm.plugins.dbt.consolidated_tests import (
+    ConsolidatedResults,
+    consolidated_test_command,
+    consolidation_plan,
+)
 from palm.plugins.dbt.dbt_palm_utils import dbt_env_vars
+from palm.plugins.dbt.dbt_executor import run_dbt
+from palm.plugins.dbt.manifest_index import selection_is_empty
+from palm.plugins.dbt.parallel import expected_durations, resolve_selection, run_stages
+from palm.plugins.dbt.partitioning import shard_tests
+from palm.plugins.dbt.parsers import parse_manifest
+from palm.plugins.dbt.run_hooks import (
+    MANIFEST_FILE,
+    after_dbt_invocation,
+    check_perf_baseline,
+    local_artifact_path,
+    local_run_results_path,
+    perf_options,
+    pull_prod_artifacts,
+)
+from palm.plugins.dbt.schema_state import record_invocation
+from palm.plugins.dbt.test_cache import skip_cached_tests
 import sys
 
 
@@ -16,6 +38,23 @@ import sys
 @click.option(
     "--no-fail-fast", "-nx", is_flag=True, help="Runs all tests even if one fails"
 )
+@perf_options
+@click.option(
+    "--shards",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Split the selected tests over this many parallel dbt containers",
+)
+@click.option(
+    "--consolidate",
+    is_flag=True,
+    help="Run each model's not_null, unique and accepted_values tests in one query",
+)
+@click.option(
+    "--no-test-cache",
+    is_flag=True,
+    help="Run every selected test, also the ones that passed against the same inputs",
+)
 @click.pass_obj
 def cli(
     environment,
@@ -26,45 +65,219 @@ def cli(
     select: Optional[Tuple] = tuple(),
     selector: Optional[Tuple] = tuple(),
     exclude: Optional[Tuple] = tuple(),
+    perf_baseline: Optional[str] = None,
+    perf_max_ratio: float = 2.0,
+    perf_max_increase: Optional[float] = None,
+    perf_warn_only: bool = False,
+    shards: int = 1,
+    consolidate: bool = False,
+    no_test_cache: bool = False,
 ):
     """Tests the dbt repo"""
+    if shards > 1 and (selector or (defer and not (models or select))):
+        raise click.UsageError(
+            "--shards can't be used with --selector, or --defer without --select"
+        )
+    if consolidate and (shards > 1 or selector or defer):
+        raise click.UsageError(
+            "--consolidate can't be used with --shards, --selector or --defer"
+        )
 
     if defer:
-        click.secho("Running 'palm prod-artifacts'...", fg='yellow')
-        exit_code, _, _ = environment.run_on_host("palm prod-artifacts")
-        if exit_code == 2:
-            click.secho(
-                "'palm prod-artifacts' not implemented. Can't use --defer without it!",
-                fg='red',
-            )
-            sys.exit(1)
-        elif exit_code != 0:
-            click.secho(
-                "Something went wrong while pulling the prod artifacts.", fg='red'
-            )
-            sys.exit(1)
+        pull_prod_artifacts(environment, "--defer")
 
     env_vars = set_env_vars(environment, defer)
 
     # --select and --models are interchangeable on dbt >= v1, combine the lists of selections
     targets = list(set(models + select))
 
+    # --defer selects modified nodes when there are no targets
+    host_resolvable = targets or not defer
+    if host_resolvable and selection_is_empty(
+        environment, targets, exclude, selector, ['test']
+    ):
+        click.secho("No tests match the selection, skipping dbt test", fg="yellow")
+        return
+
+    # Deferred tests may read prod relations, palm doesn't know their builds
+    test_targets, test_exclude = targets, exclude
+    if not (no_test_cache or defer or selector):
+        test_cache = skip_cached_tests(environment, env_vars, targets, exclude)
+        if test_cache.cached and not test_cache.run:
+            click.secho("All selected tests are cached, skipping dbt test", fg="green")
+            return
+        test_targets, test_exclude = test_cache.test_selection(targets, exclude)
+
     run_cmd = build_test_command(
         no_fail_fast=no_fail_fast,
-        targets=targets,
+        targets=test_targets,
         selector=selector,
-        exclude=exclude,
+        exclude=test_exclude,
         defer=defer,
     )
-    success, msg = environment.run_in_docker(run_cmd, env_vars)
+
+    started_at = time.time()
+    if shards > 1:
+        success, msg = run_shards(
+            environment,
+            shards,
+            env_vars,
+            test_targets,
+            test_exclude,
+            no_fail_fast=no_fail_fast,
+            defer=defer,
+        )
+    elif consolidate:
+        success, msg = run_consolidated(
+            environment,
+            env_vars,
+            test_targets,
+            test_exclude,
+            no_fail_fast=no_fail_fast,
+        )
+    else:
+        success, msg = run_dbt(environment, run_cmd, env_vars)
     click.secho(msg, fg="green" if success else "red")
+    selection = {'select': targets, 'selector': selector, 'exclude': exclude}
+    run_results = after_dbt_invocation(environment, started_at, selection)
+    record_invocation(environment, env_vars, run_results)
 
     if clean:
-        success, msg = environment.run_in_docker(
-            "dbt run-operation drop_branch_schemas", env_vars
+        success, msg = run_dbt(
+            environment, "dbt run-operation drop_branch_schemas", env_vars
         )
         click.secho(msg, fg="green" if success else "red")
 
+    if perf_baseline:
+        perf_ok = check_perf_baseline(
+            environment,
+            run_results,
+            perf_baseline,
+            perf_max_ratio,
+            perf_max_increase,
+        )
+        if not perf_ok and not perf_warn_only:
+            click.secho("Performance regressions found!", fg="red")
+            sys.exit(1)
+
+
+def run_shards(
+    environment,
+    shards: int,
+    env_vars: dict,
+    targets: List[str],
+    exclude: Tuple,
+    **test_options,
+) -> Tuple[bool, str]:
+    """Run the selected tests in `shards` parallel dbt containers
+
+    Tests don't depend on each other, the selection is resolved on the host and
+    balanced over the shards by each test's average duration in the run
+    history. Each shard is a build_test_command selecting its tests, with
+    fail-fast a failing shard stops the others.
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        shards (int): Number of parallel containers
+        env_vars (dict): The dbt env vars
+        targets (List[str]): --select arguments
+        exclude (Tuple): --exclude arguments
+        test_options: Passed on to build_test_command
+
+    Returns:
+        Tuple[bool, str]: success, summary message
+    """
+    index, selected = resolve_selection(
+        environment, env_vars, targets, exclude, ['test']
+    )
+    if not selected:
+        return True, "No tests match the selection"
+
+    shard_nodes = shard_tests(
+        index, selected, shards, expected_durations(index, selected)
+    )
+    click.secho(
+        f"Sharded {len(selected)} tests over {len(shard_nodes)} containers",
+        fg="cyan",
+    )
+    commands = [
+        build_test_command(targets=[index.label(i) for i in shard], **test_options)
+        for shard in shard_nodes
+    ]
+    return run_stages(
+        environment,
+        [commands],
+        env_vars,
+        fail_fast=not test_options.get('no_fail_fast'),
+        name="shard",
+    )
+
+
+def run_consolidated(
+    environment,
+    env_vars: dict,
+    targets: List[str],
+    exclude: Tuple,
+    no_fail_fast: bool = False,
+) -> Tuple[bool, str]:
+    """Run the selected tests, consolidating the simple generic tests per model
+
+    dbt runs every test as its own query, each scanning the model. The
+    not_null, unique and accepted_values tests of a model are run by the
+    palm_consolidated_tests macro instead, as one query over the model, and
+    the other selected tests with `dbt test` as usual. The consolidated
+    results are added to the local run_results.json.
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        env_vars (dict): The dbt env vars
+        targets (List[str]): --select arguments
+        exclude (Tuple): --exclude arguments
+        no_fail_fast (bool): Run all tests even if one fails
+
+    Returns:
+        Tuple[bool, str]: success, summary message
+    """
+    index, selected = resolve_selection(
+        environment, env_vars, targets, exclude, ['test'], parallel=False
+    )
+    if not selected:
+        return True, "No tests match the selection"
+
+    manifest = parse_manifest(local_artifact_path(environment, MANIFEST_FILE))
+    test_ids = [index.unique_ids[i] for i in selected]
+    models, rest = consolidation_plan(manifest, test_ids)
+    results = ConsolidatedResults(models)
+    click.secho(
+        f"Consolidating {len(results.tests)} of {len(test_ids)} tests "
+        f"into {len(models)} queries",
+        fg="cyan",
+    )
+
+    commands = []
+    if models:
+        commands.append(consolidated_test_command(models, fail_fast=not no_fail_fast))
+    if rest:
+        positions = {unique_id: i for i, unique_id in zip(selected, test_ids)}
+        commands.append(
+            build_test_command(
+                targets=[index.label(positions[unique_id]) for unique_id in rest],
+                no_fail_fast=no_fail_fast,
+            )
+        )
+    separator = "; " if no_fail_fast else " && "
+
+    started_at = time.time()
+    success, msg = run_dbt(
+        environment, separator.join(commands), env_vars, on_line=results
+    )
+    run_results_path = local_run_results_path(environment)
+    if results.results and run_results_path:
+        results.write(run_results_path, started_at)
+
+    success = success and not results.failed and not results.missing
+    return success, f"{results.summary()}\n{msg}" if models else msg
+
 
 def build_test_command(
     defer: bool = False,
@@ -0,0 +1,200 @@
+import json
+import re
+import shlex
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from palm.plugins.dbt.parsers import Manifest
+from palm.plugins.dbt.run_hooks import MTIME_TOLERANCE
+
+""" Runs a model's column-level generic tests as one query instead of one each """
+
+RESULT_MARKER = "PALM_TEST_RESULT:"
+CONSOLIDATED_TESTS = ('not_null', 'unique', 'accepted_values')
+# Config under which the consolidated query judges a test like dbt does
+DEFAULT_TEST_CONFIG = {
+    'where': None,
+    'limit': None,
+    'fail_calc': 'count(*)',
+    'warn_if': '!= 0',
+    'error_if': '!= 0',
+    'store_failures': None,
+}
+
+_RESULT_PATTERN = re.compile(re.escape(RESULT_MARKER) + r"\s*(?P<result>\{.*\})")
+
+
+def consolidation_plan(
+    manifest: Manifest, test_ids: Sequence[str]
+) -> Tuple[Dict[str, List[Dict]], List[str]]:
+    """Group the consolidatable tests by the model they test
+
+    dbt's own not_null, unique and accepted_values tests on a column are
+    consolidated when their config doesn't change the query or how the
+    failures are judged, and the tested node has a relation. Everything else
+    runs with `dbt test` as usual.
+
+    Args:
+        manifest (Manifest): The parsed manifest
+        test_ids (Sequence[str]): unique_ids of the selected tests
+
+    Returns:
+        Tuple[Dict[str, List[Dict]], List[str]]: model unique_id -> its tests
+            for the palm_consolidated_tests macro, and the other tests
+    """
+    models: Dict[str, List[Dict]] = {}
+    rest = []
+    for test_id in test_ids:
+        node = manifest.nodes.get(test_id)
+        test = _consolidated_test(node) if node else None
+        model = node and (node.attached_node or next(iter(node.depends_on), None))
+        # Ephemeral models have no relation to query
+        if (
+            test is None
+            or model not in manifest.nodes
+            or manifest.nodes[model].materialized == 'ephemeral'
+        ):
+            rest.append(test_id)
+            continue
+        models.setdefault(model, []).append(test)
+    return models, rest
+
+
+def _consolidated_test(node) -> Optional[Dict]:
+    metadata = node.test_metadata or {}
+    kwargs = metadata.get('kwargs') or {}
+    if metadata.get('name') not in CONSOLIDATED_TESTS or metadata.get('namespace'):
+        return None
+    if not kwargs.get('column_name') or len(node.depends_on) != 1:
+        return None
+    config = node.test_config or {}
+    for key, default in DEFAULT_TEST_CONFIG.items():
+        value = config.get(key)
+        if value not in (None, default) and str(value).replace(' ', '') != str(
+            default
+        ).replace(' ', ''):
+            return None
+
+    test = {
+        'unique_id': node.unique_id,
+        'type': metadata['name'],
+        'column': kwargs['column_name'],
+        'severity': (config.get('severity') or 'error').lower(),
+    }
+    if test['type'] == 'accepted_values':
+        if not isinstance(kwargs.get('values'), list):
+            return None
+        test['values'] = kwargs['values']
+        test['quote'] = kwargs.get('quote', True) is not False
+    return test
+
+
+def consolidated_test_command(models: Dict[str, List[Dict]], fail_fast: bool) -> str:
+    """The run-operation that runs the consolidated tests"""
+    args = {
+        'models': [{'model': model, 'tests': tests} for model, tests in models.items()],
+        'fail_fast': fail_fast,
+    }
+    # JSON is valid YAML for --args
+    return f"dbt run-operation palm_consolidated_tests --args {shlex.quote(json.dumps(args))}"
+
+
+class ConsolidatedResults:
+    """Collects the PALM_TEST_RESULT lines logged by palm_consolidated_tests"""
+
+    def __init__(self, models: Dict[str, List[Dict]]):
+        self.tests = {}
+        self.models = {}
+        for model, tests in models.items():
+            for test in tests:
+                self.tests[test['unique_id']] = test
+                self.models[test['unique_id']] = model
+        self.results: Dict[str, Dict] = {}
+
+    def __call__(self, line: str) -> None:
+        match = _RESULT_PATTERN.search(line)
+        if match:
+            result = json.loads(match.group('result'))
+            if result.get('unique_id') in self.tests:
+                self.results[result['unique_id']] = result
+
+    def node_results(self) -> List[Dict]:
+        """run_results.json entries for the tests that ran, like dbt writes them"""
+        node_results = []
+        for unique_id, result in self.results.items():
+            failures = int(result['failures'])
+            severity = self.tests[unique_id]['severity']
+            if not failures:
+                status = 'pass'
+            else:
+                status = 'warn' if severity == 'warn' else 'fail'
+            node_results.append(
+                {
+                    'unique_id': unique_id,
+                    'status': status,
+                    'execution_time': float(result.get('execution_time') or 0.0),
+                    'thread_id': 'palm_consolidated_tests',
+                    'failures': failures,
+                    'message': f"Got {failures} results, configured to "
+                    f"{'warn' if severity == 'warn' else 'fail'} if != 0"
+                    if failures
+                    else None,
+                    'adapter_response': {},
+                    'timing': [],
+                }
+            )
+        return node_results
+
+    @property
+    def failed(self) -> List[str]:
+        return [r['unique_id'] for r in self.node_results() if r['status'] == 'fail']
+
+    @property
+    def missing(self) -> List[str]:
+        """Tests without a result, the macro failed or stopped early"""
+        return sorted(set(self.tests) - set(self.results))
+
+    def summary(self) -> str:
+        statuses = [r['status'] for r in self.node_results()]
+        counts = ' '.join(
+            f"{status.upper()}={statuses.count(status)}"
+            for status in ('pass', 'warn', 'fail')
+        )
+        queries = {self.models[unique_id] for unique_id in self.results}
+        lines = [
+            f"Consolidated {len(statuses)} tests into {len(queries)} queries: {counts}"
+        ]
+        lines.extend(f"  FAIL {unique_id}" for unique_id in self.failed)
+        if self.missing:
+            lines.append(f"  {len(self.missing)} consolidated tests did not run")
+        return "\n".join(lines)
+
+    def write(self, run_results_path: Path, since: float) -> None:
+        """Add the consolidated results to run_results.json
+
+        The results of the remaining `dbt test`, if it wrote run_results.json
+        since `since`, are kept. Like merge_run_results, the artifact gets a
+        new invocation_id so the run history records one run.
+        """
+        artifact = {'metadata': {}, 'args': {'which': 'test'}, 'results': []}
+        if run_results_path.exists():
+            existing = json.loads(run_results_path.read_text())
+            recent = run_results_path.stat().st_mtime >= since - MTIME_TOLERANCE
+            if recent and existing.get('args', {}).get('which') == 'test':
+                artifact = existing
+            else:
+                artifact['metadata'] = existing.get('metadata', {})
+        artifact['metadata'] = {
+            **artifact['metadata'],
+            'invocation_id': str(uuid.uuid4()),
+            'generated_at': datetime.now(timezone.utc)
+            .isoformat()
+            .replace('+00:00', 'Z'),
+        }
+        artifact['elapsed_time'] = time.time() - since
+        artifact['results'] = artifact.get('results', []) + self.node_results()
+        run_results_path.parent.mkdir(parents=True, exist_ok=True)
+        run_results_path.write_text(json.dumps(artifact))
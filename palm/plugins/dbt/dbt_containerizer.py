@@ -3,8 +3,18 @@ from pathlib import Path
 from typing import Optional, Tuple, Dict
 from palm.containerizer import PythonContainerizer
 from palm.palm_exceptions import AbortPalm
+from palm.plugins.dbt.deps_cache import DepsCache
+from palm.plugins.dbt.dbt_version_detection import get_image_env
+from palm.plugins.dbt.parsers import parse_project
 import click
-import yaml
+
+DBT_IMAGE = "ghcr.io/dbt-labs/dbt-core"
+# Set in the slim image when the dbt-core image's ENV can't be read
+SLIM_DEFAULT_ENV = {
+    'LANG': 'C.UTF-8',
+    'PYTHONIOENCODING': 'utf-8',
+    'PATH': '/usr/local/bin:/usr/local/sbin:/usr/sbin:/usr/bin:/sbin:/bin',
+}
 
 
 class DbtContainerizer(PythonContainerizer):
@@ -13,12 +23,17 @@ class DbtContainerizer(PythonContainerizer):
     """
 
     def __init__(
-        self, ctx, template_dir: Path, dbt_version: Optional[str] = '1.0.1'
+        self,
+        ctx,
+        template_dir: Path,
+        dbt_version: Optional[str] = '1.0.1',
+        slim: bool = False,
     ) -> None:
         self.ctx = ctx
         self.project_name = ctx.obj.palm.image_name
         self.template_dir = template_dir
         self.dbt_version = dbt_version
+        self.slim = slim
         self.package_manager = ''
 
     def run(self) -> None:
@@ -40,6 +55,8 @@ class DbtContainerizer(PythonContainerizer):
         if self.profile_host_path:
             self.write_profile_envs()
         super().generate(self.target_dir, self.replacements)
+        # Created before docker does, which would create it owned by root
+        DepsCache()
 
     def validate_dbt_version(self) -> Tuple[bool, str]:
         """Prompts the user for a DBT version.
@@ -95,10 +112,35 @@ class DbtContainerizer(PythonContainerizer):
                 "package_manager": self.package_manager,
                 "dbt_version": self.dbt_version,
                 "packages_dir": self.get_packages_dir(),
+                "slim": self.slim,
             }
         )
+        if self.slim:
+            replacements["runtime_env"] = self.runtime_env()
         return replacements
 
+    def runtime_env(self) -> str:
+        """ENV of the dbt-core image, for the slim image's runtime stage
+
+        The runtime stage is flattened from scratch, which drops the base image's
+        ENV, PYTHON_VERSION included.
+
+        Returns:
+            str: The arguments of the runtime stage's ENV instruction
+        """
+        image = f"{DBT_IMAGE}:{self.dbt_version}"
+        image_env = get_image_env(image)
+        if not image_env:
+            click.secho(
+                f"Could not read the ENV of {image}, the slim image only sets "
+                f"{', '.join(SLIM_DEFAULT_ENV)}",
+                fg="yellow",
+            )
+        env = {**SLIM_DEFAULT_ENV, **image_env}
+        return " \\\n    ".join(
+            f'{name}="{_escape_env_value(value)}"' for name, value in env.items()
+        )
+
     def validate_python_version(self) -> bool:
         """Pass through function - the PythonContainerizer handles this functionality.
 
@@ -129,10 +171,10 @@ class DbtContainerizer(PythonContainerizer):
         return deps_dir
 
     def dbt_project_config(self) -> dict:
-        config_path = Path("dbt_project.yml")
-        if config_path.exists():
-            return yaml.safe_load(config_path.read_text())
-        return {}
+        try:
+            return parse_project(Path("dbt_project.yml")).to_dict()
+        except FileNotFoundError:
+            return {}
 
     @classmethod
     def determine_profile_strategy(cls, project_path: "Path") -> Tuple[str, str]:
@@ -177,3 +219,10 @@ class DbtContainerizer(PythonContainerizer):
                 )
             ]
         )
+
+
+def _escape_env_value(value: str) -> str:
+    """Escape a value for a double quoted Dockerfile ENV value"""
+    for char in ('\\', '"', '$'):
+        value = value.replace(char, f'\\{char}')
+    return value
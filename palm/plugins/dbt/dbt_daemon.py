@@ -0,0 +1,177 @@
+import re
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from palm.utils import run_on_host
+from palm.plugins.dbt.dbt_palm_utils import fit_command_line
+from palm.plugins.dbt.dbt_version_detection import get_image_id
+from palm.plugins.dbt.deps_cache import PACKAGE_FILES
+
+FINGERPRINT_LABEL = "palm.dbt.fingerprint"
+# Generated by `palm containerize`, path is relative to the project root
+SERVER_SCRIPT = "scripts/palm_dbt_server.py"
+
+
+class DbtDaemon:
+    """A warm, long-lived dbt container for a single project and branch.
+
+    Commands are `docker exec`ed into the running container instead of paying
+    for a full container create/start/teardown on every palm command.
+    The container is labelled with a fingerprint of the image ID, the
+    project's .env file and its package files, if any of them change the
+    container is recycled.
+
+    If the project has the palm dbt server script (dbt >= 1.5), the daemon runs
+    it as its main process to keep the parsed manifest hot, and dbt commands
+    are routed through it.
+    """
+
+    def __init__(self, image_name: str, branch: str, project_path: Path = None):
+        self.image_name = image_name
+        self.branch = branch
+        self.project_path = project_path or Path.cwd()
+
+    @property
+    def container_name(self) -> str:
+        name = f"palm_dbt_{self.image_name}_{self.branch}"
+        return re.sub(r"[^0-9a-zA-Z_.-]+", "_", name).strip("_").lower()
+
+    def fingerprint(self) -> str:
+        """Fingerprint of everything baked into the container at start time
+
+        Returns:
+            str: sha256 of the image ID, the .env file contents and the package
+            files, the cached packages dir is mounted when the container starts
+        """
+        digest = hashlib.sha256()
+        digest.update((get_image_id(self.image_name) or "").encode())
+        for name in (".env", *PACKAGE_FILES):
+            path = Path(self.project_path, name)
+            if path.exists():
+                digest.update(path.read_bytes())
+        return digest.hexdigest()
+
+    def status(self) -> Optional[Dict[str, str]]:
+        """Inspect the daemon container
+
+        Returns:
+            Optional[Dict[str, str]]: running state and fingerprint of the
+            container, None if the container does not exist
+        """
+        exit_code, stdout, _ = run_on_host(
+            "docker inspect --format "
+            f"'{{{{.State.Running}}}} {{{{index .Config.Labels \"{FINGERPRINT_LABEL}\"}}}}' "
+            f"{self.container_name}",
+            capture_output=True,
+        )
+        if exit_code != 0:
+            return None
+        running, _, fingerprint = stdout.strip().partition(" ")
+        return {"running": running == "true", "fingerprint": fingerprint}
+
+    def is_running(self) -> bool:
+        status = self.status()
+        return bool(status and status["running"])
+
+    def is_stale(self, status: Optional[Dict[str, str]] = None) -> bool:
+        """True if the image, .env or packages changed since the daemon started
+
+        Args:
+            status (Optional[Dict[str, str]]): The container's status, when the
+                caller already inspected it
+        """
+        status = status or self.status()
+        return bool(status) and status["fingerprint"] != self.fingerprint()
+
+    def start(self) -> Tuple[bool, str]:
+        """Start the daemon container, recycling it if it is stale
+
+        Returns:
+            Tuple[bool, str]: success, message
+        """
+        status = self.status()
+        fingerprint = self.fingerprint()
+        if status and status["running"] and status["fingerprint"] == fingerprint:
+            return (True, f"dbt daemon {self.container_name} is already running")
+
+        return self.recycle(fingerprint, exists=status is not None)
+
+    def recycle(
+        self, fingerprint: Optional[str] = None, exists: bool = True
+    ) -> Tuple[bool, str]:
+        """Replace the daemon container with a new one
+
+        Args:
+            fingerprint (Optional[str]): The current fingerprint, if the caller
+                already computed it
+            exists (bool): False if there is no container to remove
+
+        Returns:
+            Tuple[bool, str]: success, message
+        """
+        if exists:
+            success, msg = self._remove()
+            if not success:
+                return (False, msg)
+        cmd = [
+            "docker compose run -d --rm",
+            f"--name {self.container_name}",
+            f"--label {FINGERPRINT_LABEL}={fingerprint or self.fingerprint()}",
+            self.image_name,
+            # Fall back to an idle container if the server can't run
+            f'/bin/bash -c "python {SERVER_SCRIPT} serve || exec sleep infinity"',
+        ]
+        exit_code, _, stderr = run_on_host(" ".join(cmd), capture_output=True)
+        if exit_code != 0:
+            return (False, f"Failed to start dbt daemon: {stderr}")
+        return (True, f"dbt daemon {self.container_name} started")
+
+    def stop(self) -> Tuple[bool, str]:
+        """Stop and remove the daemon container
+
+        Returns:
+            Tuple[bool, str]: success, message
+        """
+        if self.status() is None:
+            return (True, f"dbt daemon {self.container_name} is not running")
+        return self._remove()
+
+    def _remove(self) -> Tuple[bool, str]:
+        exit_code, _, stderr = run_on_host(
+            f"docker rm -f {self.container_name}", capture_output=True
+        )
+        if exit_code != 0:
+            return (False, f"Failed to stop dbt daemon: {stderr}")
+        return (True, f"dbt daemon {self.container_name} stopped")
+
+    def has_server(self) -> bool:
+        """True if the project has the palm dbt server script"""
+        return Path(self.project_path, SERVER_SCRIPT).exists()
+
+    def exec_args(self, cmd: str, env_vars: Optional[Dict] = None) -> List[str]:
+        """Build the docker exec command for running cmd in the daemon
+
+        When the project has the palm dbt server script, the command is handed
+        to its client, which sends dbt invocations to the server and runs
+        anything else (or everything, if the server is down) as a subprocess.
+        Commands too long for one argument run from a script, see
+        fit_command_line.
+
+        Args:
+            cmd (str): The shell command to run
+            env_vars (Optional[Dict]): Env vars injected for this call only
+
+        Returns:
+            List[str]: docker exec arguments
+        """
+        args = ["docker", "exec"]
+        for key, value in (env_vars or {}).items():
+            args.extend(["-e", f"{key.upper()}={value}"])
+        args.append(self.container_name)
+        cmd = fit_command_line(cmd)
+        if self.has_server():
+            args.extend(["python", SERVER_SCRIPT, "exec", cmd])
+        else:
+            args.extend(["/bin/bash", "-c", cmd])
+        return args
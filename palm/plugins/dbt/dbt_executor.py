@@ -0,0 +1,403 @@
+import re
+import click
+import logging
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from palm.plugins.dbt.dbt_daemon import DbtDaemon
+from palm.plugins.dbt.dbt_palm_utils import fit_command_line
+from palm.plugins.dbt.deps_cache import DepsCache, restore_packages
+from palm.plugins.dbt.parse_state import (
+    PARSE_STATE_MOUNT,
+    ParseMonitor,
+    parse_state_key,
+    parse_state_volume,
+    with_parse_state,
+)
+from palm.plugins.dbt.parsers import parse_project
+from palm.plugins.dbt.run_hooks import RUN_RESULTS_FILE
+from palm.plugins.dbt.schema_state import invalidate_schema_state
+from palm.plugins.dbt.seed_cache import invalidate_seeds
+
+""" Runs dbt commands in docker, streaming their output as it arrives """
+
+# Lines of output kept in memory for the final summary
+TAIL_LINES = 200
+LOG_DIR = "palm_logs"
+LOG_FILE = "palm_dbt.log"
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+DROP_SCHEMAS_OPERATION = "drop_branch_schemas"
+# Parallel commands write their artifacts to <target-path>/palm_parallel/<name>_<n>
+PARALLEL_TARGET_DIR = "palm_parallel"
+TARGET_PATH_ENV_VAR = "DBT_TARGET_PATH"
+
+_ERROR_PATTERN = re.compile(
+    r"\b(ERROR|FAIL|Failure in|Database Error|Compilation Error|Runtime Error)\b"
+)
+_WARN_PATTERN = re.compile(r"\bWARN(ING)?\b")
+_SUCCESS_PATTERN = re.compile(r"\b(OK|PASS|SUCCESS|Completed successfully)\b")
+_DONE_PATTERN = re.compile(r"\bDone\. PASS=\d+ WARN=\d+ ERROR=(\d+)")
+
+
+class StreamResult:
+    """Outcome of a streamed command: exit code and a bounded output tail"""
+
+    def __init__(self, exit_code: int, tail: Deque[str], log_path: Optional[Path]):
+        self.exit_code = exit_code
+        self.tail = tail
+        self.log_path = log_path
+
+    @property
+    def success(self) -> bool:
+        return self.exit_code == 0
+
+    def summary(self) -> str:
+        """Success/failure message, with the errors from the tail on failure"""
+        if self.success:
+            lines = ["Success! Palm completed with exit code 0"]
+        else:
+            lines = [f"Fail! Palm exited with code {self.exit_code}"]
+            lines.extend(line for line in self.tail if line_color(line) == "red")
+        if self.log_path:
+            lines.append(f"Full log: {self.log_path}")
+        return "\n".join(lines)
+
+
+def run_dbt(
+    environment,
+    cmd: str,
+    env_vars: Optional[Dict] = None,
+    on_line: Optional[Callable[[str], None]] = None,
+) -> Tuple[bool, str]:
+    """Run a dbt command in docker, streaming the output live.
+
+    If `palm dbt-daemon start` has been used for this project and branch the
+    command is exec'd into the warm container, recycling it first if the
+    image, .env or package files have changed. Otherwise a new container is
+    run, as usual.
+
+    If the project mounts palm's package cache, the packages installed for the
+    current package files are restored from it, `dbt deps` only runs when they
+    changed. New containers restore dbt's partial parse state from a docker
+    volume and save it again afterwards. Whether partial parsing was used, and how long
+    parsing took, is reported after the command.
+
+    Output is colored line by line as it arrives and written in full to a
+    rotating log file in the local artifacts directory, only a bounded tail
+    is kept in memory for the summary.
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        cmd (str): The command to run
+        env_vars (Optional[Dict]): Env vars to inject for this command
+        on_line (Optional[Callable[[str], None]]): Also called with each line of
+            the command's output
+
+    Returns:
+        Tuple[bool, str]: success, summary message
+    """
+    env_vars = env_vars or {}
+    if DROP_SCHEMAS_OPERATION in cmd:
+        # Even a failed drop may have dropped some tables
+        invalidate_seeds(env_vars)
+        invalidate_schema_state(env_vars)
+
+    plugin_config = environment.plugin_config('dbt')
+    dbt_version = getattr(plugin_config, 'dbt_version', None)
+    # Before the daemon check, its mount of the packages dir is fixed at start
+    deps_key = restore_packages(dbt_version)
+
+    daemon = DbtDaemon(environment.palm.image_name, environment.palm.branch)
+    # Only a docker inspect when no daemon was started, the image and files
+    # are fingerprinted for an existing daemon, once
+    status = daemon.status()
+    if status is not None:
+        fingerprint = daemon.fingerprint()
+        if not status["running"] or status["fingerprint"] != fingerprint:
+            click.secho(
+                "Image, .env or packages changed, recycling dbt daemon...",
+                fg="yellow",
+            )
+            success, msg = daemon.recycle(fingerprint)
+            if not success:
+                click.secho(msg, fg="red")
+                status = None
+
+    log_path = dbt_log_path(environment)
+    if deps_key:
+        if status:
+            deps_args = daemon.exec_args("dbt deps", env_vars)
+        else:
+            deps_args = compose_run_args(
+                environment.palm.image_name, "dbt deps", env_vars
+            )
+        result = install_packages(deps_key, deps_args, log_path)
+        if not result.success:
+            return (result.success, result.summary())
+
+    if status:
+        click.secho(
+            f"Executing command `{cmd}` in {daemon.container_name}...", fg="yellow"
+        )
+        args = daemon.exec_args(cmd, env_vars)
+    else:
+        click.secho(f"Executing command `{cmd}` in compose...", fg="yellow")
+        key = parse_state_key(dbt_version, env_vars)
+        args = compose_run_args(
+            environment.palm.image_name, with_parse_state(cmd, key), env_vars
+        )
+
+    parse_monitor = ParseMonitor()
+
+    def monitor(line: str) -> None:
+        parse_monitor(line)
+        if on_line:
+            on_line(line)
+
+    result = stream_command(args, log_path, header=cmd, on_line=monitor)
+    parse_monitor.report()
+    return (result.success, result.summary())
+
+
+def install_packages(
+    deps_key: str, args: List[str], log_path: Optional[Path]
+) -> "StreamResult":
+    """Run `dbt deps` into the empty package cache, and cache the result
+
+    Args:
+        deps_key (str): The key from restore_packages
+        args (List[str]): The command that runs `dbt deps` in docker
+        log_path (Optional[Path]): Rotating log file for the output
+    """
+    click.secho("dbt packages changed, running `dbt deps`...", fg="yellow")
+    result = stream_command(args, log_path, header="dbt deps")
+    if result.success:
+        DepsCache().mark_installed(deps_key)
+    return result
+
+
+class ParallelRun:
+    """A command run alongside others, with its own dbt target path"""
+
+    def __init__(self, index: int, cmd: str, target_path: str):
+        self.index = index
+        self.cmd = cmd
+        self.target_path = target_path
+        self.result: Optional[StreamResult] = None
+        self.seconds = 0.0
+
+    @property
+    def success(self) -> bool:
+        return bool(self.result and self.result.success)
+
+    @property
+    def run_results_path(self) -> Path:
+        return Path(self.target_path, RUN_RESULTS_FILE)
+
+
+def run_dbt_parallel(
+    environment,
+    commands: List[str],
+    env_vars: Optional[Dict] = None,
+    fail_fast: bool = False,
+    name: str = "split",
+) -> List[ParallelRun]:
+    """Run dbt commands concurrently, each in a new container
+
+    Every command gets its own target path through DBT_TARGET_PATH (dbt >=
+    1.5), so the artifacts of concurrent invocations don't overwrite each
+    other. Output lines are prefixed with the command's name and number, and
+    each command logs to its own file next to the main log.
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        commands (List[str]): The commands to run
+        env_vars (Optional[Dict]): Env vars to inject for every command
+        fail_fast (bool): Stop the other commands as soon as one fails
+        name (str): Names the target paths, logs and output prefixes
+
+    Returns:
+        List[ParallelRun]: One run per command, in the same order
+    """
+    env_vars = env_vars or {}
+    plugin_config = environment.plugin_config('dbt')
+    dbt_version = getattr(plugin_config, 'dbt_version', None)
+    log_path = dbt_log_path(environment)
+    deps_key = restore_packages(dbt_version)
+    if deps_key:
+        args = compose_run_args(environment.palm.image_name, "dbt deps", env_vars)
+        if not install_packages(deps_key, args, log_path).success:
+            raise click.ClickException("dbt deps failed")
+
+    try:
+        project_target = parse_project(Path('dbt_project.yml')).target_path
+    except FileNotFoundError:
+        project_target = "target"
+    key = parse_state_key(dbt_version, env_vars)
+    runs = [
+        ParallelRun(i, cmd, f"{project_target}/{PARALLEL_TARGET_DIR}/{name}_{i}")
+        for i, cmd in enumerate(commands, start=1)
+    ]
+
+    failed = threading.Event()
+    lock = threading.Lock()
+    processes: List[subprocess.Popen] = []
+
+    def track(proc: subprocess.Popen) -> None:
+        with lock:
+            processes.append(proc)
+            if failed.is_set():
+                proc.terminate()
+
+    def run(parallel_run: ParallelRun) -> None:
+        if failed.is_set():
+            return
+        if parallel_run.run_results_path.exists():
+            parallel_run.run_results_path.unlink()
+        args = compose_run_args(
+            environment.palm.image_name,
+            with_parse_state(
+                parallel_run.cmd, key, target_path=parallel_run.target_path
+            ),
+            {**env_vars, TARGET_PATH_ENV_VAR: parallel_run.target_path},
+        )
+        label = f"{name} {parallel_run.index}/{len(runs)}"
+        started = time.monotonic()
+        parallel_run.result = stream_command(
+            args,
+            log_path.with_name(f"palm_dbt_{name}_{parallel_run.index}.log")
+            if log_path
+            else None,
+            header=parallel_run.cmd,
+            prefix=f"[{label}] ",
+            on_start=track,
+        )
+        parallel_run.seconds = time.monotonic() - started
+        if not parallel_run.success and fail_fast:
+            with lock:
+                failed.set()
+                for proc in processes:
+                    if proc.poll() is None:
+                        proc.terminate()
+
+    click.secho(
+        f"Running {len(runs)} dbt commands in parallel containers...", fg="yellow"
+    )
+    with ThreadPoolExecutor(max_workers=max(len(runs), 1)) as pool:
+        list(pool.map(run, runs))
+    return runs
+
+
+def compose_run_args(image_name: str, cmd: str, env_vars: Dict) -> List[str]:
+    """Build the docker compose command to run cmd in a new container
+
+    Unlike palm's run_in_docker, service ports are not published and no TTY is
+    allocated; dbt commands don't serve anything and the output is piped. The
+    partial parse state volume is mounted. Commands too long for one argument
+    run from a script, see fit_command_line.
+    """
+    args = ["docker", "compose", "run", "--rm", "-T"]
+    args.extend(["-v", f"{parse_state_volume(image_name)}:{PARSE_STATE_MOUNT}"])
+    for key, value in env_vars.items():
+        args.extend(["-e", f"{key.upper()}={value}"])
+    args.extend([image_name, "/bin/bash", "-c", fit_command_line(cmd)])
+    return args
+
+
+def stream_command(
+    args: List[str],
+    log_path: Optional[Path] = None,
+    header: Optional[str] = None,
+    on_line: Optional[Callable[[str], None]] = None,
+    prefix: str = "",
+    on_start: Optional[Callable[[subprocess.Popen], None]] = None,
+) -> StreamResult:
+    """Run a command, echoing and logging its output line by line
+
+    Args:
+        args (List[str]): The command to run
+        log_path (Optional[Path]): Rotating log file for the full output
+        header (Optional[str]): Logged before the output, e.g. the dbt command
+        on_line (Optional[Callable[[str], None]]): Called with each line of output
+        prefix (str): Echoed before each line, to tell concurrent commands apart
+        on_start (Optional[Callable[[subprocess.Popen], None]]): Called with the
+            process once it has started, e.g. to terminate it from another thread
+
+    Returns:
+        StreamResult: exit code and the last TAIL_LINES lines of output
+    """
+    logger = _get_logger(log_path)
+    if header:
+        logger.info(f"==== {datetime.now().isoformat(timespec='seconds')} {header}")
+
+    tail = deque(maxlen=TAIL_LINES)
+    with subprocess.Popen(
+        args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+        errors="replace",
+    ) as proc:
+        if on_start:
+            on_start(proc)
+        for line in proc.stdout:
+            line = line.rstrip("\n")
+            click.secho(f"{prefix}{line}", fg=line_color(line))
+            logger.info(line)
+            tail.append(line)
+            if on_line:
+                on_line(line)
+    _close_logger(logger)
+    return StreamResult(proc.returncode, tail, log_path)
+
+
+def line_color(line: str) -> Optional[str]:
+    """Pick a color for a line of dbt output"""
+    done = _DONE_PATTERN.search(line)
+    if done:
+        return "red" if int(done.group(1)) else "green"
+    if _ERROR_PATTERN.search(line):
+        return "red"
+    if _WARN_PATTERN.search(line):
+        return "yellow"
+    if _SUCCESS_PATTERN.search(line):
+        return "green"
+    return None
+
+
+def dbt_log_path(environment) -> Optional[Path]:
+    """Log file location in the local artifacts dir, None if it's not configured"""
+    plugin_config = environment.plugin_config('dbt')
+    artifacts_dir = getattr(plugin_config, 'dbt_artifacts_local', None)
+    if not artifacts_dir:
+        return None
+    return Path(artifacts_dir, LOG_DIR, LOG_FILE)
+
+
+def _get_logger(log_path: Optional[Path]) -> logging.Logger:
+    logger = logging.getLogger(f"palm.plugins.dbt.output.{log_path}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if log_path and not logger.handlers:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+
+def _close_logger(logger: logging.Logger) -> None:
+    for handler in list(logger.handlers):
+        handler.close()
+        logger.removeHandler(handler)
@@ -1,9 +1,20 @@
 import re
-from typing import Dict
+import time
+import hashlib
+from typing import Dict, List, Sequence, Tuple
+from pathlib import Path
 from palm.plugins.dbt.local_user_lookup import local_user_lookup
 
 """ Shared dbt utilities to build out common CLI options """
 
+# Linux caps a single argument, like the command of `bash -c`, at 128KB
+MAX_COMMAND_BYTES = 64 * 1024
+COMMAND_SCRIPTS_DIR = "commands"
+COMMAND_SCRIPT_MAX_AGE = 24 * 60 * 60
+# Long commands run from a script, whose arguments together must stay below
+# the kernel's ARG_MAX (2MB by default). Longer selections don't skip anything.
+MAX_SELECTION_BYTES = 512 * 1024
+
 
 def dbt_env_vars(branch: str) -> Dict:
     return {
@@ -13,7 +24,104 @@ def dbt_env_vars(branch: str) -> Dict:
     }
 
 
+def palm_cache_dir() -> Path:
+    """Local, git-ignored directory for palm-dbt caches.
+
+    Returns:
+        Path: .palm/cache in the current project, created if it does not exist
+    """
+    cache_dir = Path.cwd() / ".palm" / "cache"
+    if not cache_dir.exists():
+        cache_dir.mkdir(parents=True)
+        # Caches are machine specific, they should never be committed
+        Path(cache_dir, ".gitignore").write_text("*\n")
+    return cache_dir
+
+
+def fit_command_line(cmd: str) -> str:
+    """Move a shell command too long for one argument into a script
+
+    Long selections can exceed the kernel's limit on a single argument, the
+    command then runs from a script in the project's palm cache, which is
+    mounted in dbt containers at the same relative path. Scripts older than a
+    day are removed.
+
+    Args:
+        cmd (str): The shell command
+
+    Returns:
+        str: cmd, or a command running the script with it
+    """
+    if len(cmd.encode()) <= MAX_COMMAND_BYTES:
+        return cmd
+    scripts_dir = palm_cache_dir() / COMMAND_SCRIPTS_DIR
+    scripts_dir.mkdir(exist_ok=True)
+    for old in scripts_dir.glob("*.sh"):
+        try:
+            if time.time() - old.stat().st_mtime > COMMAND_SCRIPT_MAX_AGE:
+                old.unlink()
+        except FileNotFoundError:
+            # Removed by a concurrent palm command
+            pass
+    script = scripts_dir / f"{hashlib.sha256(cmd.encode()).hexdigest()[:16]}.sh"
+    script.write_text(cmd + "\n")
+    return f"bash {script.relative_to(Path.cwd()).as_posix()}"
+
+
+def selection_bytes(selectors: Sequence[str]) -> int:
+    """Length of the selectors on a command line"""
+    return sum(len(selector.encode()) + 1 for selector in selectors)
+
+
+def skip_selection(
+    select: Sequence[str],
+    exclude: Sequence[str],
+    skipped: Sequence[str],
+    run: Sequence[str],
+) -> Tuple[List[str], List[str]]:
+    """--select and --exclude arguments that skip some of the selected nodes
+
+    The shorter of excluding the skipped nodes from the selection and selecting
+    the ones that run.
+
+    Args:
+        select (Sequence[str]): --select arguments
+        exclude (Sequence[str]): --exclude arguments
+        skipped (Sequence[str]): Selectors of the selected nodes to skip
+        run (Sequence[str]): Selectors of the other selected nodes
+
+    Returns:
+        Tuple[List[str], List[str]]: --select and --exclude arguments
+    """
+    excluded = (list(select), [*exclude, *skipped])
+    if not skipped or not run:
+        return excluded
+    return min(
+        excluded, (list(run), []), key=lambda args: selection_bytes(args[0] + args[1])
+    )
+
+
+def compile_args(
+    labels: Sequence[str], select: Sequence[str], exclude: Sequence[str]
+) -> List[str]:
+    """dbt compile arguments for the nodes with the given selectors
+
+    When the selectors are too long, the user's selection is compiled instead.
+    It compiles more nodes, but is only as long as what the user typed.
+    """
+    if selection_bytes(labels) <= MAX_SELECTION_BYTES:
+        return ['--select', *labels]
+    return (['--select', *select] if select else []) + (
+        ['--exclude', *exclude] if exclude else []
+    )
+
+
 def _generate_schema_from_branch(branch: str) -> str:
     """Formats the branch name as a schema."""
     user = local_user_lookup()
-    return re.sub(r"[^0-9a-zA-Z]+", "_", f"{user}_{branch}").strip("_").lower()
+    return to_schema_name(f"{user}_{branch}")
+
+
+def to_schema_name(name: str) -> str:
+    """Formats a name the way branch schema names are formatted."""
+    return re.sub(r"[^0-9a-zA-Z]+", "_", name).strip("_").lower()
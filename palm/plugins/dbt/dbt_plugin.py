@@ -1,14 +1,19 @@
-import pkg_resources
 from pathlib import Path
 
+try:
+    from importlib import metadata
+except ImportError:  # Python < 3.8
+    import importlib_metadata as metadata
+
 from palm.plugins.dbt.plugin_config import DbtPluginConfig
 from palm.plugins.base import BasePlugin
 
 
 def get_version():
+    # importlib.metadata reads one dist-info, pkg_resources scans every installed package
     try:
-        version = pkg_resources.require("palm-dbt")[0].version
-    except pkg_resources.DistributionNotFound:
+        version = metadata.version("palm-dbt")
+    except metadata.PackageNotFoundError:
         version = 'unknown'
     return version
 
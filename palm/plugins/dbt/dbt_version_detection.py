@@ -1,22 +1,109 @@
+import json
+import re
+import subprocess
+import tarfile
 import click
 from pathlib import Path
+from typing import Dict, Optional
 import yaml
 
-from palm.utils import run_in_docker
+from palm.utils import run_in_docker, run_on_host
+from palm.plugins.dbt.dbt_palm_utils import palm_cache_dir
+
+DBT_VERSION_CACHE_FILE = "dbt_versions.yaml"
+# Only keep the versions of a handful of recent images, rebuilt images are
+# never looked up again.
+MAX_CACHED_IMAGES = 10
+
+_DIST_INFO_PATTERN = re.compile(r"^(dbt[_-][A-Za-z0-9_.]+)-([0-9][^-/]*)\.dist-info$")
 
 
 def get_dbt_version() -> str:
     """Get the dbt version from the dbt-core package in the docker image.
 
+    Versions are cached against the image ID, the image is only inspected
+    again once it has been rebuilt.
+
     Returns:
         str: The dbt version
     """
-    image_name = _get_image_name()
-    cmd = "pip list | grep dbt-core"
-    success, msg = run_in_docker(cmd, image_name, capture_output=True, silent=True)
-    if not success:
-        raise ValueError(f"Error getting dbt version: {msg}")
-    return msg.strip().split(" ")[-1]
+    versions = resolve_dbt_versions(_get_image_name())
+    if 'dbt-core' not in versions:
+        raise ValueError("Error getting dbt version: dbt-core not found in image")
+    return versions['dbt-core']
+
+
+def resolve_dbt_versions(image_name: str) -> Dict[str, str]:
+    """Resolve the versions of dbt-core and any dbt adapters in the image.
+
+    Resolution order:
+    1. The local version cache, keyed by the image ID
+    2. The dist-info metadata in the image's site-packages, read without
+       starting the container
+    3. `pip list` in a container, the slow path
+
+    Args:
+        image_name (str): Name of the docker image
+
+    Returns:
+        Dict[str, str]: package name -> version, e.g. {'dbt-core': '1.5.0'}
+    """
+    image_id = get_image_id(image_name)
+    if image_id:
+        cached = _read_version_cache().get(image_id)
+        if cached:
+            return cached
+
+        versions = _read_versions_from_image(image_id)
+        if versions:
+            _write_version_cache(image_id, versions)
+            return versions
+
+    versions = _probe_versions_in_container(image_name)
+    # The image may have been built by `docker compose run`
+    image_id = image_id or get_image_id(image_name)
+    if image_id:
+        _write_version_cache(image_id, versions)
+    return versions
+
+
+def get_image_id(image_name: str) -> Optional[str]:
+    """Get the ID (content digest) of the local docker image
+
+    Args:
+        image_name (str): Name of the docker image
+
+    Returns:
+        Optional[str]: The image ID, None if the image has not been built
+    """
+    exit_code, stdout, _ = run_on_host(
+        f"docker image inspect --format '{{{{.Id}}}}' {image_name}",
+        capture_output=True,
+    )
+    if exit_code != 0 or not stdout.strip():
+        return None
+    return stdout.strip()
+
+
+def parse_dist_info_versions(names) -> Dict[str, str]:
+    """Extract dbt package versions from site-packages entry names
+
+    Args:
+        names (Iterable[str]): Paths of entries in site-packages,
+            e.g. 'site-packages/dbt_core-1.5.0.dist-info/METADATA'
+
+    Returns:
+        Dict[str, str]: package name -> version
+    """
+    versions = {}
+    for name in names:
+        for part in Path(name).parts:
+            match = _DIST_INFO_PATTERN.match(part)
+            if match:
+                package = re.sub(r"[_.]+", "-", match.group(1)).lower()
+                versions[package] = match.group(2)
+                break
+    return versions
 
 
 def dbt_version_factory() -> str:
@@ -48,6 +135,118 @@ def _get_image_name():
     return palm_config["image_name"]
 
 
+def _read_versions_from_image(image_id: str) -> Dict[str, str]:
+    """Read dbt package versions from the image's site-packages metadata.
+
+    The container is created but never started, site-packages is streamed
+    out with `docker cp` and only the dist-info directory names are inspected.
+
+    Returns:
+        Dict[str, str]: package name -> version, empty if the metadata could
+        not be read
+    """
+    site_packages = _get_site_packages_path(image_id)
+    if not site_packages:
+        return {}
+
+    exit_code, container_id, _ = run_on_host(
+        f"docker create {image_id} true", capture_output=True
+    )
+    if exit_code != 0:
+        return {}
+    container_id = container_id.strip()
+
+    try:
+        with subprocess.Popen(
+            ["docker", "cp", f"{container_id}:{site_packages}", "-"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        ) as proc:
+            try:
+                with tarfile.open(fileobj=proc.stdout, mode="r|") as tar:
+                    versions = parse_dist_info_versions(m.name for m in tar)
+            except tarfile.TarError:
+                versions = {}
+    finally:
+        run_on_host(f"docker rm {container_id}", capture_output=True)
+
+    return versions
+
+
+def get_image_env(image: str) -> Dict[str, str]:
+    """The ENV of an image, pulled first when it isn't available locally
+
+    Returns:
+        Dict[str, str]: variable -> value, empty if docker can't inspect the image
+    """
+    env = _inspect_image_env(image)
+    if env is None:
+        exit_code, _, _ = run_on_host(f"docker pull -q {image}", capture_output=True)
+        if exit_code == 0:
+            env = _inspect_image_env(image)
+    return env or {}
+
+
+def _inspect_image_env(image: str) -> Optional[Dict[str, str]]:
+    exit_code, stdout, _ = run_on_host(
+        f"docker image inspect --format '{{{{json .Config.Env}}}}' {image}",
+        capture_output=True,
+    )
+    if exit_code != 0:
+        return None
+    try:
+        env = json.loads(stdout) or []
+    except ValueError:
+        return None
+    return dict(item.split('=', 1) for item in env if '=' in item)
+
+
+def _get_site_packages_path(image_id: str) -> Optional[str]:
+    """Determine the site-packages path from the image's PYTHON_VERSION env var,
+    which is set by the official python base images used by dbt.
+    """
+    env = _inspect_image_env(image_id)
+    if env is None:
+        return None
+    match = re.match(r'(\d+)\.(\d+)', env.get('PYTHON_VERSION', ''))
+    if not match:
+        return None
+    return f"/usr/local/lib/python{match.group(1)}.{match.group(2)}/site-packages"
+
+
+def _probe_versions_in_container(image_name: str) -> Dict[str, str]:
+    """Get the dbt package versions by running pip list in a container"""
+    cmd = "pip list 2>/dev/null | grep dbt-"
+    success, msg = run_in_docker(cmd, image_name, capture_output=True, silent=True)
+    if not success:
+        raise ValueError(f"Error getting dbt version: {msg}")
+
+    versions = {}
+    for line in msg.strip().splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].lower().startswith("dbt-"):
+            versions[parts[0].lower()] = parts[-1]
+    return versions
+
+
+def _read_version_cache() -> Dict[str, Dict[str, str]]:
+    cache_path = palm_cache_dir() / DBT_VERSION_CACHE_FILE
+    if not cache_path.exists():
+        return {}
+    return (yaml.safe_load(cache_path.read_text()) or {}).get('images', {})
+
+
+def _write_version_cache(image_id: str, versions: Dict[str, str]) -> None:
+    images = _read_version_cache()
+    images.pop(image_id, None)
+    images[image_id] = versions
+    # dicts are insertion ordered, drop the oldest images first
+    while len(images) > MAX_CACHED_IMAGES:
+        images.pop(next(iter(images)))
+    cache_path = palm_cache_dir() / DBT_VERSION_CACHE_FILE
+    cache_path.write_text(yaml.dump({'images': images}, sort_keys=False))
+
+
 # Ideally, the 2 functions below would come from palm_config.py in palm-cli
 # However, that class is more complicated than it should be and needs a refactor.
 # So, for now, we have to do this here.
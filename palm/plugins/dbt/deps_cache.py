@@ -0,0 +1,181 @@
+import click
+import hashlib
+import os
+import shlex
+import shutil
+from pathlib import Path
+from typing import List, Optional
+
+from palm.plugins.dbt.dbt_palm_utils import palm_cache_dir
+from palm.plugins.dbt.parsers import parse_project
+
+""" Caches installed dbt packages on the host, keyed by the package files """
+
+DEPS_CACHE_DIR = "dbt_packages"
+ACTIVE_DIR = "active"
+ACTIVE_KEY_FILE = "active.key"
+# Mounted over the packages dir by the docker-compose.yaml palm containerize generates
+DEPS_CACHE_MOUNT = f".palm/cache/{DEPS_CACHE_DIR}/{ACTIVE_DIR}"
+# Hashed in this order by scripts/dbt_deps.sh too, keep them in sync
+PACKAGE_FILES = ('packages.yml', 'dependencies.yml', 'package-lock.yml')
+PACKAGE_DIRS = ('dbt_packages', 'dbt_modules')
+MAX_CACHED_KEYS = 5
+
+
+def deps_key(dbt_version: Optional[str], project_path: Path = Path('.')) -> str:
+    """Key the installed packages by dbt version and package files
+
+    Args:
+        dbt_version (Optional[str]): The project's dbt version
+        project_path (Path): The dbt project directory
+
+    Returns:
+        str: A directory name for the packages in the cache
+    """
+    digest = hashlib.sha256()
+    for name in PACKAGE_FILES:
+        path = project_path / name
+        if path.exists():
+            digest.update(path.read_bytes())
+    return f"dbt-{dbt_version or 'unknown'}-{digest.hexdigest()[:16]}"
+
+
+def deps_cache_enabled(project_path: Path = Path('.')) -> bool:
+    """True if the project's docker-compose.yaml mounts the package cache"""
+    compose_file = project_path / "docker-compose.yaml"
+    return compose_file.exists() and DEPS_CACHE_MOUNT in compose_file.read_text()
+
+
+class DepsCache:
+    """Installed dbt packages for each set of package files
+
+    The `active` directory is mounted over the packages dir in the container.
+    Switching to another key renames the active packages to their key and the
+    cached packages for the new key to `active`, so a cache hit costs two
+    renames instead of a `dbt deps` against git and dbt hub.
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root or palm_cache_dir() / DEPS_CACHE_DIR
+        self.active_path.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def active_path(self) -> Path:
+        return self.root / ACTIVE_DIR
+
+    @property
+    def key_path(self) -> Path:
+        return self.root / ACTIVE_KEY_FILE
+
+    @property
+    def active_key(self) -> Optional[str]:
+        """Key of the packages in the active dir, None until they are installed"""
+        if self.key_path.exists():
+            return self.key_path.read_text().strip() or None
+        return None
+
+    def restore(self, key: str) -> bool:
+        """Make the packages installed for key the active ones
+
+        Args:
+            key (str): The key from deps_key
+
+        Returns:
+            bool: True if the packages were cached, otherwise the active dir is
+            left empty for `dbt deps` and mark_installed
+        """
+        if self.active_key == key:
+            return True
+
+        self._stash_active()
+        cached = self.root / key
+        if cached.is_dir():
+            os.replace(cached, self.active_path)
+            self.key_path.write_text(key)
+            return True
+        self.active_path.mkdir(parents=True, exist_ok=True)
+        return False
+
+    def mark_installed(self, key: str) -> None:
+        """Record that `dbt deps` installed the packages for key in the active dir"""
+        self.key_path.write_text(key)
+
+    def _stash_active(self) -> None:
+        key = self.active_key
+        if self.key_path.exists():
+            self.key_path.unlink()
+        if key and not (self.root / key).exists():
+            os.replace(self.active_path, self.root / key)
+            os.utime(self.root / key)
+        else:
+            shutil.rmtree(self.active_path, ignore_errors=True)
+            # Files the container wrote as root can't always be removed
+            if self.active_path.exists():
+                raise click.ClickException(
+                    f"Could not remove {self.active_path}, "
+                    "remove it (it may need sudo) and try again"
+                )
+        self._prune()
+
+    def _prune(self) -> None:
+        """Keep only the most recently used MAX_CACHED_KEYS package sets"""
+        cached = sorted(
+            (
+                path
+                for path in self.root.iterdir()
+                if path.is_dir() and path.name != ACTIVE_DIR
+            ),
+            key=lambda path: path.stat().st_mtime,
+            reverse=True,
+        )
+        for path in cached[MAX_CACHED_KEYS:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def restore_packages(
+    dbt_version: Optional[str], project_path: Path = Path('.')
+) -> Optional[str]:
+    """Restore the project's packages from the cache
+
+    Args:
+        dbt_version (Optional[str]): The project's dbt version
+        project_path (Path): The dbt project directory
+
+    Returns:
+        Optional[str]: The key to mark_installed once `dbt deps` has run, None if
+        the packages were restored or the project does not use the cache
+    """
+    if not deps_cache_enabled(project_path):
+        return None
+    key = deps_key(dbt_version, project_path)
+    cache = DepsCache()
+    previous = cache.active_key
+    if cache.restore(key):
+        if previous != key:
+            click.secho("Restored dbt packages from the package cache", fg="cyan")
+        return None
+    return key
+
+
+def clean_command(project_path: Path = Path('.')) -> Optional[str]:
+    """Remove the project's clean-targets, except the cached packages dir
+
+    `dbt clean` would empty the package cache mounted over the packages dir.
+
+    Returns:
+        Optional[str]: The command, None if there is nothing else to clean
+    """
+    project = parse_project(project_path / 'dbt_project.yml')
+    package_dirs = {
+        *PACKAGE_DIRS,
+        project.packages_install_path,
+        project.modules_path,
+    }
+    targets: List[str] = [
+        target
+        for target in project.clean_targets
+        if Path(target).as_posix().strip('/') not in package_dirs
+    ]
+    if not targets:
+        return None
+    return f"rm -rf {' '.join(shlex.quote(target) for target in targets)}"
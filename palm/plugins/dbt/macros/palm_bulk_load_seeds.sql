@@ -0,0 +1,83 @@
+/*{# Loads large seeds from compressed files with the warehouse's bulk copy
+
+    Called by `palm seed --bulk` with the seeds palm converted to parquet, or
+    gzipped CSV when pyarrow isn't installed, at their absolute path in the
+    container. Seeds keep their configured
+    database, schema, alias and column_types. Snowflake and DuckDB are
+    supported, other adapters can add an <adapter>__palm_bulk_copy_sql macro.
+
+#}*/
+
+{%- macro palm_bulk_load_seeds(seeds) -%}
+    {%- if execute -%}
+        {%- for seed in seeds -%}
+            {%- set matches = [] -%}
+            {%- for node in graph.nodes.values() if node.resource_type == 'seed' and node.name == seed.name -%}
+                {%- do matches.append(node) -%}
+            {%- endfor -%}
+            {%- if not matches -%}
+                {{ exceptions.raise_compiler_error("Seed " ~ seed.name ~ " not found in the project") }}
+            {%- endif -%}
+            {%- set node = matches[0] -%}
+            {%- set identifier = node.alias or node.name -%}
+            {%- set relation = api.Relation.create(database=node.database, schema=node.schema, identifier=identifier) -%}
+            {%- set raw_relation = api.Relation.create(database=node.database, schema=node.schema, identifier=identifier ~ '__palm_bulk') -%}
+
+            {% do log('Bulk loading ' ~ seed.path ~ ' into ' ~ relation, info=True) %}
+            {%- do adapter.create_schema(relation) -%}
+            {%- do run_query(palm_bulk_copy_sql(raw_relation, seed.path, seed.format)) -%}
+            {%- do run_query(palm_bulk_cast_sql(relation, raw_relation, node.config.column_types or {})) -%}
+            {%- do run_query('drop table if exists ' ~ raw_relation) -%}
+        {%- endfor -%}
+    {%- endif -%}
+{%- endmacro -%}
+
+
+{%- macro palm_bulk_copy_sql(relation, file_path, file_format) -%}
+    {{ return(adapter.dispatch('palm_bulk_copy_sql')(relation, file_path, file_format)) }}
+{%- endmacro -%}
+
+
+{%- macro default__palm_bulk_copy_sql(relation, file_path, file_format) -%}
+    {{ exceptions.raise_compiler_error("palm seed --bulk does not support the " ~ adapter.type() ~ " adapter") }}
+{%- endmacro -%}
+
+
+{%- macro duckdb__palm_bulk_copy_sql(relation, file_path, file_format) -%}
+    create or replace table {{ relation }} as select * from
+    {%- if file_format == 'parquet' %} read_parquet('{{ file_path }}')
+    {%- else %} read_csv_auto('{{ file_path }}', header = true)
+    {%- endif -%}
+{%- endmacro -%}
+
+
+{%- macro snowflake__palm_bulk_copy_sql(relation, file_path, file_format) -%}
+    {%- set file_format_name = relation.database ~ '.' ~ relation.schema ~ '.' ~ relation.identifier ~ '_format' -%}
+    {%- set stage = relation.database ~ '.' ~ relation.schema ~ '.' ~ relation.identifier ~ '_stage' -%}
+    create or replace temporary file format {{ file_format_name }}
+        {%- if file_format == 'parquet' %} type = parquet
+        {%- else %} type = csv parse_header = true field_optionally_enclosed_by = '"' compression = gzip
+        {%- endif %};
+    create or replace temporary stage {{ stage }} file_format = {{ file_format_name }};
+    put 'file://{{ file_path }}' @{{ stage }} auto_compress = false overwrite = true;
+    create or replace table {{ relation }} using template (
+        select array_agg(object_construct(*)) within group (order by order_id)
+        from table(infer_schema(location => '@{{ stage }}', file_format => '{{ file_format_name }}'))
+    );
+    copy into {{ relation }} from @{{ stage }}
+        file_format = (format_name = '{{ file_format_name }}')
+        match_by_column_name = case_insensitive
+        purge = true;
+{%- endmacro -%}
+
+
+{%- macro palm_bulk_cast_sql(relation, raw_relation, column_types) -%}
+    {%- set columns = adapter.get_columns_in_relation(raw_relation) -%}
+    create or replace table {{ relation }} as select
+    {%- for column in columns %}
+        {%- set column_type = column_types.get(column.name) or column_types.get(column.name | lower) %}
+        {% if column_type %}cast({{ adapter.quote(column.name) }} as {{ column_type }}){% else %}{{ adapter.quote(column.name) }}{% endif %} as {{ column.name }}
+        {{- "," if not loop.last }}
+    {%- endfor %}
+    from {{ raw_relation }}
+{%- endmacro -%}
@@ -0,0 +1,66 @@
+/*{# Clones prod relations into the branch schema, for `palm run --clone-upstream`
+
+    Each relation is the prod location of a model, seed or snapshot upstream
+    of the selection. It is cloned to where the node is built in the current
+    target, unless a relation already exists there. Snowflake tables are zero-copy
+    clones, everything else becomes a view on the prod relation. Other adapters
+    can add an <adapter>__palm_clone_relation_sql macro.
+
+#}*/
+
+{%- macro palm_clone_upstream(relations) -%}
+    {%- if execute -%}
+        {%- for relation in relations -%}
+            {%- set node = graph.nodes.get(relation.unique_id) -%}
+            {%- set source = adapter.get_relation(
+                database=relation.database,
+                schema=relation.schema,
+                identifier=relation.identifier
+            ) -%}
+            {%- if node is none -%}
+                {% do log(relation.unique_id ~ ' is not in the project, not cloning it', info=True) %}
+            {%- elif source is none -%}
+                {% do log(relation.unique_id ~ ' has no relation in prod, not cloning it', info=True) %}
+            {%- elif adapter.get_relation(
+                database=node.database,
+                schema=node.schema,
+                identifier=node.alias or node.name
+            ) is none -%}
+                {%- set target = api.Relation.create(
+                    database=node.database,
+                    schema=node.schema,
+                    identifier=node.alias or node.name
+                ) -%}
+                {%- do adapter.create_schema(target) -%}
+                {%- do run_query(palm_clone_relation_sql(source, target)) -%}
+                {% do log('Cloned ' ~ source ~ ' to ' ~ target, info=True) %}
+                {% do log('PALM_CLONED_RELATION: ' ~ relation.unique_id, info=True) %}
+            {%- endif -%}
+        {%- endfor -%}
+    {%- endif -%}
+{%- endmacro -%}
+
+
+{%- macro palm_clone_relation_sql(source, target) -%}
+    {{ return(adapter.dispatch('palm_clone_relation_sql')(source, target)) }}
+{%- endmacro -%}
+
+
+{%- macro default__palm_clone_relation_sql(source, target) -%}
+    create or replace view {{ target }} as select * from {{ source }}
+{%- endmacro -%}
+
+
+{%- macro duckdb__palm_clone_relation_sql(source, target) -%}
+    {#- DuckDB has no zero-copy clones, a view reads the prod data in place -#}
+    create or replace view {{ target }} as select * from {{ source }}
+{%- endmacro -%}
+
+
+{%- macro snowflake__palm_clone_relation_sql(source, target) -%}
+    {%- if source.is_table -%}
+        create or replace table {{ target }} clone {{ source }}
+    {%- else -%}
+        create or replace view {{ target }} as select * from {{ source }}
+    {%- endif -%}
+{%- endmacro -%}
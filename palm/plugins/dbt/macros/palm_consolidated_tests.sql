@@ -0,0 +1,67 @@
+/*{# Runs the not_null, unique and accepted_values tests of each model in a
+    single scan of the model
+
+    models: list of {model: unique_id, tests: [{unique_id, type, column,
+    values, quote, severity}]}, built by palm from the manifest. Logs each
+    test's failure count, as a row count, on a PALM_TEST_RESULT: line. With
+    fail_fast, raises after the first model with an error severity failure.
+
+#}*/
+
+{%- macro palm_consolidated_tests(models, fail_fast=false) -%}
+    {%- if execute -%}
+        {%- for model in models -%}
+            {%- set node = graph.nodes.get(model.model) or graph.sources.get(model.model) -%}
+            {%- set relation = api.Relation.create(
+                database=node.database,
+                schema=node.schema,
+                identifier=node.alias or node.identifier or node.name
+            ) -%}
+            {%- set started = modules.datetime.datetime.now() -%}
+            {%- set results = run_query(palm_consolidated_tests_sql(relation, model.tests)) -%}
+            {%- set seconds = (modules.datetime.datetime.now() - started).total_seconds() -%}
+            {%- set errors = [] -%}
+            {%- for test in model.tests -%}
+                {%- set failures = results.rows[0][loop.index0] | int -%}
+                {% do log('PALM_TEST_RESULT: ' ~ tojson({
+                    'unique_id': test.unique_id,
+                    'failures': failures,
+                    'execution_time': seconds / (model.tests | length)
+                }), info=True) %}
+                {%- if failures and test.severity | lower != 'warn' -%}
+                    {%- do errors.append(test.unique_id) -%}
+                {%- endif -%}
+            {%- endfor -%}
+            {%- if fail_fast and errors -%}
+                {%- do exceptions.raise_compiler_error(
+                    'Consolidated tests failed: ' ~ errors | join(', ')
+                ) -%}
+            {%- endif -%}
+        {%- endfor -%}
+    {%- endif -%}
+{%- endmacro -%}
+
+
+{%- macro palm_consolidated_tests_sql(relation, tests) -%}
+    select
+    {%- for test in tests %}
+        {% if test.type == 'not_null' -%}
+            coalesce(sum(case when {{ test.column }} is null then 1 else 0 end), 0)
+        {%- elif test.type == 'unique' -%}
+            count({{ test.column }}) - count(distinct {{ test.column }})
+        {%- elif test.type == 'accepted_values' -%}
+            coalesce(sum(case when {{ test.column }} not in (
+                {%- for value in test['values'] -%}
+                    {%- if test.quote -%}
+                        '{{ value | string | replace("'", "''") }}'
+                    {%- else -%}
+                        {{ value }}
+                    {%- endif -%}
+                    {%- if not loop.last %}, {% endif -%}
+                {%- endfor -%}
+            ) then 1 else 0 end), 0)
+        {%- endif %} as palm_test_{{ loop.index0 }}
+        {%- if not loop.last %},{% endif -%}
+    {%- endfor %}
+    from {{ relation }}
+{%- endmacro -%}
@@ -0,0 +1,86 @@
+/*{# Drops schemas in batches, and lists the schemas palm can garbage collect
+
+    palm_drop_schemas sends the drops of up to 100 schemas as a single request:
+    one Snowflake Scripting block on Snowflake, one multi-statement query
+    elsewhere. Used by drop_branch_schemas and `palm cleanup --gc`.
+
+    palm_branch_schemas logs every schema in the TEST database with the last
+    time it or any of its relations changed, for `palm cleanup --gc`.
+
+    Only runs against the TEST database. Other adapters can add an
+    <adapter>__palm_drop_schemas_sql or <adapter>__palm_branch_schemas_sql macro.
+
+#}*/
+
+{%- macro palm_drop_schemas(schemas) -%}
+    {%- if target.database != "TEST" -%}
+        {{ exceptions.raise_compiler_error("Branch cleanup can only execute in TEST database; currently pointed at " ~ target.database) }}
+    {%- endif -%}
+    {%- for batch in schemas | batch(100) -%}
+        {% do log('Dropping schemas ' ~ batch | join(', '), info=True) %}
+        {%- do run_query(palm_drop_schemas_sql(target.database, batch)) -%}
+    {%- endfor -%}
+{%- endmacro -%}
+
+
+{%- macro palm_drop_schemas_sql(database, schemas) -%}
+    {{ return(adapter.dispatch('palm_drop_schemas_sql')(database, schemas)) }}
+{%- endmacro -%}
+
+
+{%- macro default__palm_drop_schemas_sql(database, schemas) -%}
+    {%- for schema in schemas %}
+    drop schema if exists {{ adapter.quote(database) }}.{{ adapter.quote(schema) }} cascade;
+    {%- endfor -%}
+{%- endmacro -%}
+
+
+{%- macro snowflake__palm_drop_schemas_sql(database, schemas) -%}
+    execute immediate $$
+    begin
+    {%- for schema in schemas %}
+        drop schema if exists {{ adapter.quote(database) }}.{{ adapter.quote(schema) }} cascade;
+    {%- endfor %}
+    end;
+    $$
+{%- endmacro -%}
+
+
+{%- macro palm_branch_schemas() -%}
+    {%- if target.database != "TEST" -%}
+        {{ exceptions.raise_compiler_error("Branch cleanup can only execute in TEST database; currently pointed at " ~ target.database) }}
+    {%- endif -%}
+    {%- if execute -%}
+        {%- for row in run_query(palm_branch_schemas_sql(target.database)) -%}
+            {% do log('PALM_SCHEMA: ' ~ row[0] ~ ' ' ~ (row[1].isoformat() if row[1] else ''), info=True) %}
+        {%- endfor -%}
+    {%- endif -%}
+{%- endmacro -%}
+
+
+{%- macro palm_branch_schemas_sql(database) -%}
+    {{ return(adapter.dispatch('palm_branch_schemas_sql')(database)) }}
+{%- endmacro -%}
+
+
+{%- macro default__palm_branch_schemas_sql(database) -%}
+    {#- Without a last altered time schemas are only collected for merged branches -#}
+    select schema_name, null as last_altered
+    from {{ adapter.quote(database) }}.information_schema.schemata
+    where lower(schema_name) not in ('information_schema', 'public')
+{%- endmacro -%}
+
+
+{%- macro snowflake__palm_branch_schemas_sql(database) -%}
+    select
+        schemata.schema_name,
+        greatest(
+            schemata.last_altered,
+            coalesce(max(tables.last_altered), schemata.last_altered)
+        ) as last_altered
+    from {{ adapter.quote(database) }}.information_schema.schemata
+    left join {{ adapter.quote(database) }}.information_schema.tables
+        on tables.table_schema = schemata.schema_name
+    where schemata.schema_name not in ('INFORMATION_SCHEMA', 'PUBLIC')
+    group by schemata.schema_name, schemata.last_altered
+{%- endmacro -%}
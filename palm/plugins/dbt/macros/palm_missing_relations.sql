@@ -0,0 +1,25 @@
+/*{# Logs which of the given nodes have no relation in the current target
+
+    Used by palm's build cache to find models it would skip because they are
+    unchanged, but whose relation was dropped outside of palm.
+
+#}*/
+
+{%- macro palm_missing_relations(unique_ids) -%}
+    {%- set missing = [] -%}
+    {%- if execute -%}
+        {%- for unique_id in unique_ids -%}
+            {%- set node = graph.nodes.get(unique_id) -%}
+            {%- if node is none -%}
+                {%- do missing.append(unique_id) -%}
+            {%- elif adapter.get_relation(
+                database=node.database,
+                schema=node.schema,
+                identifier=node.alias or node.name
+            ) is none -%}
+                {%- do missing.append(unique_id) -%}
+            {%- endif -%}
+        {%- endfor -%}
+    {%- endif -%}
+    {% do log('PALM_MISSING_RELATIONS: ' ~ missing | join(' '), info=True) %}
+{%- endmacro -%}
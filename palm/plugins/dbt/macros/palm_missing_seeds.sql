@@ -0,0 +1,23 @@
+/*{# Logs which of the given seeds have no table in the current target
+
+    Used by palm to find seeds it skipped because they were unchanged, but
+    whose table was dropped outside of palm.
+
+#}*/
+
+{%- macro palm_missing_seeds(seeds) -%}
+    {%- set missing = [] -%}
+    {%- if execute -%}
+        {%- for node in graph.nodes.values() if node.resource_type == 'seed' and node.name in seeds -%}
+            {%- set relation = adapter.get_relation(
+                database=node.database,
+                schema=node.schema,
+                identifier=node.alias or node.name
+            ) -%}
+            {%- if relation is none -%}
+                {%- do missing.append(node.name) -%}
+            {%- endif -%}
+        {%- endfor -%}
+    {%- endif -%}
+    {% do log('PALM_MISSING_SEEDS: ' ~ missing | join(' '), info=True) %}
+{%- endmacro -%}
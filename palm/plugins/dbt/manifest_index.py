@@ -0,0 +1,475 @@
+import hashlib
+import os
+import pickle
+import re
+from array import array
+from fnmatch import fnmatchcase
+from pathlib import Path, PurePosixPath
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+from palm.plugins.dbt.dbt_palm_utils import palm_cache_dir
+from palm.plugins.dbt.parsers import Manifest, RunResults, parse_manifest, parse_project
+from palm.plugins.dbt.run_hooks import MANIFEST_FILE, local_artifact_path
+
+""" Host-side index of manifest.json, resolves dbt selections without a container """
+
+INDEX_FORMAT = 2
+# Same grammar as dbt's node selection syntax: [@][n+][method:]value[+n]
+SELECTOR_PATTERN = re.compile(
+    r"\A"
+    r"(?P<childrens_parents>@)?"
+    r"((?P<parents_depth>\d*)(?P<parents>\+))?"
+    r"((?P<method>[\w.]+):)?(?P<value>.*?)"
+    r"((?P<children>\+)(?P<children_depth>\d*))?"
+    r"\Z"
+)
+# dbt's state and result methods look at more than palm indexes (configs,
+# macros, the exact artifacts dbt was pointed at), so palm only approximates them
+APPROXIMATE_METHODS = ('state', 'result')
+# Resource types dbt's default (fqn) selection method doesn't match
+NON_FQN_RESOURCE_TYPES = ('source', 'exposure', 'metric', 'semantic_model')
+OUTPUT_FORMATS = ('selector', 'name', 'path', 'unique_id')
+PROJECT_FILES = ('dbt_project.yml', 'packages.yml', 'dependencies.yml', 'selectors.yml')
+
+
+class UnsupportedSelectorError(ValueError):
+    """Raised when palm can't resolve a selector on the host"""
+
+
+class ManifestIndex:
+    """Compact index of a manifest's nodes and dependency graph
+
+    Nodes are numbered, the graph is stored as array-backed adjacency lists
+    and names, tags, packages, paths and resource types have inverted indexes.
+    The index is pickled to the palm cache, loading it is much faster than
+    parsing manifest.json.
+    """
+
+    def __init__(self, manifest: Manifest):
+        nodes = list(manifest.nodes.values())
+        positions = {node.unique_id: i for i, node in enumerate(nodes)}
+        self.unique_ids = [node.unique_id for node in nodes]
+        self.names = [node.name for node in nodes]
+        self.resource_types = [node.resource_type for node in nodes]
+        self.packages = [node.package_name for node in nodes]
+        self.paths = [node.original_file_path or '' for node in nodes]
+        self.fqns = [tuple(node.fqn) for node in nodes]
+        self.materializations = [node.materialized for node in nodes]
+        self.checksums = [node.checksum for node in nodes]
+        self.config_checksums = [node.config_checksum for node in nodes]
+
+        parents = [
+            [positions[p] for p in node.depends_on if p in positions] for node in nodes
+        ]
+        children = [[] for _ in nodes]
+        for i, node_parents in enumerate(parents):
+            for parent in node_parents:
+                children[parent].append(i)
+        self.parent_offsets, self.parent_ids = _adjacency_arrays(parents)
+        self.child_offsets, self.child_ids = _adjacency_arrays(children)
+
+        self.by_name = _inverted_index([name] for name in self.names)
+        self.by_tag = _inverted_index(node.tags for node in nodes)
+        self.by_package = _inverted_index([package] for package in self.packages)
+        self.by_resource_type = _inverted_index([rt] for rt in self.resource_types)
+        self.by_path = _inverted_index(_path_prefixes(path) for path in self.paths)
+
+    def __len__(self) -> int:
+        return len(self.unique_ids)
+
+    def parents(self, i: int) -> array:
+        return self.parent_ids[self.parent_offsets[i] : self.parent_offsets[i + 1]]
+
+    def children(self, i: int) -> array:
+        return self.child_ids[self.child_offsets[i] : self.child_offsets[i + 1]]
+
+    def save(self, path: Path, header: Dict) -> None:
+        """Write the index, the header can be read without loading the index"""
+        tmp_path = path.with_suffix('.tmp')
+        with tmp_path.open('wb') as index_file:
+            pickle.dump(header, index_file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(self.__dict__, index_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "ManifestIndex":
+        with path.open('rb') as index_file:
+            pickle.load(index_file)
+            state = pickle.load(index_file)
+        index = cls.__new__(cls)
+        index.__dict__.update(state)
+        return index
+
+    @staticmethod
+    def read_header(path: Path) -> Dict:
+        with path.open('rb') as index_file:
+            return pickle.load(index_file)
+
+    def select(
+        self,
+        select: Sequence[str] = (),
+        exclude: Sequence[str] = (),
+        resource_types: Optional[Sequence[str]] = None,
+        state: Optional["ManifestIndex"] = None,
+        run_results: Optional[RunResults] = None,
+        strict: bool = False,
+    ) -> List[int]:
+        """Resolve --select and --exclude like dbt does
+
+        Tests are selected indirectly (dbt's eager mode): a test is selected or
+        excluded along with any of the nodes it tests.
+
+        Args:
+            select (Sequence[str]): --select arguments, everything if empty
+            exclude (Sequence[str]): --exclude arguments
+            resource_types (Optional[Sequence[str]]): Only return these resource types
+            state (Optional[ManifestIndex]): Index of the state manifest, for state:
+            run_results (Optional[RunResults]): Previous run results, for result:
+            strict (bool): Raise for selectors palm can only approximate
+
+        Returns:
+            List[int]: Positions of the selected nodes, ordered by unique_id
+        """
+        context = {'state': state, 'run_results': run_results, 'strict': strict}
+        selected = self._resolve(select, **context) if select else set(range(len(self)))
+        if exclude:
+            selected -= self._resolve(exclude, **context)
+        if resource_types:
+            selected = {i for i in selected if self.resource_types[i] in resource_types}
+        return sorted(selected, key=self.unique_ids.__getitem__)
+
+    def label(self, i: int, output: str = 'selector') -> str:
+        """Describe a node the way `dbt ls --output` does"""
+        if output == 'unique_id':
+            return self.unique_ids[i]
+        if output == 'name':
+            return self.names[i]
+        if output == 'path':
+            return self.paths[i]
+        if self.resource_types[i] in NON_FQN_RESOURCE_TYPES:
+            qualified_name = '.'.join(self.unique_ids[i].split('.')[1:])
+            return f"{self.resource_types[i]}:{qualified_name}"
+        return '.'.join(self.fqns[i])
+
+    def _resolve(self, values: Sequence[str], **context) -> Set[int]:
+        """Union of space separated selectors, intersection of comma separated ones"""
+        nodes = set()
+        for value in values:
+            for term in value.split():
+                matches = [
+                    self._select_term(part, **context) for part in term.split(',')
+                ]
+                nodes |= set.intersection(*matches)
+
+        tests = {
+            child
+            for i in nodes
+            for child in self.children(i)
+            if self.resource_types[child] == 'test'
+        }
+        return nodes | tests
+
+    def _select_term(self, raw: str, **context) -> Set[int]:
+        match = SELECTOR_PATTERN.match(raw)
+        if not match or not match['value']:
+            raise UnsupportedSelectorError(f"Invalid selector '{raw}'")
+
+        matched = self._match_method(match['method'], match['value'], **context)
+        nodes = set(matched)
+        if match['childrens_parents']:
+            nodes |= self._traverse(matched, self.children)
+            nodes |= self._traverse(nodes, self.parents)
+            return nodes
+        if match['parents']:
+            nodes |= self._traverse(
+                matched, self.parents, _depth(match['parents_depth'])
+            )
+        if match['children']:
+            nodes |= self._traverse(
+                matched, self.children, _depth(match['children_depth'])
+            )
+        return nodes
+
+    def _traverse(
+        self,
+        start: Iterable[int],
+        edges: Callable[[int], array],
+        depth: Optional[int] = None,
+    ) -> Set[int]:
+        visited = set()
+        frontier = set(start)
+        level = 0
+        while frontier and (depth is None or level < depth):
+            level += 1
+            next_frontier = set()
+            for i in frontier:
+                for j in edges(i):
+                    if j not in visited:
+                        visited.add(j)
+                        next_frontier.add(j)
+            frontier = next_frontier
+        return visited
+
+    def _match_method(
+        self,
+        method: Optional[str],
+        value: str,
+        state: Optional["ManifestIndex"] = None,
+        run_results: Optional[RunResults] = None,
+        strict: bool = False,
+    ) -> Set[int]:
+        if strict and method in APPROXIMATE_METHODS:
+            raise UnsupportedSelectorError(
+                f"'{method}:' selectors can only be approximated outside of dbt"
+            )
+        if method is None:
+            method = 'path' if _looks_like_path(value) else 'fqn'
+
+        if method == 'fqn':
+            return self._match_fqn(value)
+        if method == 'tag':
+            return _lookup(self.by_tag, value)
+        if method == 'package':
+            return _lookup(self.by_package, value)
+        if method == 'resource_type':
+            return _lookup(self.by_resource_type, value)
+        if method == 'path':
+            return _lookup(self.by_path, str(PurePosixPath(value)))
+        if method == 'file':
+            return {
+                i
+                for i, path in enumerate(self.paths)
+                if path and fnmatchcase(PurePosixPath(path).name, value)
+            }
+        if method == 'config.materialized':
+            return {i for i, m in enumerate(self.materializations) if m == value}
+        if method in ('source', 'exposure', 'metric'):
+            return self._match_qualified(method, value)
+        if method == 'state':
+            return self._match_state(value, state)
+        if method == 'result':
+            return self._match_result(value, run_results)
+        raise UnsupportedSelectorError(f"palm can't resolve '{method}:' selectors")
+
+    def _match_fqn(self, value: str) -> Set[int]:
+        parts = value.split('.')
+        return {
+            i
+            for i, fqn in enumerate(self.fqns)
+            if self.resource_types[i] not in NON_FQN_RESOURCE_TYPES
+            and fqn
+            and (
+                fnmatchcase(fqn[-1], value)
+                or _prefix_match(fqn, parts)
+                or _prefix_match(fqn[1:], parts)
+            )
+        }
+
+    def _match_qualified(self, resource_type: str, value: str) -> Set[int]:
+        """Match package.source.table style names of sources, exposures and metrics"""
+        parts = value.split('.')
+        matched = set()
+        for i in self.by_resource_type.get(resource_type, ()):
+            qualified_name = self.unique_ids[i].split('.')[1:]
+            if _prefix_match(qualified_name, parts) or _prefix_match(
+                qualified_name[1:], parts
+            ):
+                matched.add(i)
+        return matched
+
+    def _match_state(self, value: str, state: Optional["ManifestIndex"]) -> Set[int]:
+        if state is None:
+            raise UnsupportedSelectorError("'state:' selectors need a state manifest")
+        state_checksums = dict(zip(state.unique_ids, state.checksums))
+        new = {i for i, u in enumerate(self.unique_ids) if u not in state_checksums}
+        if value == 'new':
+            return new
+        if value.split('.')[0] == 'modified':
+            # Only file contents are compared, dbt also compares configs
+            return new | {
+                i
+                for i, u in enumerate(self.unique_ids)
+                if self.checksums[i]
+                and u in state_checksums
+                and self.checksums[i] != state_checksums[u]
+            }
+        raise UnsupportedSelectorError(f"palm can't resolve 'state:{value}'")
+
+    def _match_result(self, value: str, run_results: Optional[RunResults]) -> Set[int]:
+        if run_results is None:
+            raise UnsupportedSelectorError("'result:' selectors need run results")
+        statuses = {r.unique_id: r.status for r in run_results.results}
+        return {i for i, u in enumerate(self.unique_ids) if statuses.get(u) == value}
+
+
+def _adjacency_arrays(adjacency: List[List[int]]):
+    """Flatten adjacency lists into offset and id arrays"""
+    offsets = array('I', [0])
+    ids = array('I')
+    for neighbours in adjacency:
+        ids.extend(neighbours)
+        offsets.append(len(ids))
+    return offsets, ids
+
+
+def _inverted_index(keys_per_node: Iterable[Iterable[str]]) -> Dict[str, array]:
+    index: Dict[str, array] = {}
+    for i, keys in enumerate(keys_per_node):
+        for key in keys:
+            if key is not None:
+                index.setdefault(key, array('I')).append(i)
+    return index
+
+
+def _path_prefixes(path: str) -> List[str]:
+    if not path:
+        return []
+    pure_path = PurePosixPath(path)
+    return [str(pure_path)] + [str(p) for p in pure_path.parents if str(p) != '.']
+
+
+def _has_wildcard(value: str) -> bool:
+    return any(char in value for char in '*?[')
+
+
+def _lookup(index: Dict[str, array], value: str) -> Set[int]:
+    if not _has_wildcard(value):
+        return set(index.get(value, ()))
+    matched = set()
+    for key, positions in index.items():
+        if fnmatchcase(key, value):
+            matched.update(positions)
+    return matched
+
+
+def _prefix_match(qualified_name: Sequence[str], parts: List[str]) -> bool:
+    if len(parts) > len(qualified_name):
+        return False
+    return all(fnmatchcase(name, part) for name, part in zip(qualified_name, parts))
+
+
+def _looks_like_path(value: str) -> bool:
+    return '/' in value or os.sep in value or value.endswith(('.sql', '.py', '.csv'))
+
+
+def _depth(depth: Optional[str]) -> Optional[int]:
+    return int(depth) if depth else None
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open('rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest_index(
+    manifest_path: Path, cache_dir: Optional[Path] = None
+) -> ManifestIndex:
+    """Load the index of a manifest, (re)building it if the manifest changed
+
+    The cached index is valid while the manifest's mtime and size are
+    unchanged. When they change but the content hash doesn't, e.g. after a
+    `dbt compile` that changed nothing, the index is reused as well.
+
+    Args:
+        manifest_path (Path): Path to manifest.json
+        cache_dir (Optional[Path]): Where to keep the index, defaults to the palm cache
+
+    Returns:
+        ManifestIndex: The index of the manifest
+    """
+    manifest_path = Path(manifest_path)
+    path_key = hashlib.sha1(str(manifest_path.resolve()).encode()).hexdigest()[:12]
+    index_path = (
+        Path(cache_dir or palm_cache_dir()) / f"manifest_index_{path_key}.pickle"
+    )
+    stat = manifest_path.stat()
+    stat_key = [stat.st_mtime_ns, stat.st_size]
+
+    header = None
+    if index_path.exists():
+        try:
+            header = ManifestIndex.read_header(index_path)
+        except (pickle.UnpicklingError, EOFError, OSError):
+            header = None
+
+    sha256 = None
+    if header and header.get('format') == INDEX_FORMAT:
+        if header.get('stat') == stat_key:
+            return ManifestIndex.load(index_path)
+        sha256 = _file_sha256(manifest_path)
+        if header.get('sha256') == sha256:
+            index = ManifestIndex.load(index_path)
+            index.save(index_path, {**header, 'stat': stat_key})
+            return index
+
+    index = ManifestIndex(parse_manifest(manifest_path))
+    header = {
+        'format': INDEX_FORMAT,
+        'stat': stat_key,
+        'sha256': sha256 or _file_sha256(manifest_path),
+    }
+    index.save(index_path, header)
+    return index
+
+
+def manifest_is_fresh(manifest_path: Path, project_dir: Path = Path('.')) -> bool:
+    """Check that no project file changed since the manifest was written"""
+    manifest_mtime = Path(manifest_path).stat().st_mtime
+    try:
+        project = parse_project(project_dir / 'dbt_project.yml')
+    except FileNotFoundError:
+        return False
+
+    for name in PROJECT_FILES:
+        path = project_dir / name
+        if path.exists() and path.stat().st_mtime > manifest_mtime:
+            return False
+
+    resource_paths = (
+        project.model_paths,
+        project.macro_paths,
+        project.seed_paths,
+        project.snapshot_paths,
+        project.analysis_paths,
+        project.test_paths,
+    )
+    for paths in resource_paths:
+        for resource_path in paths:
+            # Directory mtimes change when files are added or removed
+            for root, _, files in os.walk(project_dir / resource_path):
+                if os.stat(root).st_mtime > manifest_mtime:
+                    return False
+                for name in files:
+                    if os.stat(os.path.join(root, name)).st_mtime > manifest_mtime:
+                        return False
+    return True
+
+
+def selection_is_empty(
+    environment,
+    select: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    selector: Sequence[str] = (),
+    resource_types: Optional[Sequence[str]] = None,
+) -> bool:
+    """Check whether a selection is known to match nothing, without running dbt
+
+    Only returns True when the local manifest is up to date with the project
+    and every selector could be resolved exactly, so dbt would not run anything.
+    """
+    if selector or not (select or exclude):
+        return False
+    manifest_path = local_artifact_path(environment, MANIFEST_FILE)
+    if not manifest_path or not manifest_path.exists():
+        return False
+    if not manifest_is_fresh(manifest_path):
+        return False
+    try:
+        index = load_manifest_index(manifest_path)
+        return not index.select(select, exclude, resource_types, strict=True)
+    except (ValueError, OSError):
+        # Unsupported selectors and unreadable manifests, let dbt decide
+        return False
@@ -0,0 +1,304 @@
+import os
+import re
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Sequence
+
+import yaml
+from palm.code_generator import CodeGenerator
+from palm.plugins.dbt.parsers import parse_project
+
+""" Baseline model docs: the columns of a model's SQL, its .yml and .md files """
+
+DEFAULT_DOCS_DIR = Path("models/documentation")
+TEMPLATE_DIR = Path(__file__).parent / "templates" / "model_docs"
+TODO_DESCRIPTION = 'TODO: Add description'
+TODO_GRAIN = 'TODO: Add grain'
+
+# The docs index of a pool's worker processes, set once per worker
+_worker_docs_index: Optional['DocsIndex'] = None
+
+
+class DocsIndex(NamedTuple):
+    """The project's existing docs, globbed once per palm model-doc run"""
+
+    # Model docs directory name, e.g. marts -> the directories with that name
+    model_doc_dirs: Dict[str, List[Path]]
+    # Names of the columns that have a doc block
+    column_docs: FrozenSet[str]
+
+    def potential_doc_dirs(self, model_path: Path) -> List[Path]:
+        """The model docs directories named after one of the model's directories"""
+        dirs: List[Path] = []
+        for model_dir in Path(model_path).parent.parts:
+            for doc_dir in self.model_doc_dirs.get(model_dir, []):
+                if doc_dir not in dirs:
+                    dirs.append(doc_dir)
+        return dirs
+
+
+class ModelDocResult(NamedTuple):
+    """What documenting one model produced"""
+
+    model_path: Path
+    yml_path: Optional[Path] = None
+    md_path: Optional[Path] = None
+    error: Optional[str] = None
+
+
+def build_docs_index(project_dir: Path = Path('.')) -> DocsIndex:
+    """Glob the project's docs paths, or models/documentation without any"""
+    try:
+        docs_paths = parse_project(project_dir / 'dbt_project.yml').docs_paths
+    except FileNotFoundError:
+        docs_paths = []
+
+    model_doc_dirs = defaultdict(list)
+    column_docs = set()
+    if docs_paths:
+        docs_dirs = [
+            (Path(path) / 'models', Path(path) / 'columns') for path in docs_paths
+        ]
+    else:
+        docs_dirs = [(DEFAULT_DOCS_DIR, DEFAULT_DOCS_DIR / 'columns')]
+    for models_dir, columns_dir in docs_dirs:
+        for doc_dir in sorted((project_dir / models_dir).glob('*')):
+            model_doc_dirs[doc_dir.stem].append(models_dir / doc_dir.stem)
+        column_docs.update(doc.stem for doc in (project_dir / columns_dir).glob('*.md'))
+    return DocsIndex(dict(model_doc_dirs), frozenset(column_docs))
+
+
+def model_column_names(model_path: Path) -> List[str]:
+    """Parse the model SQL file and return its column names
+
+    Args:
+        model_path (Path): Path to the model SQL file
+
+    Returns:
+        List[str]: Column names
+    """
+    import sqlparse
+
+    raw = Path(model_path).read_text()
+    raw = re.sub(
+        r"{{[A-Za-z\\n\s()=_,]+}}", "", raw
+    ).strip()  # Strip out jinja config blocks
+    parsed = sqlparse.parse(raw)
+
+    column_identifiers = []
+
+    for statement in parsed:
+        # Unknown is acceptable here because dbt models aren't always proper SQL
+        if statement.get_type() in ["SELECT", "UNKNOWN"]:
+            column_identifiers = get_column_identifiers(statement)
+
+    return [identifier.get_name() for identifier in column_identifiers]
+
+
+def get_column_identifiers(statement) -> List:
+    """Get the column identifiers (sqlparse.sql.Identifier) from a SQL statement"""
+    import sqlparse
+
+    identifiers = []
+    for token in statement.tokens:
+        if token.ttype is None and type(token) is not sqlparse.sql.Function:
+            if type(token) is sqlparse.sql.Identifier:
+                # If the token is a CTE, skip it
+                if not token_is_cte(token):
+                    identifiers.append(token)
+            elif type(token) is sqlparse.sql.IdentifierList:
+                for child_token in token.get_identifiers():
+                    if (
+                        child_token.ttype is not sqlparse.tokens.Keyword
+                        and not token_is_cte(child_token)
+                    ):
+                        identifiers.append(child_token)
+
+    if len(identifiers) == 0:
+        raise Exception("Could not find column identifiers")
+    return identifiers
+
+
+def token_is_cte(token) -> bool:
+    """Check if a given token is a CTE name so we can skip documenting it.
+
+    Args:
+        token (sqlparse.sql.Token): The token to check
+
+    Returns:
+        bool: True if the token is a CTE name, False otherwise
+    """
+    _, next_token = token.token_next(1)
+    return next_token and next_token.value == "AS"
+
+
+def column_list(
+    column_names: Sequence[str],
+    column_docs: FrozenSet[str],
+    descriptions: Optional[Dict[str, str]] = None,
+) -> List[dict]:
+    """The columns of a model's .yml, with their doc block if they have one
+
+    Args:
+        column_names (Sequence[str]): The model's column names
+        column_docs (FrozenSet[str]): Names of the columns with a doc block
+        descriptions (Optional[Dict[str, str]]): Descriptions of the other columns
+
+    Returns:
+        List[dict]: List of column dictionaries
+    """
+    columns = []
+    for col_name in column_names:
+        if col_name in column_docs:
+            description = f'{{{{ doc("{col_name}") }}}}'
+        else:
+            description = (descriptions or {}).get(col_name, TODO_DESCRIPTION)
+        columns.append({"name": col_name, "description": description})
+    return columns
+
+
+def model_yml(model_name: str, columns: List[dict]) -> str:
+    """The content of a model's .yml"""
+    model = {
+        "version": 2,
+        "models": [
+            {
+                "name": model_name,
+                "description": f'{{{{ doc("{model_name}") }}}}',
+                "columns": columns,
+            }
+        ],
+    }
+    return yaml.dump(model, sort_keys=False, default_flow_style=False)
+
+
+def md_replacements(model_name: str, grain: str, description: str) -> dict:
+    """Replacements of the model_docs template"""
+    return {
+        "model_name": model_name,
+        "model_name_humanized": model_name.replace("_", " ").title(),
+        "grain": grain,
+        "description": description,
+        "begin_docs": f"{{% docs {model_name} %}}",
+        "end_docs": "{% enddocs %}",
+    }
+
+
+def document_model(
+    model_path: Path,
+    docs_index: DocsIndex,
+    default_docs_dir: Path = DEFAULT_DOCS_DIR,
+    overwrite: bool = False,
+) -> ModelDocResult:
+    """Write a model's baseline .yml and .md without prompting
+
+    The .md goes to the first model docs directory named after one of the
+    model's directories, or default_docs_dir. Existing files are kept unless
+    overwrite is set. Descriptions and the grain are left as TODOs.
+    """
+    model_path = Path(model_path)
+    model_name = model_path.stem
+    try:
+        columns = column_list(model_column_names(model_path), docs_index.column_docs)
+    except Exception as error:
+        return ModelDocResult(model_path, error=str(error) or type(error).__name__)
+
+    yml_path = model_path.parent / f"{model_name}.yml"
+    if overwrite or not yml_path.exists():
+        yml_path.write_text(model_yml(model_name, columns))
+    else:
+        yml_path = None
+
+    docs_dir = next(iter(docs_index.potential_doc_dirs(model_path)), default_docs_dir)
+    md_path = Path(docs_dir) / f"{model_name}.md"
+    if overwrite or not md_path.exists():
+        md_path.parent.mkdir(parents=True, exist_ok=True)
+        replacements = md_replacements(model_name, TODO_GRAIN, TODO_DESCRIPTION)
+        CodeGenerator(TEMPLATE_DIR, md_path.parent, replacements).run()
+    else:
+        md_path = None
+    return ModelDocResult(model_path, yml_path, md_path)
+
+
+def _init_worker(docs_index: DocsIndex) -> None:
+    global _worker_docs_index
+    _worker_docs_index = docs_index
+
+
+def _document_model_in_worker(
+    model_path: Path, default_docs_dir: Path, overwrite: bool
+) -> ModelDocResult:
+    return document_model(model_path, _worker_docs_index, default_docs_dir, overwrite)
+
+
+def model_files(paths: Sequence[Path]) -> List[Path]:
+    """The SQL files in paths, directories are searched recursively"""
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.rglob('*.sql')) if path.is_dir() else [path])
+    return files
+
+
+def document_models(
+    model_paths: Sequence[Path],
+    docs_index: DocsIndex,
+    workers: Optional[int] = None,
+    default_docs_dir: Path = DEFAULT_DOCS_DIR,
+    overwrite: bool = False,
+) -> Iterator[ModelDocResult]:
+    """Document many models in a process pool, yields results in model order
+
+    The docs index is sent to each worker once, when the worker starts.
+
+    Args:
+        model_paths (Sequence[Path]): The model SQL files
+        docs_index (DocsIndex): The project's existing docs
+        workers (Optional[int]): Worker processes, defaults to the CPU count.
+            With 1, models are documented in this process.
+        default_docs_dir (Path): Where .md files go without a matching docs dir
+        overwrite (bool): Replace existing .yml and .md files
+    """
+    workers = min(workers or os.cpu_count() or 1, len(model_paths))
+    if workers <= 1:
+        for model_path in model_paths:
+            yield document_model(model_path, docs_index, default_docs_dir, overwrite)
+        return
+
+    # Imported here, `palm --help` imports every command
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(docs_index,)
+    ) as pool:
+        # Small chunks, parse times vary a lot between models
+        yield from pool.map(
+            _document_model_in_worker,
+            model_paths,
+            [default_docs_dir] * len(model_paths),
+            [overwrite] * len(model_paths),
+            chunksize=max(1, len(model_paths) // (workers * 8)),
+        )
+
+
+class BatchSummary:
+    """Throughput and failures of a batch model-doc run"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.results: List[ModelDocResult] = []
+
+    def add(self, result: ModelDocResult) -> None:
+        self.results.append(result)
+
+    @property
+    def failures(self) -> List[ModelDocResult]:
+        return [result for result in self.results if result.error]
+
+    def message(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        documented = len(self.results) - len(self.failures)
+        return (
+            f"Documented {documented} of {len(self.results)} models in "
+            f"{elapsed:.1f}s ({len(self.results) / elapsed:.1f} models/s)"
+        )
@@ -0,0 +1,142 @@
+import click
+import time
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+from palm.plugins.dbt.dbt_executor import run_dbt, run_dbt_parallel
+from palm.plugins.dbt.dbt_palm_utils import palm_cache_dir
+from palm.plugins.dbt.manifest_index import (
+    ManifestIndex,
+    UnsupportedSelectorError,
+    load_manifest_index,
+    manifest_is_fresh,
+)
+from palm.plugins.dbt.parsers import parse_run_results
+from palm.plugins.dbt.perf.history import HISTORY_DB, RunHistory
+from palm.plugins.dbt.run_hooks import (
+    MANIFEST_FILE,
+    local_artifact_path,
+    local_run_results_path,
+    merge_run_results,
+)
+
+""" Runs a host-resolved selection as several dbt invocations in parallel containers """
+
+
+def resolve_selection(
+    environment,
+    env_vars: Dict,
+    select: Sequence[str],
+    exclude: Sequence[str],
+    resource_types: Sequence[str],
+    parallel: bool = True,
+) -> Tuple[ManifestIndex, List[int]]:
+    """Resolve a selection on the host, parsing the project first if needed
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        env_vars (Dict): The dbt env vars, for `dbt parse`
+        select (Sequence[str]): --select arguments
+        exclude (Sequence[str]): --exclude arguments
+        resource_types (Sequence[str]): Only select these resource types
+        parallel (bool): The selection runs in parallel containers, which need
+            dbt >= 1.5 to write their artifacts to separate directories
+
+    Returns:
+        Tuple[ManifestIndex, List[int]]: The index and the selected positions
+    """
+    plugin_config = environment.plugin_config('dbt')
+    if parallel and not plugin_config.is_dbt_version_greater_than(
+        "1.5.0", or_equal=True
+    ):
+        raise click.ClickException("Parallel dbt containers require dbt >= 1.5.0")
+
+    manifest_path = local_artifact_path(environment, MANIFEST_FILE)
+    if not manifest_path:
+        raise click.ClickException(
+            "Resolving the selection on the host requires dbt_artifacts_local"
+        )
+    if not manifest_path.exists() or not manifest_is_fresh(manifest_path):
+        success, msg = run_dbt(environment, "dbt parse", env_vars)
+        if not success or not manifest_path.exists():
+            raise click.ClickException(
+                f"dbt parse did not write {manifest_path}\n{msg}"
+            )
+
+    index = load_manifest_index(manifest_path)
+    try:
+        return index, index.select(select, exclude, resource_types, strict=True)
+    except UnsupportedSelectorError as e:
+        raise click.UsageError(f"The selection can't be resolved on the host: {e}")
+
+
+def expected_durations(
+    index: ManifestIndex, selected: Sequence[int]
+) -> Dict[str, float]:
+    """Average duration of the selected nodes in the run history"""
+    with RunHistory(palm_cache_dir() / HISTORY_DB) as history:
+        return history.average_durations([index.unique_ids[i] for i in selected])
+
+
+def run_stages(
+    environment,
+    stages: List[List[str]],
+    env_vars: Dict,
+    fail_fast: bool,
+    name: str,
+) -> Tuple[bool, str]:
+    """Run stages of concurrent dbt commands, one container per command
+
+    A stage starts once the previous one succeeded, any failure skips the later
+    stages. The run results of every command are merged into the local
+    run_results.json.
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        stages (List[List[str]]): The commands of each stage
+        env_vars (Dict): The dbt env vars
+        fail_fast (bool): Stop a stage's other commands when one fails
+        name (str): What a command is called in the output, e.g. "shard"
+
+    Returns:
+        Tuple[bool, str]: success, summary with each command's timing and statuses
+    """
+    started = time.monotonic()
+    runs = []
+    lines = []
+    for number, commands in enumerate(stages, start=1):
+        stage_name = name if len(stages) == 1 else f"wave_{number}_{name}"
+        stage_runs = run_dbt_parallel(
+            environment, commands, env_vars, fail_fast=fail_fast, name=stage_name
+        )
+        runs.extend(stage_runs)
+        for run in stage_runs:
+            lines.append(
+                f"{stage_name} {run.index}/{len(stage_runs)}: "
+                f"{run.seconds:.1f}s {_status_counts(run.run_results_path)}"
+            )
+        if not all(run.success for run in stage_runs):
+            skipped = len(stages) - number
+            if skipped:
+                lines.append(f"Skipped {skipped} later stage(s) after a failure")
+            break
+
+    merge_run_results(
+        [run.run_results_path for run in runs],
+        local_run_results_path(environment),
+        time.monotonic() - started,
+    )
+    expected = sum(len(commands) for commands in stages)
+    success = len(runs) == expected and all(run.success for run in runs)
+    status = "Success!" if success else "Fail!"
+    lines.append(f"{status} Palm ran {len(runs)} of {expected} {name}s")
+    return success, "\n".join(lines)
+
+
+def _status_counts(run_results_path) -> str:
+    if not run_results_path.exists():
+        return "no results"
+    counts = Counter(r.status for r in parse_run_results(run_results_path).results)
+    return " ".join(
+        f"{status.upper()}={count}" for status, count in sorted(counts.items())
+    )
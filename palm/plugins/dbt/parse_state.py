@@ -0,0 +1,140 @@
+import click
+import hashlib
+import re
+import shlex
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from palm.plugins.dbt.parsers import parse_project
+
+""" Keeps dbt's partial parse state in a docker volume between container runs """
+
+PARSE_STATE_VOLUME = "palm_dbt_parse_state"
+PARSE_STATE_MOUNT = "/palm_parse_state"
+# State unused for this long is removed by `palm cleanup`
+PARSE_STATE_MAX_AGE_DAYS = 14
+PARTIAL_PARSE_FILE = "partial_parse.msgpack"
+# Project files whose changes dbt can't partially parse anyway
+FINGERPRINT_FILES = ('.env', 'profiles.yml', 'dbt_project.yml')
+
+_START_PATTERN = re.compile(r"Running with dbt=")
+_MISS_PATTERN = re.compile(r"Unable to do partial parsing because (?P<reason>[^.]*)")
+_PARSED_PATTERN = re.compile(r"\bFound \d+ \w+")
+
+
+def parse_state_key(
+    dbt_version: Optional[str], env_vars: Dict, project_path: Path = Path('.')
+) -> str:
+    """Key the partial parse state by dbt version, profile and env
+
+    dbt discards partial parse state written for another profile, target or
+    set of env vars, so every branch schema and .env gets its own state
+    instead of overwriting each other's.
+
+    Args:
+        dbt_version (Optional[str]): The project's dbt version
+        env_vars (Dict): The env vars the command runs with, e.g. PDP_DEV_SCHEMA
+        project_path (Path): The dbt project directory
+
+    Returns:
+        str: A directory name for the state in the volume
+    """
+    fingerprint = hashlib.sha256()
+    for key, value in sorted(env_vars.items()):
+        fingerprint.update(f"{key.upper()}={value}\n".encode())
+    for name in FINGERPRINT_FILES:
+        path = project_path / name
+        if path.exists():
+            fingerprint.update(path.read_bytes())
+    return f"dbt-{dbt_version or 'unknown'}-{fingerprint.hexdigest()[:16]}"
+
+
+def parse_state_volume(image_name: str) -> str:
+    """The project's parse state volume, docker volumes are global"""
+    name = re.sub(r"[^0-9a-zA-Z_.-]+", "_", image_name).strip("_").lower()
+    return f"{PARSE_STATE_VOLUME}_{name}"
+
+
+def prune_parse_state_command(max_age_days: int = PARSE_STATE_MAX_AGE_DAYS) -> str:
+    """Remove the state of keys that weren't used for max_age_days
+
+    with_parse_state touches a key's directory whenever it is used.
+    """
+    return (
+        f"find {PARSE_STATE_MOUNT} -mindepth 1 -maxdepth 1 -type d "
+        f"-mtime +{int(max_age_days)} -exec rm -rf {{}} +"
+    )
+
+
+def with_parse_state(
+    cmd: str,
+    key: str,
+    project_path: Path = Path('.'),
+    target_path: Optional[str] = None,
+) -> str:
+    """Wrap a command to restore and save partial parse state around it
+
+    Args:
+        cmd (str): The command to run in the container
+        key (str): The state key from parse_state_key
+        project_path (Path): The dbt project directory
+        target_path (Optional[str]): dbt's target path, if it is overridden
+            with DBT_TARGET_PATH
+
+    Returns:
+        str: The wrapped command, it exits with the command's exit code
+    """
+    try:
+        project = parse_project(project_path / 'dbt_project.yml')
+    except FileNotFoundError:
+        return cmd
+    target_path = target_path or project.target_path
+    state_dir = shlex.quote(f"{PARSE_STATE_MOUNT}/{key}")
+    target_file = shlex.quote(f"{target_path}/{PARTIAL_PARSE_FILE}")
+    return (
+        f"mkdir -p {state_dir} {shlex.quote(target_path)}; touch {state_dir}; "
+        f"cp {state_dir}/{PARTIAL_PARSE_FILE} {target_file} 2>/dev/null; "
+        f"({cmd}); palm_exit_code=$?; "
+        f"cp {target_file} {state_dir}/ 2>/dev/null; "
+        f"exit $palm_exit_code"
+    )
+
+
+class ParseMonitor:
+    """Tracks dbt's parse step in the command output
+
+    A parse is a miss when dbt logs that it was unable to partially parse. It
+    takes from the "Running with dbt=" line to the "Found N models, ..." line.
+    """
+
+    def __init__(self):
+        self.parses: List[Dict] = []
+        self._current: Optional[Dict] = None
+
+    def __call__(self, line: str) -> None:
+        if _START_PATTERN.search(line):
+            self._current = {'started': time.monotonic(), 'miss': None}
+            return
+        if not self._current:
+            return
+        miss = _MISS_PATTERN.search(line)
+        if miss:
+            self._current['miss'] = miss.group('reason')
+        elif _PARSED_PATTERN.search(line):
+            self._current['seconds'] = time.monotonic() - self._current['started']
+            self.parses.append(self._current)
+            self._current = None
+
+    def report(self) -> None:
+        for parse in self.parses:
+            if parse['miss']:
+                click.secho(
+                    f"Partial parse: miss ({parse['miss']}), "
+                    f"parsed in {parse['seconds']:.1f}s",
+                    fg="yellow",
+                )
+            else:
+                click.secho(
+                    f"Partial parse: hit, parsed in {parse['seconds']:.1f}s", fg="cyan"
+                )
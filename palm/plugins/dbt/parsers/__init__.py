@@ -1,22 +1,98 @@
-from typing import Optional
+import hashlib
+import json
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
 from pathlib import Path
 import yaml
+from .manifest_parser import Manifest, read_manifest
 from .project_parser import Project
+from .run_results_parser import RunResults
+
+# libyaml's loader when PyYAML was built with it, several times faster
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+# Coarser than the mtime resolution of the file systems projects live on
+RACY_WINDOW_NS = 2_000_000_000
+
+
+class _CachedProject(NamedTuple):
+    signature: Tuple[int, int]
+    digest: bytes
+    project: Project
+    racy: bool
+
+
+_PROJECT_CACHE: Dict[str, _CachedProject] = {}
 
 
 def parse_project(project_path: Optional[Path] = Path("dbt_project.yml")) -> Project:
     """Parse the dbt project file
 
+    Parsed projects are cached per path, the file is only parsed again when
+    its content changes.
+
     Args:
         project_path (Path): Path to the dbt project file
 
     Returns:
-        Project: Parsed project file
+        Project: Parsed project file, shared with other callers
     """
 
-    if not project_path.exists():
-        raise FileNotFoundError(f"Could not find {project_path}")
+    try:
+        stat = project_path.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Could not find {project_path}") from None
+
+    key = str(project_path.resolve())
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _PROJECT_CACHE.get(key)
+    # A file written within the mtime resolution of the last read can change
+    # without its mtime changing, compare the content then
+    if cached and cached.signature == signature and not cached.racy:
+        return cached.project
 
-    config = yaml.safe_load(project_path.read_text())
-    project = Project(**config)
+    content = project_path.read_bytes()
+    digest = hashlib.sha256(content).digest()
+    if cached is None or cached.digest != digest:
+        project = Project(**(yaml.load(content, Loader=YAML_LOADER) or {}))
+    else:
+        project = cached.project
+    _PROJECT_CACHE[key] = _CachedProject(
+        signature,
+        digest,
+        project,
+        racy=time.time_ns() - stat.st_mtime_ns < RACY_WINDOW_NS,
+    )
     return project
+
+
+def parse_run_results(run_results_path: Path) -> RunResults:
+    """Parse a dbt run_results.json artifact
+
+    Args:
+        run_results_path (Path): Path to run_results.json
+
+    Returns:
+        RunResults: Parsed run results
+    """
+
+    if not run_results_path.exists():
+        raise FileNotFoundError(f"Could not find {run_results_path}")
+
+    return RunResults(**json.loads(run_results_path.read_text()))
+
+
+def parse_manifest(manifest_path: Path) -> Manifest:
+    """Parse a dbt manifest.json artifact
+
+    Args:
+        manifest_path (Path): Path to manifest.json
+
+    Returns:
+        Manifest: Parsed manifest
+    """
+
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"Could not find {manifest_path}")
+
+    with manifest_path.open(encoding='utf-8') as manifest_file:
+        return read_manifest(manifest_file)
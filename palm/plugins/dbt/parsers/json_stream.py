@@ -0,0 +1,99 @@
+import json
+from typing import Any, Iterator, TextIO
+
+""" Incremental JSON reading for artifacts too large to json.load at once """
+
+CHUNK_SIZE = 1024 * 1024
+WHITESPACE = ' \t\n\r'
+
+
+class JsonStreamReader:
+    """Reads a JSON document from a file one value at a time
+
+    Objects can be iterated key by key with `items()`, each value is then
+    either decoded with `value()`, iterated further, or skipped. Only the
+    unread part of the current chunk is kept in memory, so reading a large
+    object costs as much memory as its largest single value.
+    """
+
+    def __init__(self, file: TextIO, chunk_size: int = CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """Read the next chunk, returns False at the end of the file"""
+        if self.eof:
+            return False
+        data = self.file.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos :] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """The next non-whitespace character, '' at the end of the file"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos}, found '{found}'")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip(self) -> None:
+        """Skip the next value, objects are decoded one entry at a time"""
+        if self.peek() == '{':
+            for _ in self.items():
+                self.value()
+        else:
+            self.value()
+
+    def items(self) -> Iterator[str]:
+        """Iterate over the keys of the next object
+
+        The caller must read or skip each key's value before the next iteration.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            separator = self.peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(
+                    f"Expected ',' or '}}' at offset {self.pos - 1}, found '{separator}'"
+                )
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import sys
+from typing import Dict, List, TextIO
+from .json_stream import JsonStreamReader
+
+# Top-level manifest.json keys that hold graph nodes
+NODE_KEYS = ('nodes', 'sources', 'exposures', 'metrics', 'semantic_models')
+# Test config that changes what a generic test queries or how it is judged
+TEST_CONFIG_KEYS = (
+    'severity',
+    'where',
+    'limit',
+    'fail_calc',
+    'warn_if',
+    'error_if',
+    'store_failures',
+)
+
+
+class ManifestNode:
+    """A single node in manifest.json"""
+
+    __slots__ = (
+        'unique_id',
+        'resource_type',
+        'name',
+        'package_name',
+        'original_file_path',
+        'fqn',
+        'tags',
+        'materialized',
+        'checksum',
+        'depends_on',
+        'test_metadata',
+        'test_config',
+        'attached_node',
+        'compiled_checksum',
+        'config_checksum',
+        'relation',
+    )
+
+    def __init__(self, **data):
+        self.unique_id = data['unique_id']
+        # Interned, these repeat across thousands of nodes
+        self.resource_type = sys.intern(
+            data.get('resource_type') or self.unique_id.split('.')[0]
+        )
+        self.name = data.get('name') or self.unique_id.split('.')[-1]
+        self.package_name = _intern(data.get('package_name'))
+        self.original_file_path = data.get('original_file_path')
+        self.fqn = data.get('fqn') or []
+        self.tags = data.get('tags') or []
+        self.materialized = _intern((data.get('config') or {}).get('materialized'))
+        self.checksum = (data.get('checksum') or {}).get('checksum')
+        self.depends_on: List[str] = list(
+            (data.get('depends_on') or {}).get('nodes') or []
+        )
+        # Generic tests only: test name, namespace and kwargs, and their config
+        self.test_metadata = data.get('test_metadata')
+        self.test_config = None
+        if self.test_metadata:
+            config = data.get('config') or {}
+            self.test_config = {key: config.get(key) for key in TEST_CONFIG_KEYS}
+        self.attached_node = data.get('attached_node')
+        # sha256 of the compiled SQL, only in manifests written by dbt compile,
+        # run, test or build
+        compiled_code = data.get('compiled_code') or data.get('compiled_sql')
+        self.compiled_checksum = _sha256(compiled_code) if compiled_code else None
+        self.config_checksum = _sha256(
+            json.dumps(data.get('config') or {}, sort_keys=True, default=str)
+        )
+        # (database, schema, identifier) of nodes that are relations in the warehouse
+        self.relation = None
+        if data.get('schema') and self.materialized != 'ephemeral':
+            self.relation = (
+                data.get('database'),
+                data['schema'],
+                data.get('identifier') or data.get('alias') or self.name,
+            )
+
+
+class Manifest:
+    """manifest.json parser model
+
+    Only the parts of the manifest palm needs are kept, the full artifact of a
+    large project is hundreds of megabytes.
+    """
+
+    def __init__(self, **data):
+        self.set_metadata(data.get('metadata', {}))
+        self.nodes: Dict[str, ManifestNode] = {}
+        self._child_map = None
+        for key in NODE_KEYS:
+            for unique_id, node in (data.get(key) or {}).items():
+                self.add_node(unique_id, node)
+
+    def set_metadata(self, metadata: Dict) -> None:
+        self.dbt_version = metadata.get('dbt_version')
+        self.generated_at = metadata.get('generated_at')
+        self.project_name = metadata.get('project_name')
+
+    def add_node(self, unique_id: str, node: Dict) -> None:
+        node.setdefault('unique_id', unique_id)
+        self.nodes[unique_id] = ManifestNode(**node)
+        self._child_map = None
+
+    @property
+    def parent_map(self) -> Dict[str, List[str]]:
+        return {unique_id: node.depends_on for unique_id, node in self.nodes.items()}
+
+    @property
+    def child_map(self) -> Dict[str, List[str]]:
+        if self._child_map is None:
+            self._child_map = {unique_id: [] for unique_id in self.nodes}
+            for unique_id, node in self.nodes.items():
+                for parent in node.depends_on:
+                    self._child_map.setdefault(parent, []).append(unique_id)
+        return self._child_map
+
+
+def read_manifest(file: TextIO) -> Manifest:
+    """Read manifest.json one node at a time
+
+    Only metadata and the node sections are decoded, everything else (macros,
+    docs, disabled nodes, compiled SQL of other sections) is skipped entry by
+    entry. The parent and child maps are derived from the nodes' depends_on
+    rather than read, they hold the same edges. Peak memory is a small multiple
+    of the parsed nodes instead of the whole document.
+
+    Args:
+        file (TextIO): The open manifest.json
+
+    Returns:
+        Manifest: Parsed manifest
+    """
+    reader = JsonStreamReader(file)
+    manifest = Manifest()
+    for key in reader.items():
+        if key == 'metadata':
+            manifest.set_metadata(reader.value())
+        elif key in NODE_KEYS:
+            for unique_id in reader.items():
+                manifest.add_node(unique_id, reader.value())
+        else:
+            reader.skip()
+    return manifest
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
@@ -1,22 +1,180 @@
+import copy
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+# Resource types that take configs per path in dbt_project.yml
+RESOURCE_TYPES = (
+    'models',
+    'seeds',
+    'snapshots',
+    'tests',
+    'data_tests',
+    'sources',
+    'metrics',
+    'exposures',
+    'semantic-models',
+    'saved-queries',
+    'unit_tests',
+)
+# Configs that are merged down the path hierarchy instead of overridden
+APPENDED_CONFIGS = ('tags', 'pre-hook', 'post-hook')
+MERGED_CONFIGS = ('meta', 'grants', 'persist_docs', 'docs', 'contract', 'labels')
+
+
+def _paths(value: Union[str, List[str], None], default: List[str]) -> List[str]:
+    if value is None:
+        return list(default)
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
 class Project:
-    """Project parser model"""
+    """Project parser model
+
+    Every key of dbt_project.yml, with dbt's defaults. Path keys are always
+    lists. Instances are shared by parse_project's cache, do not modify them.
+    """
+
+    __slots__ = (
+        'name',
+        'version',
+        'profile',
+        'config_version',
+        'require_dbt_version',
+        'model_paths',
+        'macro_paths',
+        'seed_paths',
+        'snapshot_paths',
+        'analysis_paths',
+        'test_paths',
+        'asset_paths',
+        'docs_paths',
+        'packages_install_path',
+        'modules_path',
+        'target_path',
+        'log_path',
+        'clean_targets',
+        'vars',
+        'quoting',
+        'query_comment',
+        'on_run_start',
+        'on_run_end',
+        'dispatch',
+        'flags',
+        'restrict_access',
+        'resource_configs',
+        'config',
+    )
 
     def __init__(self, **data):
-        self.name = data['name']
-        self.version = data['version']
-        self.profile = data['profile']
-        self.config_version = data['config-version']
-        self.model_paths = data.get('model-paths', 'models')
-        self.macro_paths = data.get('macro-paths', 'macros')
-        self.seed_paths = data.get('seed-paths', 'seeds')
-        self.snapshot_paths = data.get('snapshot-paths', 'snapshots')
-        self.analysis_paths = data.get('analysis-paths', 'analysis')
-        self.test_paths = data.get('test-paths', 'tests')
-        self.packages_install_path = data.get('packages-install-path', 'packages')
+        self.name: Optional[str] = data.get('name')
+        self.version: Optional[str] = data.get('version')
+        self.profile: Optional[str] = data.get('profile')
+        self.config_version: int = data.get('config-version', 2)
+        self.require_dbt_version: List[str] = _as_list(data.get('require-dbt-version'))
+        self.model_paths = _paths(data.get('model-paths'), ['models'])
+        self.macro_paths = _paths(data.get('macro-paths'), ['macros'])
+        self.seed_paths = _paths(data.get('seed-paths'), ['seeds'])
+        self.snapshot_paths = _paths(data.get('snapshot-paths'), ['snapshots'])
+        self.analysis_paths = _paths(data.get('analysis-paths'), ['analysis'])
+        self.test_paths = _paths(data.get('test-paths'), ['tests'])
+        self.asset_paths = _paths(data.get('asset-paths'), [])
+        self.docs_paths = _paths(data.get('docs-paths'), [])
+        self.packages_install_path: str = data.get('packages-install-path', 'packages')
         # Supports dbt < 1.0.0 - this will be removed in an upcoming release
-        self.modules_path = data.get('modules-path', 'dbt_modules')
-        self.docs_paths = data.get('docs-paths', [])
-        self.vars = data.get('vars', {})
-        self.seeds = data.get('seeds', {})
-        self.models = data.get('models', {})
-        self.snapshots = data.get('snapshots', {})
+        self.modules_path: str = data.get('modules-path', 'dbt_modules')
+        self.target_path: str = data.get('target-path', 'target')
+        self.log_path: str = data.get('log-path', 'logs')
+        self.clean_targets = _paths(data.get('clean-targets'), [self.target_path])
+        self.vars: Dict[str, Any] = data.get('vars') or {}
+        self.quoting: Dict[str, bool] = data.get('quoting') or {}
+        self.query_comment: Union[str, Dict[str, Any], None] = data.get('query-comment')
+        self.on_run_start: List[str] = _as_list(data.get('on-run-start'))
+        self.on_run_end: List[str] = _as_list(data.get('on-run-end'))
+        self.dispatch: List[Dict[str, Any]] = data.get('dispatch') or []
+        self.flags: Dict[str, Any] = data.get('flags') or {}
+        self.restrict_access: bool = bool(data.get('restrict-access', False))
+        self.resource_configs: Dict[str, Dict[str, Any]] = {
+            resource_type: data.get(resource_type) or {}
+            for resource_type in RESOURCE_TYPES
+        }
+        self.config: Dict[str, Any] = data
+
+    @property
+    def models(self) -> Dict[str, Any]:
+        return self.resource_configs['models']
+
+    @property
+    def seeds(self) -> Dict[str, Any]:
+        return self.resource_configs['seeds']
+
+    @property
+    def snapshots(self) -> Dict[str, Any]:
+        return self.resource_configs['snapshots']
+
+    def to_dict(self) -> Dict[str, Any]:
+        """A copy of dbt_project.yml as it was read"""
+        return copy.deepcopy(self.config)
+
+    def resolved_config(self, resource_type: str, fqn: Sequence[str]) -> Dict[str, Any]:
+        """The configs dbt_project.yml sets for a node
+
+        Configs set for a directory apply to everything below it, deeper
+        ones win. Tags and hooks add up, dict configs like meta are merged.
+
+        Args:
+            resource_type (str): The dbt_project.yml key, e.g. 'models'
+            fqn (Sequence[str]): The node's fqn, package name, directories
+                and node name, e.g. ['my_project', 'staging', 'stg_orders']
+
+        Returns:
+            Dict[str, Any]: Config name, without the '+' prefix -> value
+        """
+        resolved: Dict[str, Any] = {}
+        level = self.resource_configs.get(resource_type) or {}
+        for part in [None, *fqn]:
+            if part is not None:
+                level = level.get(part)
+                if not isinstance(level, dict):
+                    break
+            for key, value in level.items():
+                if not key.startswith('+') and (
+                    isinstance(value, dict) and key not in MERGED_CONFIGS
+                ):
+                    # A directory or node below this level
+                    continue
+                _merge_config(resolved, key.lstrip('+'), value)
+        return resolved
+
+    def model_config(self, model_path: Union[str, Sequence[str]]) -> Dict[str, Any]:
+        """The configs dbt_project.yml sets for a model file of this project
+
+        Args:
+            model_path: The model's path in the project, e.g.
+                'models/staging/stg_orders.sql'
+
+        Returns:
+            Dict[str, Any]: Config name -> value, see resolved_config
+        """
+        parts = model_path.split('/') if isinstance(model_path, str) else model_path
+        parts = [part for part in parts if part not in ('', '.')]
+        for model_dir in self.model_paths:
+            prefix = [part for part in model_dir.split('/') if part not in ('', '.')]
+            if parts[: len(prefix)] == prefix:
+                parts = parts[len(prefix) :]
+                break
+        name = parts[-1].rsplit('.', 1)[0]
+        return self.resolved_config('models', [self.name, *parts[:-1], name])
+
+
+def _merge_config(resolved: Dict[str, Any], key: str, value: Any) -> None:
+    if key in APPENDED_CONFIGS:
+        resolved[key] = [*resolved.get(key, []), *_as_list(value)]
+    elif key in MERGED_CONFIGS and isinstance(value, dict):
+        resolved[key] = {**resolved.get(key, {}), **value}
+    else:
+        resolved[key] = value
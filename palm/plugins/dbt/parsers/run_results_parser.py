@@ -0,0 +1,56 @@
+import hashlib
+from typing import List, Optional
+
+
+class NodeResult:
+    """A single node's entry in run_results.json"""
+
+    __slots__ = (
+        'unique_id',
+        'status',
+        'execution_time',
+        'thread_id',
+        'message',
+        'compiled_checksum',
+    )
+
+    def __init__(self, **data):
+        self.unique_id = data['unique_id']
+        self.status = str(data.get('status'))
+        self.execution_time = float(data.get('execution_time') or 0.0)
+        self.thread_id = data.get('thread_id')
+        self.message = data.get('message')
+        # sha256 of the compiled SQL, written since dbt 1.5
+        compiled_code = data.get('compiled_code')
+        self.compiled_checksum = (
+            hashlib.sha256(compiled_code.encode()).hexdigest()
+            if compiled_code
+            else None
+        )
+
+    @property
+    def resource_type(self) -> str:
+        return self.unique_id.split('.')[0]
+
+    @property
+    def name(self) -> str:
+        return self.unique_id.split('.')[-1]
+
+
+class RunResults:
+    """run_results.json parser model"""
+
+    def __init__(self, **data):
+        metadata = data.get('metadata', {})
+        self.dbt_version = metadata.get('dbt_version')
+        self.generated_at = metadata.get('generated_at')
+        self.invocation_id = metadata.get('invocation_id')
+        self.elapsed_time = float(data.get('elapsed_time') or 0.0)
+        self.args = data.get('args', {})
+        self.results: List[NodeResult] = [
+            NodeResult(**result) for result in data.get('results', [])
+        ]
+
+    @property
+    def command(self) -> Optional[str]:
+        return self.args.get('which')
@@ -0,0 +1,211 @@
+import heapq
+from typing import Dict, List, Optional, Sequence
+
+from palm.plugins.dbt.manifest_index import ManifestIndex
+
+""" Splits a selection into partitions that can run in parallel dbt processes """
+
+DEFAULT_DURATION = 1.0
+# Seconds to start a container and parse the project, paid by every stage
+STAGE_OVERHEAD = 15.0
+
+
+class SplitPlan:
+    """Stages of partitions; the partitions of a stage run concurrently and each
+    stage starts once the previous one has finished
+
+    Each partition is a list of node positions in the manifest index.
+    """
+
+    def __init__(self, strategy: str, stages: List[List[List[int]]]):
+        self.strategy = strategy
+        self.stages = stages
+
+    @property
+    def partition_count(self) -> int:
+        return sum(len(stage) for stage in self.stages)
+
+    def __repr__(self) -> str:
+        return (
+            f"SplitPlan({self.strategy}, {len(self.stages)} stages, "
+            f"{self.partition_count} partitions)"
+        )
+
+
+def balance(
+    items: Sequence[int], weights: Sequence[float], bins: int
+) -> List[List[int]]:
+    """Longest processing time first: assign the heaviest remaining item to the
+    lightest bin
+
+    Args:
+        items (Sequence[int]): The items to distribute
+        weights (Sequence[float]): Weight of each item, in the same order
+        bins (int): Number of bins
+
+    Returns:
+        List[List[int]]: The non-empty bins, heaviest first
+    """
+    heap = [(0.0, i, []) for i in range(max(bins, 1))]
+    for weight, item in sorted(zip(weights, items), reverse=True):
+        total, i, assigned = heapq.heappop(heap)
+        assigned.append(item)
+        heapq.heappush(heap, (total + weight, i, assigned))
+    return [
+        assigned
+        for _, _, assigned in sorted(heap, key=lambda entry: (-entry[0], entry[1]))
+        if assigned
+    ]
+
+
+def selected_parents(index: ManifestIndex, selected: Sequence[int]) -> Dict[int, set]:
+    """Closest selected ancestors of each selected node
+
+    dbt keeps the dependencies between selected nodes when the nodes between
+    them are not selected, so they pass through unselected nodes here too.
+    """
+    selected_set = set(selected)
+    parents = {}
+    for i in selected:
+        found = set()
+        seen = set()
+        stack = list(index.parents(i))
+        while stack:
+            parent = stack.pop()
+            if parent in seen:
+                continue
+            seen.add(parent)
+            if parent in selected_set:
+                found.add(parent)
+            else:
+                stack.extend(index.parents(parent))
+        parents[i] = found
+    return parents
+
+
+def plan_split(
+    index: ManifestIndex,
+    selected: Sequence[int],
+    partitions: int,
+    durations: Optional[Dict[str, float]] = None,
+) -> SplitPlan:
+    """Partition a selection without breaking its dependencies
+
+    Connected components of the selected subgraph don't depend on each other,
+    they are balanced over the partitions and all run at once. When one
+    component dominates the selection, the nodes can be run in waves by their
+    depth in the subgraph instead: the nodes of a wave only depend on earlier
+    waves, so each wave is balanced over the partitions. Whichever plan is
+    expected to finish first is used, counting STAGE_OVERHEAD for every wave.
+
+    Args:
+        index (ManifestIndex): Index of the manifest
+        selected (Sequence[int]): Positions of the selected nodes
+        partitions (int): Maximum number of concurrent partitions
+        durations (Optional[Dict[str, float]]): Expected seconds per unique_id,
+            e.g. the average from the run history
+
+    Returns:
+        SplitPlan: The stages to run
+    """
+    if not selected:
+        return SplitPlan('components', [])
+    durations = durations or {}
+    weight = {
+        i: durations.get(index.unique_ids[i]) or DEFAULT_DURATION for i in selected
+    }
+    parents = selected_parents(index, selected)
+
+    components = _components(selected, parents)
+    component_weights = [sum(weight[i] for i in c) for c in components]
+    bins = balance(range(len(components)), component_weights, partitions)
+    stage = [sorted(i for c in b for i in components[c]) for b in bins]
+    plan = SplitPlan('components', [stage])
+
+    waves = _waves(selected, parents, weight, partitions)
+    if len(waves) > 1 and _makespan(waves, weight) < _makespan([stage], weight):
+        plan = SplitPlan('waves', waves)
+    return plan
+
+
+def shard_tests(
+    index: ManifestIndex,
+    selected: Sequence[int],
+    shards: int,
+    durations: Optional[Dict[str, float]] = None,
+) -> List[List[int]]:
+    """Balance independent nodes, e.g. tests, over shards by expected duration
+
+    Args:
+        index (ManifestIndex): Index of the manifest
+        selected (Sequence[int]): Positions of the selected nodes
+        shards (int): Number of shards
+        durations (Optional[Dict[str, float]]): Expected seconds per unique_id
+
+    Returns:
+        List[List[int]]: The non-empty shards, slowest first
+    """
+    durations = durations or {}
+    weights = [durations.get(index.unique_ids[i]) or DEFAULT_DURATION for i in selected]
+    return [sorted(shard) for shard in balance(selected, weights, shards)]
+
+
+def _makespan(stages: List[List[List[int]]], weight: Dict[int, float]) -> float:
+    """Expected wall time of a plan, each stage lasts as long as its slowest partition"""
+    return sum(
+        STAGE_OVERHEAD + max(sum(weight[i] for i in partition) for partition in stage)
+        for stage in stages
+    )
+
+
+def _components(selected: Sequence[int], parents: Dict[int, set]) -> List[List[int]]:
+    """Weakly connected components of the selected subgraph"""
+    root = {i: i for i in selected}
+
+    def find(i: int) -> int:
+        while root[i] != i:
+            root[i] = root[root[i]]
+            i = root[i]
+        return i
+
+    for i, node_parents in parents.items():
+        for parent in node_parents:
+            root[find(i)] = find(parent)
+
+    components: Dict[int, List[int]] = {}
+    for i in selected:
+        components.setdefault(find(i), []).append(i)
+    return list(components.values())
+
+
+def _waves(
+    selected: Sequence[int],
+    parents: Dict[int, set],
+    weight: Dict[int, float],
+    partitions: int,
+) -> List[List[List[int]]]:
+    """Group nodes by their depth in the subgraph, then balance each depth"""
+    depth: Dict[int, int] = {}
+    for i in selected:
+        stack = [i]
+        while stack:
+            node = stack[-1]
+            pending = [p for p in parents[node] if p not in depth]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            depth[node] = 1 + max((depth[p] for p in parents[node]), default=-1)
+
+    levels: Dict[int, List[int]] = {}
+    for i in selected:
+        levels.setdefault(depth[i], []).append(i)
+    return [
+        [
+            sorted(b)
+            for b in balance(
+                levels[level], [weight[i] for i in levels[level]], partitions
+            )
+        ]
+        for level in sorted(levels)
+    ]
@@ -0,0 +1,199 @@
+from typing import Dict, List, Optional, Set
+
+from palm.plugins.dbt.parsers import Manifest, RunResults
+
+
+class PathNode:
+    """Scheduling metrics of a node that ran in the invocation"""
+
+    __slots__ = (
+        'unique_id',
+        'execution_time',
+        'parents',
+        'children',
+        'earliest_start',
+        'latest_start',
+        'downstream',
+    )
+
+    def __init__(self, unique_id: str, execution_time: float):
+        self.unique_id = unique_id
+        self.execution_time = execution_time
+        self.parents: List[str] = []
+        self.children: List[str] = []
+        self.earliest_start = 0.0
+        self.latest_start = 0.0
+        self.downstream = 0
+
+    @property
+    def earliest_finish(self) -> float:
+        return self.earliest_start + self.execution_time
+
+    @property
+    def slack(self) -> float:
+        """How long the node could be delayed without delaying the invocation"""
+        return max(self.latest_start - self.earliest_start, 0.0)
+
+    @property
+    def fan_in(self) -> int:
+        return len(self.parents)
+
+    @property
+    def fan_out(self) -> int:
+        return len(self.children)
+
+    @property
+    def blocked_time(self) -> float:
+        """Execution time multiplied by the number of nodes waiting on it"""
+        return self.execution_time * self.downstream
+
+
+class CriticalPathAnalysis:
+    """Longest weighted path through the DAG of a dbt invocation
+
+    Joins the dependency graph from manifest.json with the execution times in
+    run_results.json. Only nodes that ran are scheduled, a node that was not
+    selected passes its dependencies through to its children, like dbt does
+    when it builds the graph of a selection.
+
+    With unlimited threads the invocation can't finish faster than the
+    critical path, so shortening the nodes on it is what cuts wall time.
+    """
+
+    def __init__(self, manifest: Manifest, run_results: RunResults):
+        self.run_results = run_results
+        self.nodes: Dict[str, PathNode] = {
+            r.unique_id: PathNode(r.unique_id, r.execution_time)
+            for r in run_results.results
+        }
+        for unique_id, node in self.nodes.items():
+            node.parents = sorted(self._executed_parents(manifest, unique_id))
+            for parent in node.parents:
+                self.nodes[parent].children.append(unique_id)
+
+        self.order = self._topological_order()
+        self._schedule()
+
+    def _executed_parents(self, manifest: Manifest, unique_id: str) -> Set[str]:
+        """Closest ancestors of a node that ran in the invocation"""
+        parents = set()
+        seen = set()
+        manifest_node = manifest.nodes.get(unique_id)
+        stack = list(manifest_node.depends_on) if manifest_node else []
+        while stack:
+            parent = stack.pop()
+            if parent in seen:
+                continue
+            seen.add(parent)
+            if parent in self.nodes:
+                parents.add(parent)
+            elif parent in manifest.nodes:
+                stack.extend(manifest.nodes[parent].depends_on)
+        return parents
+
+    def _topological_order(self) -> List[str]:
+        remaining = {unique_id: node.fan_in for unique_id, node in self.nodes.items()}
+        ready = sorted(unique_id for unique_id, count in remaining.items() if not count)
+        order = []
+        while ready:
+            unique_id = ready.pop()
+            order.append(unique_id)
+            for child in self.nodes[unique_id].children:
+                remaining[child] -= 1
+                if not remaining[child]:
+                    ready.append(child)
+        if len(order) != len(self.nodes):
+            raise ValueError("The manifest's dependency graph contains a cycle")
+        return order
+
+    def _schedule(self) -> None:
+        for unique_id in self.order:
+            node = self.nodes[unique_id]
+            node.earliest_start = max(
+                (self.nodes[p].earliest_finish for p in node.parents), default=0.0
+            )
+
+        length = self.length
+        # Descendants of each node as a bitset over positions in self.order,
+        # built from the children's, which come later in the order
+        position = {unique_id: i for i, unique_id in enumerate(self.order)}
+        descendants: Dict[str, int] = {}
+        for unique_id in reversed(self.order):
+            node = self.nodes[unique_id]
+            latest_finish = min(
+                (self.nodes[c].latest_start for c in node.children),
+                default=length,
+            )
+            node.latest_start = latest_finish - node.execution_time
+            below = 0
+            for child in node.children:
+                below |= descendants[child] | (1 << position[child])
+            descendants[unique_id] = below
+            node.downstream = bin(below).count('1')
+
+    @property
+    def length(self) -> float:
+        """Duration of the critical path in seconds"""
+        return max((node.earliest_finish for node in self.nodes.values()), default=0.0)
+
+    @property
+    def thread_time(self) -> float:
+        return sum(node.execution_time for node in self.nodes.values())
+
+    @property
+    def critical_path(self) -> List[PathNode]:
+        """Nodes on the longest path, in execution order"""
+        if not self.nodes:
+            return []
+        node = max(self.nodes.values(), key=lambda n: n.earliest_finish)
+        path = [node]
+        while node.parents:
+            node = max(
+                (self.nodes[p] for p in node.parents), key=lambda n: n.earliest_finish
+            )
+            path.append(node)
+        return list(reversed(path))
+
+    def bottlenecks(self, limit: Optional[int] = 10) -> List[PathNode]:
+        """Nodes that hold up the most downstream work
+
+        Ranked by execution time times the number of nodes downstream of them,
+        zero-slack nodes with a high fan-in or fan-out serialize the thread pool.
+        """
+        ranked = sorted(
+            (node for node in self.nodes.values() if node.downstream),
+            key=lambda n: (n.blocked_time, n.fan_out + n.fan_in),
+            reverse=True,
+        )
+        return ranked[:limit]
+
+    def format_report(self, limit: Optional[int] = 10) -> str:
+        """Render the critical path and the bottlenecks as plain text tables"""
+        path = self.critical_path
+        lines = [f"{'start (s)':>10}  {'time (s)':>9}  critical path"]
+        for node in path:
+            lines.append(
+                f"{node.earliest_start:>10.2f}  {node.execution_time:>9.2f}  "
+                f"{node.unique_id}"
+            )
+        lines.append(
+            f"{len(path)} of {len(self.nodes)} nodes on the critical path | "
+            f"critical path {self.length:.2f}s | "
+            f"wall time {self.run_results.elapsed_time:.2f}s | "
+            f"thread time {self.thread_time:.2f}s"
+        )
+
+        bottlenecks = self.bottlenecks(limit)
+        if bottlenecks:
+            lines.append("")
+            lines.append(
+                f"{'time (s)':>9}  {'slack (s)':>9}  {'fan-in':>6}  {'fan-out':>7}  "
+                f"{'downstream':>10}  bottleneck"
+            )
+            for node in bottlenecks:
+                lines.append(
+                    f"{node.execution_time:>9.2f}  {node.slack:>9.2f}  "
+                    f"{node.fan_in:>6}  {node.fan_out:>7}  {node.downstream:>10}  "
+                    f"{node.unique_id}"
+                )
+        return "\n".join(lines)
@@ -0,0 +1,219 @@
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from palm.plugins.dbt.parsers import RunResults
+
+HISTORY_DB = "run_history.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    invocation_id TEXT UNIQUE,
+    generated_at TEXT NOT NULL,
+    command TEXT,
+    branch TEXT,
+    dbt_version TEXT,
+    selection TEXT,
+    elapsed_time REAL
+);
+CREATE TABLE IF NOT EXISTS node_results (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    node_id TEXT NOT NULL,
+    node_name TEXT NOT NULL,
+    status TEXT,
+    execution_time REAL,
+    thread_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_generated_at ON runs (generated_at);
+CREATE INDEX IF NOT EXISTS idx_node_results_node_run ON node_results (node_id, run_id);
+CREATE INDEX IF NOT EXISTS idx_node_results_name ON node_results (node_name);
+CREATE INDEX IF NOT EXISTS idx_node_results_run ON node_results (run_id);
+"""
+
+# ROW_NUMBER() needs SQLite 3.25, older Python builds may link an earlier one
+WINDOW_FUNCTIONS = sqlite3.sqlite_version_info >= (3, 25, 0)
+
+
+def _ranked_results() -> str:
+    """SQL for the successful node results, ranked per node by recency
+
+    The latest run of a node has recency 1. Without window functions the
+    rank is counted with a correlated subquery, which gives the same order.
+    """
+    if WINDOW_FUNCTIONS:
+        recency = """ROW_NUMBER() OVER (
+                PARTITION BY n.node_id ORDER BY r.generated_at DESC, n.rowid DESC
+            )"""
+    else:
+        recency = """1 + (
+                SELECT COUNT(*) FROM node_results n2 JOIN runs r2 ON r2.id = n2.run_id
+                WHERE n2.node_id = n.node_id
+                AND n2.status IN ('success', 'pass')
+                AND (
+                    r2.generated_at > r.generated_at
+                    OR (r2.generated_at = r.generated_at AND n2.rowid > n.rowid)
+                )
+            )"""
+    return f"""
+        SELECT n.node_id, n.execution_time, r.generated_at, {recency} AS recency
+        FROM node_results n JOIN runs r ON r.id = n.run_id
+        WHERE n.status IN ('success', 'pass')
+    """
+
+
+class RunHistory:
+    """Local SQLite store of every dbt invocation's run_results.json
+
+    Runs are keyed by dbt's invocation_id, so recording the same artifact
+    twice is a no-op. Node timings are indexed by node id and run, so trend
+    queries stay fast after thousands of runs.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(_SCHEMA)
+
+    def __enter__(self) -> "RunHistory":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def record(
+        self,
+        run_results: RunResults,
+        branch: Optional[str] = None,
+        dbt_version: Optional[str] = None,
+        selection: Optional[Dict] = None,
+    ) -> Optional[int]:
+        """Append a run to the history
+
+        Args:
+            run_results (RunResults): The parsed run_results.json
+            branch (Optional[str]): The git branch the run was on
+            dbt_version (Optional[str]): The dbt version from the plugin config
+            selection (Optional[Dict]): The selection arguments of the run
+
+        Returns:
+            Optional[int]: The run id, None if the run was already recorded
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO runs (invocation_id, generated_at, command, "
+                "branch, dbt_version, selection, elapsed_time) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_results.invocation_id,
+                    run_results.generated_at,
+                    run_results.command,
+                    branch,
+                    dbt_version or run_results.dbt_version,
+                    json.dumps(selection or {}, sort_keys=True),
+                    run_results.elapsed_time,
+                ),
+            )
+            if not cursor.rowcount:
+                return None
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO node_results (run_id, node_id, node_name, status, "
+                "execution_time, thread_id) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id,
+                        r.unique_id,
+                        r.name,
+                        r.status,
+                        r.execution_time,
+                        r.thread_id,
+                    )
+                    for r in run_results.results
+                ],
+            )
+        return run_id
+
+    def node_history(self, node: str, limit: int = 20) -> List[sqlite3.Row]:
+        """Duration trend of a single node, most recent run first
+
+        Args:
+            node (str): A unique_id, or a node name which matches any resource type
+            limit (int): Number of runs to return
+        """
+        return self.conn.execute(
+            "SELECT r.generated_at, r.branch, r.dbt_version, r.command, "
+            "n.node_id, n.status, n.execution_time "
+            "FROM node_results n JOIN runs r ON r.id = n.run_id "
+            "WHERE n.node_id = ? OR n.node_name = ? "
+            "ORDER BY r.generated_at DESC LIMIT ?",
+            (node, node, limit),
+        ).fetchall()
+
+    def average_durations(
+        self, node_ids: Optional[List[str]] = None, window: int = 10
+    ) -> Dict[str, float]:
+        """Average execution time of each node over its latest successful runs
+
+        Args:
+            node_ids (Optional[List[str]]): Only these nodes, all nodes if None
+            window (int): Number of recent runs to average
+
+        Returns:
+            Dict[str, float]: unique_id -> average seconds, for nodes with history
+        """
+        rows = self.conn.execute(
+            f"""
+            WITH ranked AS ({_ranked_results()})
+            SELECT node_id, AVG(execution_time) AS avg_time
+            FROM ranked WHERE recency <= ?
+            GROUP BY node_id
+            """,
+            (window,),
+        ).fetchall()
+        durations = {row['node_id']: row['avg_time'] for row in rows}
+        if node_ids is not None:
+            wanted = set(node_ids)
+            durations = {k: v for k, v in durations.items() if k in wanted}
+        return durations
+
+    def top_regressions(
+        self, limit: int = 10, window: int = 10, min_time: float = 1.0
+    ) -> List[sqlite3.Row]:
+        """Nodes whose latest successful run is slowest relative to their history
+
+        The latest execution time of each node is compared with the average of
+        its previous `window` successful runs.
+
+        Args:
+            limit (int): Number of nodes to return
+            window (int): Number of earlier runs to compare against
+            min_time (float): Ignore nodes faster than this, in seconds
+        """
+        return self.conn.execute(
+            f"""
+            WITH ranked AS ({_ranked_results()}),
+            latest AS (
+                SELECT node_id, execution_time, generated_at
+                FROM ranked WHERE recency = 1
+            ),
+            baseline AS (
+                SELECT node_id, AVG(execution_time) AS avg_time, COUNT(*) AS runs
+                FROM ranked WHERE recency BETWEEN 2 AND ? + 1
+                GROUP BY node_id
+            )
+            SELECT l.node_id, l.generated_at, l.execution_time AS latest_time,
+                   b.avg_time AS baseline_time, b.runs AS baseline_runs,
+                   l.execution_time / b.avg_time AS ratio
+            FROM latest l JOIN baseline b ON b.node_id = l.node_id
+            WHERE l.execution_time >= ? AND b.avg_time > 0
+            ORDER BY ratio DESC
+            LIMIT ?
+            """,
+            (window, min_time, limit),
+        ).fetchall()
@@ -0,0 +1,124 @@
+from pathlib import Path
+from typing import List, Optional
+
+from palm.plugins.dbt.parsers import RunResults
+
+PROD_BASELINE = "prod"
+RUN_RESULTS_FILE = "run_results.json"
+# Only successful nodes have comparable timings
+COMPARABLE_STATUSES = ('success', 'pass')
+
+
+class NodeComparison:
+    """Execution time of a node in the current run vs. the baseline"""
+
+    __slots__ = ('unique_id', 'baseline_time', 'current_time', 'regressed')
+
+    def __init__(self, unique_id: str, baseline_time: float, current_time: float):
+        self.unique_id = unique_id
+        self.baseline_time = baseline_time
+        self.current_time = current_time
+        self.regressed = False
+
+    @property
+    def delta(self) -> float:
+        return self.current_time - self.baseline_time
+
+    @property
+    def ratio(self) -> float:
+        if not self.baseline_time:
+            return float('inf') if self.current_time else 1.0
+        return self.current_time / self.baseline_time
+
+
+class RegressionReport:
+    """Compares each node's execution time with a baseline run
+
+    A node has regressed when it takes at least `min_time` seconds and it is
+    either more than `max_ratio` times slower than the baseline, or more than
+    `max_increase` seconds slower.
+    """
+
+    def __init__(
+        self,
+        current: RunResults,
+        baseline: RunResults,
+        max_ratio: float = 2.0,
+        max_increase: Optional[float] = None,
+        min_time: float = 1.0,
+    ):
+        self.max_ratio = max_ratio
+        self.max_increase = max_increase
+        self.min_time = min_time
+        baseline_times = {
+            r.unique_id: r.execution_time
+            for r in baseline.results
+            if r.status in COMPARABLE_STATUSES
+        }
+        self.comparisons: List[NodeComparison] = []
+        for result in current.results:
+            if result.status not in COMPARABLE_STATUSES:
+                continue
+            if result.unique_id not in baseline_times:
+                continue
+            comparison = NodeComparison(
+                result.unique_id,
+                baseline_times[result.unique_id],
+                result.execution_time,
+            )
+            comparison.regressed = self._is_regression(comparison)
+            self.comparisons.append(comparison)
+        self.comparisons.sort(key=lambda c: c.delta, reverse=True)
+
+    def _is_regression(self, comparison: NodeComparison) -> bool:
+        if comparison.current_time < self.min_time:
+            return False
+        if comparison.ratio > self.max_ratio:
+            return True
+        return self.max_increase is not None and comparison.delta > self.max_increase
+
+    @property
+    def regressions(self) -> List[NodeComparison]:
+        return [c for c in self.comparisons if c.regressed]
+
+    def format_diff(self, limit: Optional[int] = 10) -> str:
+        """Regressed nodes, or the largest changes if nothing regressed"""
+        shown = self.regressions or self.comparisons[:limit]
+        lines = [f"{'baseline':>9}  {'current':>9}  {'change':>8}  node"]
+        for c in shown:
+            marker = "!" if c.regressed else " "
+            lines.append(
+                f"{c.baseline_time:>8.2f}s  {c.current_time:>8.2f}s  "
+                f"{c.ratio:>7.2f}x {marker} {c.unique_id}"
+            )
+        thresholds = [f"max ratio {self.max_ratio}x"]
+        if self.max_increase is not None:
+            thresholds.append(f"max increase {self.max_increase}s")
+        thresholds.append(f"ignoring nodes under {self.min_time}s")
+        lines.append(
+            f"{len(self.regressions)} of {len(self.comparisons)} comparable nodes "
+            f"regressed ({', '.join(thresholds)})"
+        )
+        return "\n".join(lines)
+
+
+def resolve_baseline_path(baseline: str, prod_artifacts: Optional[str]) -> Path:
+    """Resolve --perf-baseline to a run_results.json path
+
+    Args:
+        baseline (str): 'prod', a run_results.json file or an artifacts directory
+        prod_artifacts (Optional[str]): dbt_artifacts_prod from the plugin config
+
+    Returns:
+        Path: Path to the baseline run_results.json
+    """
+    if baseline == PROD_BASELINE:
+        if not prod_artifacts:
+            raise FileNotFoundError(
+                "dbt_artifacts_prod is not configured, can't use the prod baseline"
+            )
+        return Path(prod_artifacts, RUN_RESULTS_FILE)
+    path = Path(baseline)
+    if path.is_dir():
+        return path / RUN_RESULTS_FILE
+    return path
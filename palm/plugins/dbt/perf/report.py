@@ -0,0 +1,114 @@
+import csv
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from palm.plugins.dbt.parsers import RunResults
+
+REPORT_FIELDS = [
+    'rank',
+    'unique_id',
+    'resource_type',
+    'status',
+    'execution_time',
+    'share_of_thread_time',
+    'thread_id',
+]
+
+
+class TimingReport:
+    """Per-node timing report for a single dbt invocation
+
+    Nodes are ranked by execution time. The summary compares the total time
+    spent by all threads with the wall-clock time of the invocation, the ratio
+    of the two is the parallelism dbt actually achieved.
+    """
+
+    def __init__(self, run_results: RunResults):
+        self.run_results = run_results
+        self.results = sorted(
+            run_results.results, key=lambda r: r.execution_time, reverse=True
+        )
+
+    @property
+    def thread_time(self) -> float:
+        return sum(result.execution_time for result in self.results)
+
+    @property
+    def wall_time(self) -> float:
+        return self.run_results.elapsed_time
+
+    @property
+    def threads(self) -> int:
+        return len({r.thread_id for r in self.results if r.thread_id})
+
+    @property
+    def parallelism(self) -> float:
+        if not self.wall_time:
+            return 0.0
+        return self.thread_time / self.wall_time
+
+    def rows(self, limit: Optional[int] = None) -> List[Dict]:
+        """Ranked report rows, slowest first
+
+        Args:
+            limit (Optional[int]): Only return the slowest `limit` nodes
+
+        Returns:
+            List[Dict]: One dict per node, keyed by REPORT_FIELDS
+        """
+        thread_time = self.thread_time or 1.0
+        return [
+            {
+                'rank': rank,
+                'unique_id': result.unique_id,
+                'resource_type': result.resource_type,
+                'status': result.status,
+                'execution_time': round(result.execution_time, 3),
+                'share_of_thread_time': round(result.execution_time / thread_time, 4),
+                'thread_id': result.thread_id,
+            }
+            for rank, result in enumerate(self.results[:limit], start=1)
+        ]
+
+    def summary(self) -> Dict:
+        return {
+            'invocation_id': self.run_results.invocation_id,
+            'command': self.run_results.command,
+            'nodes': len(self.results),
+            'thread_time': round(self.thread_time, 3),
+            'wall_time': round(self.wall_time, 3),
+            'threads': self.threads,
+            'parallelism': round(self.parallelism, 2),
+        }
+
+    def format_table(self, limit: Optional[int] = 10) -> str:
+        """Render the slowest nodes and the summary as a plain text table"""
+        rows = self.rows(limit)
+        name_width = max([len(r['unique_id']) for r in rows] + [4])
+        lines = [
+            f"{'#':>3}  {'node':<{name_width}}  {'status':<8}  {'time (s)':>9}  {'share':>6}"
+        ]
+        for row in rows:
+            lines.append(
+                f"{row['rank']:>3}  {row['unique_id']:<{name_width}}  "
+                f"{row['status']:<8}  {row['execution_time']:>9.2f}  "
+                f"{row['share_of_thread_time']:>6.1%}"
+            )
+        summary = self.summary()
+        lines.append(
+            f"{summary['nodes']} nodes | thread time {summary['thread_time']:.2f}s | "
+            f"wall time {summary['wall_time']:.2f}s | "
+            f"parallelism {summary['parallelism']:.2f}x on {summary['threads']} threads"
+        )
+        return "\n".join(lines)
+
+    def to_json(self, path: Path, limit: Optional[int] = None) -> None:
+        report = {'summary': self.summary(), 'nodes': self.rows(limit)}
+        Path(path).write_text(json.dumps(report, indent=2))
+
+    def to_csv(self, path: Path, limit: Optional[int] = None) -> None:
+        with Path(path).open('w', newline='') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.rows(limit))
@@ -2,29 +2,34 @@ import click
 
 from typing import Optional
 from pathlib import Path
-import yaml
-import semver
 from pydantic import BaseModel, Field
 from palm.plugins.base_plugin_config import BasePluginConfig
 from palm.plugins.dbt.dbt_version_detection import dbt_version_factory, get_dbt_version
 
 
+def _parse_version(version: str):
+    # semver is imported on first use, not on every palm invocation
+    from semver import Version
+
+    return Version.parse(version)
+
+
 class dbtPluginConfigModel(BaseModel):
     dbt_artifacts_prod: Optional[str]
     dbt_artifacts_local: str
     dbt_version: str = Field(default_factory=dbt_version_factory)
 
     def dbt_version_semver(self) -> str:
-        return semver.Version.parse(self.dbt_version)
+        return _parse_version(self.dbt_version)
 
     def is_dbt_version_greater_than(self, version: str, or_equal: bool = True) -> bool:
-        target_version = semver.Version.parse(version)
+        target_version = _parse_version(version)
         if or_equal:
             return self.dbt_version_semver() >= target_version
         return self.dbt_version_semver() > target_version
 
     def is_dbt_version_less_than(self, version: str, or_equal: bool = True) -> bool:
-        target_version = semver.Version.parse(version)
+        target_version = _parse_version(version)
         if or_equal:
             return self.dbt_version_semver() <= target_version
         return self.dbt_version_semver() < target_version
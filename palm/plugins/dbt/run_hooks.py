@@ -0,0 +1,224 @@
+import click
+import json
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from palm.plugins.dbt.parsers import RunResults, parse_run_results
+from palm.plugins.dbt.dbt_palm_utils import palm_cache_dir
+from palm.plugins.dbt.perf.history import HISTORY_DB, RunHistory
+from palm.plugins.dbt.perf.regression import RegressionReport, resolve_baseline_path
+from palm.plugins.dbt.perf.report import TimingReport
+
+""" Post-processing of the artifacts written by a dbt invocation """
+
+RUN_RESULTS_FILE = "run_results.json"
+MANIFEST_FILE = "manifest.json"
+# dbt writes run_results.json from inside the container, allow for clock skew
+# between the host and the docker VM when checking which invocation wrote it.
+MTIME_TOLERANCE = 2.0
+
+
+def local_artifact_path(environment, artifact: str) -> Optional[Path]:
+    """Path to a dbt artifact in the local artifacts dir"""
+    plugin_config = environment.plugin_config('dbt')
+    artifacts_dir = getattr(plugin_config, 'dbt_artifacts_local', None)
+    if not artifacts_dir:
+        return None
+    return Path(artifacts_dir, artifact)
+
+
+def local_run_results_path(environment) -> Optional[Path]:
+    """Path to run_results.json in the local artifacts dir"""
+    return local_artifact_path(environment, RUN_RESULTS_FILE)
+
+
+def load_run_results(
+    environment, since: Optional[float] = None
+) -> Optional[RunResults]:
+    """Load the local run_results.json
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        since (Optional[float]): Ignore run results written before this timestamp
+
+    Returns:
+        Optional[RunResults]: None if there are no (recent) run results
+    """
+    path = local_run_results_path(environment)
+    if not path or not path.exists():
+        return None
+    if since and path.stat().st_mtime < since - MTIME_TOLERANCE:
+        return None
+    return parse_run_results(path)
+
+
+def after_dbt_invocation(
+    environment, started_at: float, selection: Optional[Dict] = None
+) -> Optional[RunResults]:
+    """Report on the run_results.json written by a dbt invocation, and append
+    it to the local run history
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        started_at (float): When the invocation started, from time.time()
+        selection (Optional[Dict]): The selection arguments of the invocation
+
+    Returns:
+        Optional[RunResults]: The run results, None if dbt didn't write any
+    """
+    run_results = load_run_results(environment, since=started_at)
+    if not run_results or not run_results.results:
+        return None
+
+    click.secho("Slowest nodes:", fg="cyan")
+    click.echo(TimingReport(run_results).format_table())
+    record_run_history(environment, run_results, selection)
+    return run_results
+
+
+def record_run_history(
+    environment, run_results: RunResults, selection: Optional[Dict] = None
+) -> None:
+    """Append the run to the local run history database"""
+    plugin_config = environment.plugin_config('dbt')
+    with RunHistory(palm_cache_dir() / HISTORY_DB) as history:
+        history.record(
+            run_results,
+            branch=environment.palm.branch,
+            dbt_version=getattr(plugin_config, 'dbt_version', None),
+            selection=selection,
+        )
+
+
+def perf_options(command):
+    """Add the --perf-* options of check_perf_baseline to a command"""
+    options = [
+        click.option(
+            "--perf-baseline",
+            help="Compare node timings with a baseline: 'prod', or a run_results.json path",
+        ),
+        click.option(
+            "--perf-max-ratio",
+            type=float,
+            default=2.0,
+            show_default=True,
+            help="A node this many times slower than the baseline is a regression",
+        ),
+        click.option(
+            "--perf-max-increase",
+            type=float,
+            help="A node this many seconds slower than the baseline is a regression",
+        ),
+        click.option(
+            "--perf-warn-only",
+            is_flag=True,
+            help="Warn about performance regressions instead of failing",
+        ),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+def pull_prod_artifacts(environment, option: str) -> None:
+    """Run 'palm prod-artifacts' on the host, exit if it isn't available
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        option (str): The option which needs the prod artifacts, for the error
+    """
+    click.secho("Running 'palm prod-artifacts'...", fg='yellow')
+    exit_code, _, _ = environment.run_on_host("palm prod-artifacts")
+    if exit_code == 2:
+        click.secho(
+            f"'palm prod-artifacts' not implemented. Can't use {option} without it!",
+            fg='red',
+        )
+        sys.exit(1)
+    elif exit_code != 0:
+        click.secho("Something went wrong while pulling the prod artifacts.", fg='red')
+        sys.exit(1)
+
+
+def check_perf_baseline(
+    environment,
+    run_results: Optional[RunResults],
+    baseline: str,
+    max_ratio: float,
+    max_increase: Optional[float] = None,
+    min_time: float = 1.0,
+) -> bool:
+    """Compare a run's node timings with a baseline run and print the diff
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        run_results (Optional[RunResults]): The run to check
+        baseline (str): 'prod', a run_results.json file or an artifacts directory
+        max_ratio (float): Slowdown ratio that counts as a regression
+        max_increase (Optional[float]): Slowdown in seconds that counts as a regression
+        min_time (float): Nodes faster than this are never regressions
+
+    Returns:
+        bool: False if any node regressed
+    """
+    if not run_results:
+        click.secho("No run results to compare with the perf baseline", fg="yellow")
+        return True
+
+    plugin_config = environment.plugin_config('dbt')
+    baseline_path = resolve_baseline_path(
+        baseline, getattr(plugin_config, 'dbt_artifacts_prod', None)
+    )
+    if not baseline_path.exists():
+        click.secho(f"Perf baseline {baseline_path} not found", fg="yellow")
+        return True
+
+    report = RegressionReport(
+        run_results,
+        parse_run_results(baseline_path),
+        max_ratio=max_ratio,
+        max_increase=max_increase,
+        min_time=min_time,
+    )
+    click.secho(f"Performance vs. {baseline_path}:", fg="cyan")
+    click.secho(report.format_diff(), fg="red" if report.regressions else "green")
+    return not report.regressions
+
+
+def merge_run_results(
+    paths: List[Path], output_path: Path, elapsed_time: float
+) -> Optional[Path]:
+    """Combine the run_results.json of concurrent invocations into one artifact
+
+    The merged artifact gets a new invocation_id, so it is recorded in the run
+    history as a single run.
+
+    Args:
+        paths (List[Path]): run_results.json of each invocation, missing ones
+            are skipped
+        output_path (Path): Where to write the merged run_results.json
+        elapsed_time (float): Wall time of all the invocations together
+
+    Returns:
+        Optional[Path]: output_path, None if none of the invocations wrote results
+    """
+    artifacts = [json.loads(path.read_text()) for path in paths if path.exists()]
+    if not artifacts:
+        return None
+
+    merged = dict(artifacts[0])
+    merged['metadata'] = {
+        **artifacts[0].get('metadata', {}),
+        'invocation_id': str(uuid.uuid4()),
+        'generated_at': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+    }
+    merged['elapsed_time'] = elapsed_time
+    merged['results'] = [
+        result for artifact in artifacts for result in artifact.get('results', [])
+    ]
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(merged))
+    return output_path
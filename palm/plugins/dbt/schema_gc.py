@@ -0,0 +1,307 @@
+import click
+import json
+import re
+import shlex
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from palm.plugins.dbt.dbt_executor import run_dbt
+from palm.plugins.dbt.dbt_palm_utils import to_schema_name
+from palm.plugins.dbt.local_user_lookup import local_user_lookup
+from palm.plugins.dbt.parsers import parse_manifest
+from palm.plugins.dbt.run_hooks import MANIFEST_FILE, local_artifact_path
+from palm.plugins.dbt.schema_state import SCHEMA_ENV_VAR, invalidate_schema_state
+from palm.plugins.dbt.seed_cache import invalidate_seeds
+
+""" Garbage collection of the branch schemas of merged and stale branches """
+
+# Logged by the palm_branch_schemas macro, followed by the schema and its last change
+SCHEMA_MARKER = "PALM_SCHEMA:"
+AGE_UNITS = {'h': 'hours', 'd': 'days', 'w': 'weeks'}
+DEFAULT_BRANCHES = ('main', 'master', 'HEAD')
+# Schemas of this many branches make their prefix a user, see branch_schema_users
+USER_MIN_BRANCHES = 2
+
+
+def parse_age(value: str) -> timedelta:
+    """Parse an age like 12h, 14d or 2w"""
+    match = re.fullmatch(r"\s*(\d+)\s*([hdw])\s*", value or '')
+    if not match:
+        raise click.BadParameter(
+            f"{value!r} is not an age, use hours, days or weeks, e.g. 14d"
+        )
+    return timedelta(**{AGE_UNITS[match.group(2)]: int(match.group(1))})
+
+
+class BranchSchemas:
+    """Collects the PALM_SCHEMA lines logged by palm_branch_schemas"""
+
+    def __init__(self):
+        self.schemas: Dict[str, Optional[datetime]] = {}
+
+    def __call__(self, line: str) -> None:
+        if SCHEMA_MARKER not in line:
+            return
+        name, *last_altered = line.split(SCHEMA_MARKER, 1)[1].split()
+        self.schemas[name] = _parse_timestamp(last_altered[0]) if last_altered else None
+
+
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+def _branch_names(refs: str) -> Set[str]:
+    branches = set()
+    for ref in refs.split():
+        if ref.startswith("refs/heads/"):
+            branches.add(ref[len("refs/heads/") :])
+        elif ref.startswith("refs/remotes/"):
+            branch = ref[len("refs/remotes/") :].split("/", 1)[-1]
+            if branch != "HEAD":
+                branches.add(branch)
+    return branches
+
+
+def all_branches(environment) -> List[str]:
+    """Local and remote branches of the repository"""
+    exit_code, refs, _ = environment.run_on_host(
+        "git branch --all --format='%(refname)'", capture_output=True
+    )
+    return sorted(_branch_names(refs)) if exit_code == 0 else []
+
+
+def merged_branches(environment) -> List[str]:
+    """Local and remote branches merged into the remote's default branch"""
+    exit_code, default, _ = environment.run_on_host(
+        "git symbolic-ref --short refs/remotes/origin/HEAD", capture_output=True
+    )
+    default = default.strip() if exit_code == 0 else "origin/main"
+    exit_code, refs, _ = environment.run_on_host(
+        f"git branch --all --merged {shlex.quote(default)} --format='%(refname)'",
+        capture_output=True,
+    )
+    if exit_code != 0:
+        click.secho(
+            f"Could not list the branches merged into {default}, "
+            "only collecting stale schemas",
+            fg="yellow",
+        )
+        return []
+    return sorted(
+        branch
+        for branch in _branch_names(refs)
+        if branch not in DEFAULT_BRANCHES and branch != default.split("/", 1)[-1]
+    )
+
+
+def custom_schemas(environment, branch_schema: str) -> List[str]:
+    """The custom schema names of the project, from the local manifest
+
+    generate_schema_name appends them to the branch schema, so they are what
+    follows the branch schema in the schemas the project builds.
+    """
+    manifest_path = local_artifact_path(environment, MANIFEST_FILE)
+    if not manifest_path or not manifest_path.exists():
+        return []
+    prefix = f"{branch_schema}_"
+    return sorted(
+        {
+            node.relation[1].lower()[len(prefix) :]
+            for node in parse_manifest(manifest_path).nodes.values()
+            if node.relation and node.relation[1].lower().startswith(prefix)
+        }
+    )
+
+
+def _alternatives(names: Iterable[str]) -> str:
+    # Longest first, a regex alternation takes the first that matches
+    return "|".join(
+        re.escape(name) for name in sorted(set(names), key=lambda n: (-len(n), n))
+    )
+
+
+def _custom_suffix(customs: Iterable[str]) -> str:
+    customs = _alternatives(customs)
+    return f"(?:_(?:{customs}))?" if customs else ""
+
+
+def branch_schema_users(
+    schemas: Iterable[str],
+    branches: Sequence[str],
+    customs: Iterable[str],
+    current_user: str,
+) -> Set[str]:
+    """The users palm builds branch schemas for
+
+    The current user, and the prefixes of schemas named like the branch schemas
+    of at least USER_MIN_BRANCHES branches: `<user>_<branch>`, optionally
+    prefixed with ci_ and followed by a custom schema. One schema that happens
+    to end with a branch name, like raw_data for a branch data, isn't enough.
+
+    Args:
+        schemas (Iterable[str]): Schema names
+        branches (Sequence[str]): Names of the repository's branches
+        customs (Iterable[str]): Custom schema names of the project
+        current_user (str): The user running palm
+
+    Returns:
+        Set[str]: The users, formatted like in schema names
+    """
+    branch_names = [to_schema_name(branch) for branch in branches]
+    users = {to_schema_name(current_user)}
+    if not any(branch_names):
+        return users
+    pattern = re.compile(
+        rf"(?:ci_)?(?P<user>.+?)_(?P<branch>{_alternatives(filter(None, branch_names))})"
+        + _custom_suffix(customs)
+    )
+    user_branches: Dict[str, Set[str]] = {}
+    for name in schemas:
+        match = pattern.fullmatch(name.lower())
+        if match:
+            user_branches.setdefault(match['user'], set()).add(match['branch'])
+    users.update(
+        user
+        for user, matched in user_branches.items()
+        if len(matched) >= USER_MIN_BRANCHES
+    )
+    return users
+
+
+def gc_candidates(
+    schemas: Dict[str, Optional[datetime]],
+    older_than: timedelta,
+    merged: Sequence[str],
+    customs: Iterable[str],
+    users: Iterable[str],
+    keep: str,
+    now: Optional[datetime] = None,
+) -> Dict[str, str]:
+    """Pick the schemas to drop, with the reason for each
+
+    Only schemas named like branch schemas of the users are dropped:
+    `<user>_<branch>`, optionally prefixed with ci_ and followed by one of the
+    project's custom schemas. Such a schema belongs to a merged branch when its
+    branch is exactly the merged branch, and is stale when neither it nor any of
+    its relations changed for `older_than`.
+
+    Args:
+        schemas (Dict[str, Optional[datetime]]): Schema -> last change, if known
+        older_than (timedelta): Age at which a schema is stale
+        merged (Sequence[str]): Names of merged branches
+        customs (Iterable[str]): Custom schema names of the project
+        users (Iterable[str]): Users formatted like in schema names, see
+            branch_schema_users
+        keep (str): The current branch schema, kept with its custom schemas
+        now (Optional[datetime]): Defaults to the current time
+
+    Returns:
+        Dict[str, str]: Schema -> reason, in the order of the schemas
+    """
+    now = now or datetime.now(timezone.utc)
+    users = _alternatives(filter(None, users))
+    if not users:
+        return {}
+    merged_names = {to_schema_name(branch): branch for branch in merged}
+    merged_names.pop("", None)
+    merged_pattern = (
+        re.compile(
+            rf"(?:ci_)?(?:{users})_(?P<branch>{_alternatives(merged_names)})"
+            + _custom_suffix(customs)
+        )
+        if merged_names
+        else None
+    )
+    branch_schema_pattern = re.compile(rf"(?:ci_)?(?:{users})_.+")
+    keep_pattern = re.compile(rf"(ci_)?{re.escape(keep)}(_.+)?")
+
+    candidates = {}
+    for name, last_altered in schemas.items():
+        lower_name = name.lower()
+        if keep_pattern.fullmatch(lower_name) or not (
+            branch_schema_pattern.fullmatch(lower_name)
+        ):
+            continue
+        match = merged_pattern and merged_pattern.fullmatch(lower_name)
+        if match:
+            candidates[name] = f"branch {merged_names[match['branch']]} is merged"
+        elif last_altered and now - last_altered > older_than:
+            candidates[name] = f"unchanged for {(now - last_altered).days} days"
+    return candidates
+
+
+def collect_schema_garbage(
+    environment,
+    env_vars: Dict,
+    older_than: timedelta,
+    dry_run: bool = False,
+    yes: bool = False,
+) -> Tuple[bool, str]:
+    """Drop the schemas of merged and stale branches of every user in one pass
+
+    Lists the schemas of the TEST database with palm_branch_schemas, picks the
+    branch schemas to drop with gc_candidates and drops them with
+    palm_drop_schemas.
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        env_vars (Dict): The dbt env vars, with the current branch schema
+        older_than (timedelta): Age at which a schema is stale
+        dry_run (bool): Only list the schemas that would be dropped
+        yes (bool): Don't ask for confirmation
+
+    Returns:
+        Tuple[bool, str]: success, summary message
+    """
+    collector = BranchSchemas()
+    success, msg = run_dbt(
+        environment,
+        "dbt run-operation palm_branch_schemas",
+        env_vars,
+        on_line=collector,
+    )
+    if not success:
+        return False, msg
+
+    branch_schema = env_vars[SCHEMA_ENV_VAR]
+    customs = custom_schemas(environment, branch_schema)
+    candidates = gc_candidates(
+        collector.schemas,
+        older_than,
+        merged_branches(environment),
+        customs,
+        branch_schema_users(
+            collector.schemas, all_branches(environment), customs, local_user_lookup()
+        ),
+        keep=branch_schema,
+    )
+    if not candidates:
+        return True, f"None of the {len(collector.schemas)} schemas are stale"
+
+    width = max(len(name) for name in candidates)
+    for name, reason in candidates.items():
+        click.echo(f"{name:<{width}}  {reason}")
+    summary = f"{len(candidates)} of {len(collector.schemas)} schemas"
+    if dry_run:
+        return True, f"Dry run, would drop {summary}"
+    if not yes:
+        click.confirm(f"Drop {summary}?", abort=True)
+
+    schemas = list(candidates)
+    args = shlex.quote(json.dumps({'schemas': schemas}))
+    success, msg = run_dbt(
+        environment, f"dbt run-operation palm_drop_schemas --args {args}", env_vars
+    )
+    if not success:
+        return False, msg
+    for name in schemas:
+        dropped = {SCHEMA_ENV_VAR: name.lower()}
+        invalidate_seeds(dropped)
+        invalidate_schema_state(dropped)
+    return True, f"Dropped {summary}"
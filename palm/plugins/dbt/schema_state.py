@@ -0,0 +1,261 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from palm.plugins.dbt.dbt_palm_utils import palm_cache_dir
+from palm.plugins.dbt.manifest_index import ManifestIndex, load_manifest_index
+from palm.plugins.dbt.parsers import RunResults
+from palm.plugins.dbt.run_hooks import MANIFEST_FILE, local_artifact_path
+
+""" What palm has seen built and tested in each branch schema """
+
+SCHEMA_STATE_FILE = "schema_state.json"
+SCHEMA_ENV_VAR = 'PDP_DEV_SCHEMA'
+BUILT_RESOURCE_TYPES = ('model', 'seed', 'snapshot')
+# A failed build may still have replaced the relation
+BUILD_STATUSES = ('success', 'error')
+
+
+class SchemaState:
+    """The last build of each relation in a branch schema, the fingerprint of
+    each model when it was built, and the tests that passed against those builds
+
+    A build is identified by the invocation_id of the dbt invocation that
+    (re)built the relation. See model_fingerprint and upstream_builds_hash for the
+    hashes.
+    """
+
+    def __init__(self, schema: str, path: Optional[Path] = None):
+        self.schema = schema
+        self.path = path or palm_cache_dir() / SCHEMA_STATE_FILE
+        self._data = self._read()
+
+    def _read(self) -> Dict:
+        if self.path.exists():
+            try:
+                return json.loads(self.path.read_text())
+            except ValueError:
+                pass
+        return {'schemas': {}}
+
+    def _write(self) -> None:
+        self.path.write_text(json.dumps(self._data, indent=2, sort_keys=True))
+
+    @property
+    def _schema(self) -> Dict:
+        return self._data['schemas'].get(self.schema, {})
+
+    @property
+    def builds(self) -> Dict[str, str]:
+        return self._schema.get('builds', {})
+
+    @property
+    def fingerprints(self) -> Dict[str, str]:
+        return self._schema.get('fingerprints', {})
+
+    @property
+    def passed_tests(self) -> Dict[str, Dict[str, str]]:
+        return self._schema.get('passed_tests', {})
+
+    def record(
+        self,
+        builds: Dict[str, str],
+        fingerprints: Dict[str, str],
+        passed_tests: Dict[str, Dict[str, str]],
+        forget: Iterable[str] = (),
+    ) -> None:
+        """Record relations as built and tests as passed
+
+        Args:
+            builds (Dict[str, str]): unique_id -> build id of (re)built relations
+            fingerprints (Dict[str, str]): unique_id -> fingerprint of models
+                that were built successfully
+            passed_tests (Dict[str, Dict[str, str]]): unique_id -> hashes of
+                tests that passed
+            forget (Iterable[str]): Models and tests that ran without passing,
+                or can't be cached
+        """
+        forget = set(forget)
+        self._data['schemas'][self.schema] = {
+            'builds': {**self.builds, **builds},
+            'fingerprints': {
+                **_without(self.fingerprints, forget),
+                **fingerprints,
+            },
+            'passed_tests': {
+                **_without(self.passed_tests, forget),
+                **passed_tests,
+            },
+        }
+        self._write()
+
+    def invalidate(self) -> None:
+        """Forget everything built in the schema, e.g. after dropping it"""
+        if self._data['schemas'].pop(self.schema, None) is not None:
+            self._write()
+
+
+def _without(entries: Dict, keys: set) -> Dict:
+    return {key: value for key, value in entries.items() if key not in keys}
+
+
+def model_fingerprint(
+    index: ManifestIndex,
+    i: int,
+    compiled_checksum: str,
+    fingerprints: Dict[str, str],
+) -> str:
+    """Hash a model's compiled SQL, config and upstream nodes
+
+    An upstream model is represented by its fingerprint when it was last built,
+    so a model's fingerprint changes whenever anything upstream was rebuilt
+    differently. Other upstream nodes, and models palm never saw built, are
+    represented by their checksum and config.
+
+    Args:
+        index (ManifestIndex): Index of the manifest
+        i (int): Position of the model
+        compiled_checksum (str): sha256 of the model's compiled SQL
+        fingerprints (Dict[str, str]): unique_id -> fingerprint of built models
+
+    Returns:
+        str: sha256 hex digest
+    """
+    digest = hashlib.sha256(
+        f"{compiled_checksum}:{index.config_checksums[i]}\n".encode()
+    )
+    for parent in sorted(index.parents(i), key=lambda p: index.unique_ids[p]):
+        unique_id = index.unique_ids[parent]
+        token = fingerprints.get(unique_id) or (
+            f"{index.checksums[parent]}:{index.config_checksums[parent]}"
+        )
+        digest.update(f"{unique_id}:{token}\n".encode())
+    return digest.hexdigest()
+
+
+def upstream_builds_hash(
+    index: ManifestIndex, i: int, builds: Dict[str, str]
+) -> Optional[str]:
+    """Hash the identity of every relation a test reads
+
+    A model is identified by its checksum and the build recorded for the
+    branch schema, a seed by its checksum. Tests that read anything else,
+    sources and snapshots whose data changes without palm building them,
+    ephemeral models or models palm didn't see being built, can't be cached.
+
+    Args:
+        index (ManifestIndex): Index of the manifest
+        i (int): Position of the test
+        builds (Dict[str, str]): unique_id -> build id, from SchemaState
+
+    Returns:
+        Optional[str]: sha256 hex digest, None if the test can't be cached
+    """
+    parents = index.parents(i)
+    if not parents:
+        return None
+    digest = hashlib.sha256()
+    for parent in sorted(parents, key=lambda p: index.unique_ids[p]):
+        unique_id = index.unique_ids[parent]
+        resource_type = index.resource_types[parent]
+        if resource_type == 'model':
+            if index.materializations[parent] == 'ephemeral':
+                return None
+            build = builds.get(unique_id)
+            if not build:
+                return None
+        elif resource_type == 'seed':
+            build = ''
+        else:
+            return None
+        digest.update(f"{unique_id}:{index.checksums[parent]}:{build}\n".encode())
+    return digest.hexdigest()
+
+
+def record_invocation(
+    environment, env_vars: Dict, run_results: Optional[RunResults]
+) -> None:
+    """Record what an invocation built in the branch schema and which tests passed
+
+    Models are fingerprinted in dependency order, so a model built after its
+    parents in the same invocation is fingerprinted with their new fingerprints.
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        env_vars (Dict): The dbt env vars, with the branch schema
+        run_results (Optional[RunResults]): The invocation's run results
+    """
+    if not run_results or SCHEMA_ENV_VAR not in env_vars:
+        return
+    state = SchemaState(env_vars[SCHEMA_ENV_VAR])
+    build_id = run_results.invocation_id or run_results.generated_at
+    results = {result.unique_id: result for result in run_results.results}
+    builds = {
+        unique_id: build_id
+        for unique_id, result in results.items()
+        if result.resource_type in BUILT_RESOURCE_TYPES
+        and result.status in BUILD_STATUSES
+    }
+    ran = [
+        unique_id
+        for unique_id, result in results.items()
+        if result.resource_type in ('model', 'test')
+    ]
+    manifest_path = local_artifact_path(environment, MANIFEST_FILE)
+    if not ran or not manifest_path or not manifest_path.exists():
+        state.record(builds, {}, {}, ran)
+        return
+
+    index = load_manifest_index(manifest_path)
+    positions = {unique_id: i for i, unique_id in enumerate(index.unique_ids)}
+    fingerprints = dict(state.fingerprints)
+    built = {}
+    pending = {
+        unique_id
+        for unique_id in ran
+        if unique_id in positions and results[unique_id].resource_type == 'model'
+    }
+
+    def fingerprint(unique_id: str) -> None:
+        result = results[unique_id]
+        if result.status == 'success' and result.compiled_checksum:
+            built[unique_id] = fingerprints[unique_id] = model_fingerprint(
+                index, positions[unique_id], result.compiled_checksum, fingerprints
+            )
+        else:
+            fingerprints.pop(unique_id, None)
+
+    # Parents are fingerprinted before their children. The walk uses a stack,
+    # chains of models can be deeper than Python's recursion limit
+    while pending:
+        stack = [(next(iter(pending)), False)]
+        while stack:
+            unique_id, parents_done = stack.pop()
+            if parents_done:
+                fingerprint(unique_id)
+            elif unique_id in pending:
+                pending.discard(unique_id)
+                stack.append((unique_id, True))
+                for parent in index.parents(positions[unique_id]):
+                    if index.unique_ids[parent] in pending:
+                        stack.append((index.unique_ids[parent], False))
+
+    all_builds = {**state.builds, **builds}
+    passed = {}
+    for unique_id in ran:
+        result = results[unique_id]
+        if result.resource_type != 'test' or unique_id not in positions:
+            continue
+        if result.status == 'pass' and result.compiled_checksum:
+            inputs = upstream_builds_hash(index, positions[unique_id], all_builds)
+            if inputs:
+                passed[unique_id] = {'sql': result.compiled_checksum, 'inputs': inputs}
+    forget = [u for u in ran if u not in built and u not in passed]
+    state.record(builds, built, passed, forget)
+
+
+def invalidate_schema_state(env_vars: Dict) -> None:
+    """Forget what was built and tested in the branch schema"""
+    if SCHEMA_ENV_VAR in env_vars:
+        SchemaState(env_vars[SCHEMA_ENV_VAR]).invalidate()
@@ -0,0 +1,166 @@
+import click
+import hashlib
+import json
+import shlex
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from palm.plugins.dbt.dbt_palm_utils import palm_cache_dir
+from palm.plugins.dbt.parsers import parse_project
+
+""" Skips reloading seeds that are already loaded, unchanged, in the branch schema """
+
+SEED_CACHE_FILE = "seed_cache.json"
+FULL_SEED_CMD = "dbt seed --full-refresh"
+# Logged by the palm_missing_seeds macro, followed by the missing seed names
+MISSING_SEEDS_MARKER = "PALM_MISSING_SEEDS:"
+SCHEMA_ENV_VAR = 'PDP_DEV_SCHEMA'
+
+
+class SeedCache:
+    """Content hashes of the seeds loaded into each branch schema
+
+    A seed's hash covers the CSV, the `seeds:` config in dbt_project.yml and
+    the property files in the seed paths, so column type changes reload it too.
+    """
+
+    def __init__(self, schema: str, path: Optional[Path] = None):
+        self.schema = schema
+        self.path = path or palm_cache_dir() / SEED_CACHE_FILE
+        self._data = self._read()
+
+    def _read(self) -> Dict:
+        if self.path.exists():
+            try:
+                return json.loads(self.path.read_text())
+            except ValueError:
+                pass
+        return {'schemas': {}}
+
+    def _write(self) -> None:
+        self.path.write_text(json.dumps(self._data, indent=2, sort_keys=True))
+
+    @property
+    def loaded(self) -> Dict[str, str]:
+        return self._data['schemas'].get(self.schema, {})
+
+    def changed(self, hashes: Dict[str, str]) -> List[str]:
+        return sorted(name for name, h in hashes.items() if self.loaded.get(name) != h)
+
+    def unchanged(self, hashes: Dict[str, str]) -> List[str]:
+        return sorted(name for name, h in hashes.items() if self.loaded.get(name) == h)
+
+    def record(self, hashes: Dict[str, str]) -> None:
+        """Record seeds as loaded into the schema"""
+        self._data['schemas'][self.schema] = {**self.loaded, **hashes}
+        self._write()
+
+    def invalidate(self) -> None:
+        """Forget everything loaded into the schema, e.g. after dropping it"""
+        if self._data['schemas'].pop(self.schema, None) is not None:
+            self._write()
+
+
+def seed_hashes(project_dir: Path = Path('.')) -> Dict[str, str]:
+    """Hash each seed's content and config
+
+    Args:
+        project_dir (Path): The dbt project directory
+
+    Returns:
+        Dict[str, str]: seed name -> sha256 hex digest
+    """
+    project = parse_project(project_dir / 'dbt_project.yml')
+    config = hashlib.sha256(
+        json.dumps(project.seeds, sort_keys=True, default=str).encode()
+    )
+    for seed_dir in seed_dirs(project_dir):
+        for properties in sorted(seed_dir.rglob('*.yml')) + sorted(
+            seed_dir.rglob('*.yaml')
+        ):
+            config.update(properties.read_bytes())
+
+    hashes = {}
+    for name, csv_path in seed_files(project_dir).items():
+        seed_hash = config.copy()
+        seed_hash.update(csv_path.read_bytes())
+        hashes[name] = seed_hash.hexdigest()
+    return hashes
+
+
+def seed_dirs(project_dir: Path = Path('.')) -> List[Path]:
+    """The project's seed paths"""
+    seed_paths = parse_project(project_dir / 'dbt_project.yml').seed_paths
+    return [project_dir / seed_path for seed_path in seed_paths]
+
+
+def seed_files(project_dir: Path = Path('.')) -> Dict[str, Path]:
+    """Seed name -> CSV path of every seed in the project"""
+    return {
+        csv_path.stem: csv_path
+        for seed_dir in seed_dirs(project_dir)
+        for csv_path in sorted(seed_dir.rglob('*.csv'))
+    }
+
+
+def cached_seed_command(
+    env_vars: Dict, no_cache: bool = False
+) -> Tuple[str, Dict[str, str]]:
+    """Build a dbt seed command that only reloads changed or missing seeds
+
+    Seeds whose hash changed since they were loaded into the branch schema are
+    reloaded. Unchanged seeds are checked for a missing table in the same
+    container with the palm_missing_seeds macro, if the check fails they are
+    all reloaded.
+
+    Args:
+        env_vars (Dict): The dbt env vars, with the branch schema
+        no_cache (bool): Reload every seed
+
+    Returns:
+        Tuple[str, Dict[str, str]]: The command, and the seed hashes to record
+            with record_seeds once it succeeds
+    """
+    try:
+        hashes = seed_hashes()
+    except FileNotFoundError:
+        return FULL_SEED_CMD, {}
+    if no_cache:
+        return FULL_SEED_CMD, hashes
+
+    cache = SeedCache(env_vars[SCHEMA_ENV_VAR])
+    changed = cache.changed(hashes)
+    unchanged = cache.unchanged(hashes)
+    if not unchanged:
+        return FULL_SEED_CMD, hashes
+
+    click.secho(
+        f"Seed cache: {len(changed)} seeds changed, "
+        f"skipping {len(unchanged)} unchanged seeds unless their table is missing",
+        fg="cyan",
+    )
+    # JSON is valid YAML for --args, and keeps seeds like 'off' or '2020' strings
+    seeds_args = shlex.quote(json.dumps({'seeds': unchanged}))
+    missing_check = (
+        f"$(set -o pipefail; dbt run-operation palm_missing_seeds "
+        f"--args {seeds_args} "
+        f"| sed -n 's/.*{MISSING_SEEDS_MARKER}//p' || echo {' '.join(unchanged)})"
+    )
+    cmd = (
+        f'seeds="{" ".join(changed)} {missing_check}"; '
+        f'if [ -n "$(echo $seeds)" ]; then {FULL_SEED_CMD} --select $seeds; '
+        f'else echo "All seeds are up to date"; fi'
+    )
+    return cmd, hashes
+
+
+def record_seeds(env_vars: Dict, hashes: Dict[str, str]) -> None:
+    """Record the seeds of a successful cached_seed_command as loaded"""
+    if hashes:
+        SeedCache(env_vars[SCHEMA_ENV_VAR]).record(hashes)
+
+
+def invalidate_seeds(env_vars: Dict) -> None:
+    """Forget the seeds loaded into the branch schema"""
+    if SCHEMA_ENV_VAR in env_vars:
+        SeedCache(env_vars[SCHEMA_ENV_VAR]).invalidate()
@@ -0,0 +1,119 @@
+import click
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+from palm.plugins.dbt.dbt_executor import run_dbt
+from palm.plugins.dbt.dbt_palm_utils import (
+    MAX_SELECTION_BYTES,
+    compile_args,
+    selection_bytes,
+    skip_selection,
+)
+from palm.plugins.dbt.parallel import resolve_selection
+from palm.plugins.dbt.parsers import parse_manifest
+from palm.plugins.dbt.run_hooks import MANIFEST_FILE, local_artifact_path
+from palm.plugins.dbt.schema_state import (
+    SCHEMA_ENV_VAR,
+    SchemaState,
+    upstream_builds_hash,
+)
+
+""" Skips tests that passed against the same compiled SQL and upstream builds """
+
+
+class CachedTests(NamedTuple):
+    """The selected tests, split by whether they passed against the same inputs"""
+
+    # Selectors of the tests that are skipped
+    cached: List[str]
+    # Selectors of the tests that run
+    run: List[str]
+
+    def test_selection(
+        self, select: Sequence[str], exclude: Sequence[str]
+    ) -> Tuple[List[str], List[str]]:
+        """--select and --exclude arguments that skip the cached tests"""
+        return skip_selection(select, exclude, self.cached, self.run)
+
+
+def skip_cached_tests(
+    environment, env_vars: Dict, select: Sequence[str], exclude: Sequence[str]
+) -> CachedTests:
+    """Find the selected tests that passed against the same inputs
+
+    Passing tests are recorded by record_invocation. Tests whose upstream
+    builds are unchanged since they passed are compiled, with `dbt compile`,
+    and cached when their compiled SQL is unchanged too.
+    The cache needs the local manifest to resolve the selection, and dbt >= 1.5
+    for the compiled SQL in run_results.json; without them nothing is cached.
+    Neither is anything when the selection skipping the cached tests is longer
+    than MAX_SELECTION_BYTES.
+
+    Args:
+        environment (palm.environment.Environment): The palm environment
+        env_vars (Dict): The dbt env vars, with the branch schema
+        select (Sequence[str]): --select arguments
+        exclude (Sequence[str]): --exclude arguments
+
+    Returns:
+        CachedTests: Selectors of the cached tests and of the tests to run, both
+            empty when the cache isn't used
+    """
+    plugin_config = environment.plugin_config('dbt')
+    if not local_artifact_path(environment, MANIFEST_FILE) or not (
+        plugin_config.is_dbt_version_greater_than("1.5.0", or_equal=True)
+    ):
+        return CachedTests([], [])
+    try:
+        index, selected = resolve_selection(
+            environment, env_vars, select, exclude, ['test'], parallel=False
+        )
+    except click.UsageError:
+        return CachedTests([], [])
+
+    state = SchemaState(env_vars[SCHEMA_ENV_VAR])
+    candidates = [
+        i
+        for i in selected
+        if index.unique_ids[i] in state.passed_tests
+        and state.passed_tests[index.unique_ids[i]]['inputs']
+        == upstream_builds_hash(index, i, state.builds)
+    ]
+    if not candidates:
+        return CachedTests([], [])
+
+    labels = [index.label(i) for i in candidates]
+    success, msg = run_dbt(
+        environment,
+        " ".join(["dbt compile", *compile_args(labels, select, exclude)]),
+        env_vars,
+    )
+    if not success:
+        click.secho(f"{msg}\nCompile failed, not using the test cache", fg="yellow")
+        return CachedTests([], [])
+
+    manifest = parse_manifest(local_artifact_path(environment, MANIFEST_FILE))
+    cached = set()
+    for i in candidates:
+        node = manifest.nodes.get(index.unique_ids[i])
+        passed = state.passed_tests[index.unique_ids[i]]
+        if node and node.compiled_checksum == passed['sql']:
+            cached.add(i)
+            click.secho(f"CACHED {index.names[i]}", fg="cyan")
+    result = CachedTests(
+        [index.label(i) for i in selected if i in cached],
+        [index.label(i) for i in selected if i not in cached],
+    )
+    test_select, test_exclude = result.test_selection(select, exclude)
+    if selection_bytes(test_select + test_exclude) > MAX_SELECTION_BYTES:
+        click.secho(
+            f"Test cache: {len(cached)} cached tests are too many to skip in one "
+            "command, running every test",
+            fg="yellow",
+        )
+        return CachedTests([], [])
+    click.secho(
+        f"Test cache: {len(cached)} of {len(selected)} tests passed against "
+        "the same SQL and upstream builds, skipping them",
+        fg="cyan",
+    )
+    return result
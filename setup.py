@@ -31,6 +31,7 @@ setup(
     packages=find_namespace_packages(include=['palm', 'palm.*']),
     package_data={'': ['*.md', '*.sql', '*.yaml', '*.yml', '*.txt']},
     install_requires=Path("palm/plugins/dbt/requirements.txt").read_text().splitlines(),
+    extras_require={'bulk': ['pyarrow >= 6.0']},
     license='Apache License 2.0',
     classifiers=[
         'Development Status :: 4 - Beta',
@@ -0,0 +1,195 @@
+import json
+import pytest
+from pathlib import Path
+from types import SimpleNamespace
+from jinja2 import Environment
+
+MACROS_DIR = Path(__file__).parents[1] / 'palm' / 'plugins' / 'dbt' / 'macros'
+DBT_PROJECT_YML = "name: proj\nversion: '1.0'\nprofile: proj\nconfig-version: 2\n"
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch) -> Path:
+    """A dbt project in tmp_path, which is the working directory"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'dbt_project.yml').write_text(DBT_PROJECT_YML)
+    return tmp_path
+
+
+@pytest.fixture
+def environment(tmp_path):
+    """The palm environment of the project, on branch my_branch"""
+    return SimpleNamespace(
+        palm=SimpleNamespace(image_name='proj', branch='my_branch'),
+        plugin_config=lambda name: SimpleNamespace(
+            dbt_version='1.5.2',
+            dbt_artifacts_local=str(tmp_path / 'target'),
+            dbt_artifacts_prod=str(tmp_path / 'prod'),
+            is_dbt_version_greater_than=lambda version, or_equal=False: True,
+        ),
+    )
+
+
+def make_run_results(timings: dict, elapsed_time: float = None, **metadata) -> dict:
+    """Build a minimal run_results.json artifact
+
+    Args:
+        timings (dict): unique_id -> execution time, or (execution time, status)
+        elapsed_time (float): wall time, defaults to the sum of the timings
+    """
+    results = []
+    for i, (unique_id, timing) in enumerate(timings.items()):
+        execution_time, status = (
+            timing if isinstance(timing, tuple) else (timing, 'success')
+        )
+        results.append(
+            {
+                'unique_id': unique_id,
+                'status': status,
+                'execution_time': execution_time,
+                'thread_id': f'Thread-{i % 2 + 1}',
+                'message': None,
+            }
+        )
+    return {
+        'metadata': {
+            'dbt_version': '1.5.2',
+            'generated_at': metadata.get('generated_at', '2023-11-20T12:00:00Z'),
+            'invocation_id': metadata.get('invocation_id', 'abc-123'),
+        },
+        'elapsed_time': elapsed_time
+        if elapsed_time is not None
+        else sum(r['execution_time'] for r in results),
+        'args': {'which': metadata.get('which', 'run')},
+        'results': results,
+    }
+
+
+@pytest.fixture
+def write_run_results(tmp_path):
+    def _write(timings: dict, path=None, **kwargs) -> Path:
+        path = Path(path or tmp_path / 'target' / 'run_results.json')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(make_run_results(timings, **kwargs)))
+        return path
+
+    return _write
+
+
+def make_manifest(nodes: dict) -> dict:
+    """Build a minimal manifest.json artifact
+
+    Args:
+        nodes (dict): unique_id -> list of parents, or a dict of node properties
+            with the parents under 'depends_on'
+    """
+    manifest = {'metadata': {'dbt_version': '1.5.2'}, 'nodes': {}, 'sources': {}}
+    for unique_id, node in nodes.items():
+        node = dict(node) if isinstance(node, dict) else {'depends_on': node}
+        resource_type, package, *_, name = unique_id.split('.')
+        node.update(
+            {
+                'unique_id': unique_id,
+                'resource_type': resource_type,
+                'package_name': package,
+                'name': name,
+                'depends_on': {'nodes': node.get('depends_on', []), 'macros': []},
+            }
+        )
+        node.setdefault('fqn', [package, name])
+        key = 'sources' if resource_type == 'source' else 'nodes'
+        manifest[key][unique_id] = node
+    return manifest
+
+
+@pytest.fixture
+def write_manifest(tmp_path):
+    def _write(nodes: dict, path=None) -> Path:
+        path = Path(path or tmp_path / 'target' / 'manifest.json')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(make_manifest(nodes)))
+        return path
+
+    return _write
+
+
+class Relation:
+    """dbt's api.Relation, as far as the macros use it"""
+
+    def __init__(self, database, schema, identifier, type=None):
+        self.database = database
+        self.schema = schema
+        self.identifier = identifier
+        self.type = type
+
+    @property
+    def is_table(self):
+        return self.type == 'table'
+
+    def __str__(self):
+        return f'"{self.database}"."{self.schema}"."{self.identifier}"'
+
+
+class DuckDBAdapter:
+    """The parts of dbt's adapter the macros use, on a DuckDB connection"""
+
+    def __init__(self, connection=None):
+        self.connection = connection
+        self.macros = None
+
+    def dispatch(self, name):
+        return getattr(self.macros, f'duckdb__{name}', None) or getattr(
+            self.macros, f'default__{name}'
+        )
+
+    def quote(self, name):
+        return f'"{name}"'
+
+    def get_columns_in_relation(self, relation):
+        rows = self.connection.execute(f"describe {relation}").fetchall()
+        return [SimpleNamespace(name=row[0]) for row in rows]
+
+    def get_relation(self, database, schema, identifier):
+        row = self.connection.execute(
+            "select table_type from information_schema.tables "
+            "where table_catalog = ? and table_schema = ? and table_name = ?",
+            [database, schema, identifier],
+        ).fetchone()
+        if not row:
+            return None
+        return Relation(
+            database, schema, identifier, 'table' if row[0] == 'BASE TABLE' else 'view'
+        )
+
+    def create_schema(self, relation):
+        self.connection.execute(
+            f'create schema if not exists "{relation.database}"."{relation.schema}"'
+        )
+
+
+@pytest.fixture
+def render_macros():
+    def _render(macro_file: str, connection=None, **context):
+        """Load a macro file from palm's macros as a module of Jinja macros
+
+        Args:
+            macro_file (str): The file name in palm/plugins/dbt/macros
+            connection: The DuckDB connection of the adapter
+            context: dbt's context functions and variables the macros use
+        """
+        adapter = DuckDBAdapter(connection)
+        adapter.macros = (
+            Environment(extensions=['jinja2.ext.do'])
+            .from_string((MACROS_DIR / macro_file).read_text())
+            .make_module(
+                {
+                    'adapter': adapter,
+                    'api': SimpleNamespace(Relation=SimpleNamespace(create=Relation)),
+                    'return': lambda value: value,
+                    **context,
+                }
+            )
+        )
+        return adapter.macros
+
+    return _render
@@ -0,0 +1,182 @@
+import json
+from palm.plugins.dbt import build_cache, dbt_palm_utils
+from palm.plugins.dbt.build_cache import (
+    BuildCacheSelection,
+    chunk_selectors,
+    skip_unchanged_models,
+)
+from palm.plugins.dbt.parsers import parse_run_results
+from palm.plugins.dbt.schema_state import record_invocation
+
+ENV_VARS = {'PDP_DEV_SCHEMA': 'me_my_branch', 'PALM_DBT_ENV': 'DEVELOPMENT'}
+STG_ORDERS = 'model.proj.stg_orders'
+ORDERS = 'model.proj.orders'
+REPORT = 'model.proj.report'
+
+
+def nodes(compiled, seed_checksum='countries-v1'):
+    return {
+        'seed.proj.countries': {'checksum': {'checksum': seed_checksum}},
+        'model.proj.base': {
+            'config': {'materialized': 'ephemeral'},
+            'compiled_code': compiled.get('model.proj.base'),
+        },
+        STG_ORDERS: {
+            'depends_on': ['seed.proj.countries', 'model.proj.base'],
+            'config': {'materialized': 'view'},
+            'compiled_code': compiled.get(STG_ORDERS),
+        },
+        ORDERS: {
+            'depends_on': [STG_ORDERS],
+            'config': {'materialized': 'table'},
+            'compiled_code': compiled.get(ORDERS),
+        },
+        REPORT: {
+            'depends_on': [ORDERS],
+            'config': {'materialized': 'table'},
+            'compiled_code': compiled.get(REPORT),
+        },
+    }
+
+
+def test_build_cache(
+    project, environment, write_manifest, write_run_results, monkeypatch
+):
+    compiled = {
+        'model.proj.base': "select 1 as id",
+        STG_ORDERS: "with base as (select 1 as id) select * from base",
+        ORDERS: "select * from stg_orders",
+        REPORT: "select count(*) from orders",
+    }
+    seed_checksum = 'countries-v1'
+    missing = []
+    commands = []
+
+    def fake_dbt(environment, cmd, env_vars, on_line=None):
+        commands.append(cmd)
+        write_manifest(nodes(compiled, seed_checksum))
+        on_line(f"12:00:00  PALM_MISSING_RELATIONS: {' '.join(missing)}")
+        return True, "Success!"
+
+    monkeypatch.setattr(build_cache, 'run_dbt', fake_dbt)
+
+    def build(invocation_id, unique_ids):
+        write_manifest(nodes(compiled, seed_checksum))
+        path = write_run_results(
+            {unique_id: (1.0, 'success') for unique_id in unique_ids},
+            invocation_id=invocation_id,
+        )
+        artifact = json.loads(path.read_text())
+        for result in artifact['results']:
+            result['compiled_code'] = compiled[result['unique_id']]
+        path.write_text(json.dumps(artifact))
+        record_invocation(environment, ENV_VARS, parse_run_results(path))
+
+    def unchanged():
+        result = skip_unchanged_models(environment, ENV_VARS, [], [])
+        if result.unchanged:
+            assert len(result.unchanged) + len(result.rebuilt) == 3
+        return sorted(result.unchanged)
+
+    write_manifest(nodes({}))
+    assert unchanged() == []
+    assert commands == []
+
+    build('build-1', [STG_ORDERS, ORDERS, REPORT])
+    assert unchanged() == ['proj.orders', 'proj.report', 'proj.stg_orders']
+    assert 'palm_missing_relations' in commands[-1]
+    assert '"model.proj.stg_orders"' in commands[-1]
+
+    # A change rebuilds the model and everything selected downstream of it
+    compiled[ORDERS] = "select * from stg_orders where id > 0"
+    assert unchanged() == ['proj.stg_orders']
+    build('build-2', [ORDERS])
+    # report wasn't rebuilt on the new orders
+    assert unchanged() == ['proj.orders', 'proj.stg_orders']
+    build('build-3', [REPORT])
+    assert unchanged() == ['proj.orders', 'proj.report', 'proj.stg_orders']
+
+    missing = [ORDERS]
+    assert unchanged() == ['proj.stg_orders']
+    missing = []
+
+    # Upstream seeds and ephemeral models are part of the fingerprint
+    seed_checksum = 'countries-v2'
+    assert unchanged() == []
+    seed_checksum = 'countries-v1'
+    compiled['model.proj.base'] = "select 2 as id"
+    compiled[STG_ORDERS] = "with base as (select 2 as id) select * from base"
+    assert unchanged() == []
+
+    assert skip_unchanged_models(
+        environment, {**ENV_VARS, 'PALM_DBT_ENV': 'CI'}, [], []
+    ) == ([], [])
+
+    # Too long to skip in one command
+    compiled['model.proj.base'] = "select 1 as id"
+    compiled[STG_ORDERS] = "with base as (select 1 as id) select * from base"
+    assert unchanged() == ['proj.orders', 'proj.report', 'proj.stg_orders']
+    monkeypatch.setattr(build_cache, 'MAX_SELECTION_BYTES', 20)
+    monkeypatch.setattr(dbt_palm_utils, 'MAX_SELECTION_BYTES', 20)
+    assert skip_unchanged_models(environment, ENV_VARS, [], []) == ([], [])
+    # The relations are checked, the compile falls back to the user's selection
+    assert commands[-1].startswith('dbt compile && dbt run-operation')
+
+
+def test_build_cache_of_a_deep_chain(
+    project, environment, write_manifest, write_run_results, monkeypatch
+):
+    # Deeper than Python's recursion limit
+    chain = [f'model.proj.model_{i}' for i in range(3000)]
+    write_manifest(
+        {
+            unique_id: {
+                'depends_on': chain[i - 1 : i],
+                'config': {'materialized': 'table'},
+                'compiled_code': f"select {i} as id",
+            }
+            for i, unique_id in enumerate(chain)
+        }
+    )
+    missing = []
+
+    def fake_dbt(environment, cmd, env_vars, on_line=None):
+        on_line(f"12:00:00  PALM_MISSING_RELATIONS: {' '.join(missing)}")
+        return True, "Success!"
+
+    monkeypatch.setattr(build_cache, 'run_dbt', fake_dbt)
+    path = write_run_results({unique_id: 1.0 for unique_id in chain})
+    artifact = json.loads(path.read_text())
+    for i, result in enumerate(artifact['results']):
+        result['compiled_code'] = f"select {i} as id"
+    path.write_text(json.dumps(artifact))
+    record_invocation(environment, ENV_VARS, parse_run_results(path))
+
+    assert len(skip_unchanged_models(environment, ENV_VARS, [], []).unchanged) == 3000
+    # Everything downstream of a missing relation is rebuilt
+    missing = [chain[1000]]
+    result = skip_unchanged_models(environment, ENV_VARS, [], [])
+    assert len(result.unchanged) == 1000
+    assert len(result.rebuilt) == 2000
+
+
+def test_run_selection():
+    result = BuildCacheSelection(['proj.a', 'proj.b', 'proj.c'], ['proj.report'])
+    assert result.run_selection(['tag:daily'], []) == (['proj.report'], [])
+    result = BuildCacheSelection(['proj.a'], ['proj.report', 'proj.b', 'proj.c'])
+    assert result.run_selection(['tag:daily'], ['proj.x']) == (
+        ['tag:daily'],
+        ['proj.x', 'proj.a'],
+    )
+    # Nothing to select positively, dbt would run the whole project
+    result = BuildCacheSelection(['proj.a'], [])
+    assert result.run_selection([], []) == ([], ['proj.a'])
+    assert BuildCacheSelection([], []).run_selection(['a'], ['b']) == (['a'], ['b'])
+
+
+def test_chunk_selectors():
+    ids = [f'model.proj.m{i}' for i in range(100)]
+    chunks = chunk_selectors(ids, 200)
+    assert sum(chunks, []) == ids
+    assert all(len(json.dumps(chunk)) <= 200 for chunk in chunks)
+    assert len(chunks) > 1
@@ -0,0 +1,101 @@
+import gzip
+import importlib.util
+import json
+import shlex
+import pytest
+from click.testing import CliRunner
+from palm.plugins.dbt import Plugin
+from palm.plugins.dbt.bulk_seeds import bulk_seed_command, convert_seed, large_seeds
+from palm.plugins.dbt.seed_cache import FULL_SEED_CMD, SeedCache
+
+ENV_VARS = {'PDP_DEV_SCHEMA': 'me_my_branch', 'PALM_DBT_ENV': 'DEVELOPMENT'}
+
+
+@pytest.fixture
+def seeds(project):
+    (project / 'seeds').mkdir()
+    big = project / 'seeds' / 'events.csv'
+    big.write_text("id,amount\n" + "".join(f"{i},{i * 1.5}\n" for i in range(20000)))
+    small = project / 'seeds' / 'countries.csv'
+    small.write_text("code,name\nNL,Netherlands\n")
+    return {'events': big, 'countries': small}
+
+
+def test_convert_seed(seeds, tmp_path):
+    output_path, file_format = convert_seed(seeds['events'], tmp_path / 'out')
+    assert file_format in ('parquet', 'csv')
+    if file_format == 'csv':
+        assert gzip.decompress(output_path.read_bytes()) == seeds['events'].read_bytes()
+    assert output_path.stat().st_size < seeds['events'].stat().st_size
+
+    mtime = output_path.stat().st_mtime_ns
+    assert convert_seed(seeds['events'], tmp_path / 'out')[0] == output_path
+    assert output_path.stat().st_mtime_ns == mtime
+
+
+def test_bulk_seed_command(seeds):
+    assert large_seeds(seeds, 0.1) == ['events']
+    assert bulk_seed_command(seeds, threshold_mb=10) == FULL_SEED_CMD
+
+    cmd = bulk_seed_command(seeds, threshold_mb=0.1)
+    operation, seed_cmd = cmd.split(' && ')
+    args = json.loads(shlex.split(operation)[-1])
+    assert args['seeds'][0]['name'] == 'events'
+    assert args['seeds'][0]['path'].startswith('/app/.palm/cache/bulk_seeds/events.')
+    assert seed_cmd == f"{FULL_SEED_CMD} --exclude events"
+
+
+def test_bulk_load_macros_in_duckdb(seeds, tmp_path, render_macros):
+    duckdb = pytest.importorskip('duckdb')
+    connection = duckdb.connect()
+    macros = render_macros('palm_bulk_load_seeds.sql', connection)
+    output_path, file_format = convert_seed(seeds['events'], tmp_path / 'out')
+
+    connection.execute(
+        str(
+            macros.duckdb__palm_bulk_copy_sql(
+                'events__palm_bulk', output_path, file_format
+            )
+        )
+    )
+    connection.execute(
+        str(
+            macros.palm_bulk_cast_sql(
+                'events', 'events__palm_bulk', {'amount': 'decimal(12, 2)'}
+            )
+        )
+    )
+
+    assert connection.execute("select count(*), sum(id) from events").fetchone() == (
+        20000,
+        sum(range(20000)),
+    )
+    column_types = dict(
+        (row[0], row[1]) for row in connection.execute("describe events").fetchall()
+    )
+    assert column_types['amount'] == 'DECIMAL(12,2)'
+
+
+def test_seed_command_bulk(seeds, environment, monkeypatch):
+    spec = Plugin.get_command('seed')
+    cmd_seed = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(cmd_seed)
+    commands = []
+    monkeypatch.setattr(
+        cmd_seed,
+        'run_dbt',
+        lambda environment, cmd, env_vars: commands.append(cmd) or (True, "Success!"),
+    )
+    monkeypatch.setattr(cmd_seed, 'dbt_env_vars', lambda branch: ENV_VARS)
+
+    result = CliRunner().invoke(cmd_seed.cli, ['--bulk'], obj=environment)
+    assert result.exit_code == 0, result.output
+    assert commands == [FULL_SEED_CMD]
+    assert sorted(SeedCache('me_my_branch').loaded) == ['countries', 'events']
+
+    result = CliRunner().invoke(
+        cmd_seed.cli, ['--bulk', '--bulk-threshold', '0.1'], obj=environment
+    )
+    assert result.exit_code == 0, result.output
+    assert "Bulk loading events as " in result.output
+    assert commands[-1].startswith("dbt run-operation palm_bulk_load_seeds")
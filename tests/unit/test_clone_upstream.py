@@ -0,0 +1,158 @@
+import json
+import shlex
+import pytest
+from palm.plugins.dbt import clone_upstream
+from palm.plugins.dbt.clone_upstream import (
+    ClonedRelations,
+    clone_upstream_args,
+    clone_upstream_relations,
+    upstream_nodes,
+)
+from palm.plugins.dbt.manifest_index import load_manifest_index
+from palm.plugins.dbt.parsers import parse_manifest
+from palm.plugins.dbt.schema_state import SchemaState
+
+ENV_VARS = {'PDP_DEV_SCHEMA': 'me_my_branch', 'PALM_DBT_ENV': 'DEVELOPMENT'}
+
+
+def nodes(schema):
+    def relation(name, **node):
+        return {'database': 'memory', 'schema': schema, 'alias': name, **node}
+
+    return {
+        'source.proj.raw.orders': {},
+        'seed.proj.countries': relation('countries'),
+        'model.proj.customers': relation('customers'),
+        'model.proj.base': {
+            'depends_on': ['source.proj.raw.orders', 'model.proj.customers'],
+            'config': {'materialized': 'ephemeral'},
+        },
+        'model.proj.stg_orders': relation(
+            'stg_orders', depends_on=['model.proj.base', 'seed.proj.countries']
+        ),
+        'model.proj.orders': relation('orders', depends_on=['model.proj.stg_orders']),
+        'model.proj.report': relation(
+            'report_v2', depends_on=['model.proj.orders', 'model.proj.customers']
+        ),
+    }
+
+
+@pytest.fixture
+def project(project, write_manifest):
+    write_manifest(nodes('me_my_branch'))
+    write_manifest(nodes('prod'), project / 'prod' / 'manifest.json')
+    return project
+
+
+def test_upstream_nodes_and_prod_relations(project, tmp_path):
+    index = load_manifest_index(tmp_path / 'target' / 'manifest.json')
+    position = {unique_id: i for i, unique_id in enumerate(index.unique_ids)}
+
+    def upstream(*unique_ids):
+        selected = [position[unique_id] for unique_id in unique_ids]
+        return [index.unique_ids[i] for i in upstream_nodes(index, selected)]
+
+    assert upstream('model.proj.orders') == ['model.proj.stg_orders']
+    # Through the ephemeral model, but not to the source
+    assert upstream('model.proj.stg_orders') == [
+        'model.proj.customers',
+        'seed.proj.countries',
+    ]
+    assert upstream('model.proj.report', 'model.proj.orders') == [
+        'model.proj.customers',
+        'model.proj.stg_orders',
+    ]
+
+    prod = parse_manifest(tmp_path / 'prod' / 'manifest.json')
+    del prod.nodes['model.proj.customers']
+    selected = [position['model.proj.report'], position['model.proj.orders']]
+    relations, not_in_prod = clone_upstream_args(
+        index, upstream_nodes(index, selected), prod
+    )
+    assert relations == [
+        {
+            'unique_id': 'model.proj.stg_orders',
+            'database': 'memory',
+            'schema': 'prod',
+            'identifier': 'stg_orders',
+        }
+    ]
+    assert not_in_prod == ['model.proj.customers']
+
+
+def run_operation(render_macros, connection, cmd, graph):
+    """Run `dbt run-operation palm_clone_upstream` against DuckDB"""
+    args = json.loads(shlex.split(cmd)[-1])
+    lines = []
+    render_macros(
+        'palm_clone_upstream.sql',
+        connection,
+        execute=True,
+        graph=graph,
+        run_query=lambda sql: connection.execute(str(sql)),
+        log=lambda msg, info=False: lines.append(str(msg)),
+    ).palm_clone_upstream(args['relations'])
+    return lines
+
+
+def test_clone_upstream_in_duckdb(project, environment, render_macros, monkeypatch):
+    duckdb = pytest.importorskip('duckdb')
+    connection = duckdb.connect()
+    connection.execute("create schema prod")
+    connection.execute("create table prod.stg_orders as select * from range(3) t(id)")
+    connection.execute("create table prod.countries as select 'NL' as code")
+    connection.execute("create view prod.customers as select 1 as id")
+    connection.execute("create schema me_my_branch")
+    connection.execute("create table me_my_branch.countries as select 'BE' as code")
+    graph = {
+        'nodes': {
+            unique_id: {'name': unique_id.split('.')[-1], **node}
+            for unique_id, node in nodes('me_my_branch').items()
+        }
+    }
+    commands = []
+
+    def fake_dbt(environment, cmd, env_vars, on_line=None):
+        commands.append(cmd)
+        for line in run_operation(render_macros, connection, cmd, graph):
+            on_line(line)
+        return True, "Success!"
+
+    monkeypatch.setattr(clone_upstream, 'run_dbt', fake_dbt)
+    state = SchemaState('me_my_branch')
+    state.record({}, {'model.proj.customers': 'old-build-fingerprint'}, {})
+
+    success, msg = clone_upstream_relations(
+        environment, ENV_VARS, ['stg_orders', 'report'], []
+    )
+    assert success
+    assert commands[0].startswith("dbt run-operation palm_clone_upstream --args")
+    # countries already exists in the branch schema and is kept, orders isn't
+    # built in prod
+    assert msg.startswith("Cloned 1 of 3 upstream relations")
+    assert connection.execute(
+        "select count(*) from me_my_branch.customers"
+    ).fetchone() == (1,)
+    assert connection.execute("select code from me_my_branch.countries").fetchone() == (
+        'BE',
+    )
+
+    success, msg = clone_upstream_relations(environment, ENV_VARS, ['orders'], [])
+    assert msg.startswith("Cloned 1 of 1 upstream relations")
+    assert connection.execute(
+        "select sum(id) from me_my_branch.stg_orders"
+    ).fetchone() == (3,)
+
+    # Clones are builds from prod, not of the branch's code
+    state = SchemaState('me_my_branch')
+    assert state.builds['model.proj.customers'].startswith('clone:')
+    assert state.builds['model.proj.stg_orders'].startswith('clone:')
+    assert 'model.proj.customers' not in state.fingerprints
+
+
+def test_cloned_relations():
+    collector = ClonedRelations()
+    collector("12:00:00  Cloned prod.orders to me_my_branch.orders")
+    collector("12:00:00  PALM_CLONED_RELATION: model.proj.orders")
+    collector("12:00:01  PALM_CLONED_RELATION: seed.proj.countries")
+    assert collector.cloned == ['model.proj.orders', 'seed.proj.countries']
@@ -0,0 +1,172 @@
+import json
+import os
+import shlex
+import pytest
+from pathlib import Path
+from jinja2 import Environment
+from palm.plugins.dbt.consolidated_tests import (
+    ConsolidatedResults,
+    consolidated_test_command,
+    consolidation_plan,
+)
+from palm.plugins.dbt.parsers import parse_manifest
+
+MACRO_PATH = (
+    Path(__file__).parents[2] / 'palm/plugins/dbt/macros/palm_consolidated_tests.sql'
+)
+MODEL = 'model.proj.orders'
+
+
+def generic_test(name, column, namespace=None, model=MODEL, **config):
+    kwargs = {'column_name': column, 'model': "{{ get_where_subquery(ref('x')) }}"}
+    if name == 'accepted_values':
+        kwargs.update({'values': config.pop('values'), 'quote': config.pop('quote')})
+    return {
+        'depends_on': [model],
+        'attached_node': model,
+        'test_metadata': {'name': name, 'namespace': namespace, 'kwargs': kwargs},
+        'config': {
+            'severity': 'ERROR',
+            'where': None,
+            'limit': None,
+            'fail_calc': 'count(*)',
+            'warn_if': '!= 0',
+            'error_if': '!= 0',
+            **config,
+        },
+    }
+
+
+@pytest.fixture
+def manifest(write_manifest):
+    return parse_manifest(
+        write_manifest(
+            {
+                MODEL: [],
+                'model.proj.staging': {'config': {'materialized': 'ephemeral'}},
+                'test.proj.not_null_orders_id': generic_test('not_null', 'id'),
+                'test.proj.unique_orders_id': generic_test('unique', 'id'),
+                'test.proj.accepted_values_orders_status': generic_test(
+                    'accepted_values',
+                    'status',
+                    values=['placed', "o'hare"],
+                    quote=True,
+                    severity='warn',
+                ),
+                'test.proj.not_null_recent': generic_test(
+                    'not_null', 'amount', where="created_at > '2024-01-01'"
+                ),
+                'test.proj.unique_combination': generic_test(
+                    'unique_combination_of_columns', 'id', namespace='dbt_utils'
+                ),
+                'test.proj.not_null_staging_id': generic_test(
+                    'not_null', 'id', model='model.proj.staging'
+                ),
+                'test.proj.assert_positive': [MODEL],
+            }
+        )
+    )
+
+
+def test_consolidation_plan(manifest):
+    models, rest = consolidation_plan(
+        manifest, [uid for uid in manifest.nodes if uid.startswith('test.')]
+    )
+
+    assert list(models) == [MODEL]
+    tests = {test['unique_id']: test for test in models[MODEL]}
+    assert tests['test.proj.not_null_orders_id'] == {
+        'unique_id': 'test.proj.not_null_orders_id',
+        'type': 'not_null',
+        'column': 'id',
+        'severity': 'error',
+    }
+    assert tests['test.proj.accepted_values_orders_status']['severity'] == 'warn'
+    assert tests['test.proj.accepted_values_orders_status']['quote'] is True
+    assert 'test.proj.unique_orders_id' in tests
+    assert sorted(rest) == [
+        'test.proj.assert_positive',
+        'test.proj.not_null_recent',
+        'test.proj.not_null_staging_id',
+        'test.proj.unique_combination',
+    ]
+
+    args = json.loads(
+        shlex.split(consolidated_test_command(models, fail_fast=True))[-1]
+    )
+    assert args['fail_fast'] is True
+    assert args['models'][0]['model'] == MODEL
+
+
+def test_consolidated_results(manifest, write_run_results, tmp_path):
+    models, _ = consolidation_plan(
+        manifest,
+        [
+            'test.proj.not_null_orders_id',
+            'test.proj.unique_orders_id',
+            'test.proj.accepted_values_orders_status',
+        ],
+    )
+    results = ConsolidatedResults(models)
+    for unique_id, failures in [
+        ('test.proj.not_null_orders_id', 0),
+        ('test.proj.unique_orders_id', 3),
+        ('test.proj.accepted_values_orders_status', 2),
+    ]:
+        line = json.dumps({'unique_id': unique_id, 'failures': failures})
+        results(f"12:00:01  PALM_TEST_RESULT: {line}")
+    results("12:00:02  Unrelated output")
+
+    assert results.failed == ['test.proj.unique_orders_id']
+    assert results.missing == []
+    assert results.summary().splitlines()[0] == (
+        "Consolidated 3 tests into 1 queries: PASS=1 WARN=1 FAIL=1"
+    )
+
+    path = write_run_results(
+        {'test.proj.assert_positive': 0.5},
+        path=tmp_path / 'run_results.json',
+        which='test',
+    )
+    results.write(path, since=0)
+    artifact = json.loads(path.read_text())
+    statuses = {r['unique_id']: r['status'] for r in artifact['results']}
+    assert statuses == {
+        'test.proj.assert_positive': 'success',
+        'test.proj.not_null_orders_id': 'pass',
+        'test.proj.unique_orders_id': 'fail',
+        'test.proj.accepted_values_orders_status': 'warn',
+    }
+    assert artifact['metadata']['generated_at']
+
+    # Results of an earlier invocation are replaced, not merged
+    os.utime(path, (1, 1))
+    results.write(path, since=100)
+    assert len(json.loads(path.read_text())['results']) == 3
+
+
+def test_consolidated_tests_sql_in_duckdb(manifest):
+    duckdb = pytest.importorskip('duckdb')
+    connection = duckdb.connect()
+    connection.execute(
+        "create table orders as select * from (values "
+        "(1, 'placed'), (2, 'placed'), (2, 'o''hare'), (null, 'lost'), (3, null)"
+        ") t(id, status)"
+    )
+    models, _ = consolidation_plan(
+        manifest,
+        [
+            'test.proj.not_null_orders_id',
+            'test.proj.unique_orders_id',
+            'test.proj.accepted_values_orders_status',
+        ],
+    )
+    macros = (
+        Environment(extensions=['jinja2.ext.do'])
+        .from_string(MACRO_PATH.read_text())
+        .make_module({})
+    )
+
+    sql = str(macros.palm_consolidated_tests_sql('orders', models[MODEL]))
+    # dbt's tests: 1 null id, 1 duplicated id, 1 status not accepted (nulls pass)
+    assert connection.execute(sql).fetchone() == (1, 1, 1)
@@ -5,6 +5,7 @@ from unittest import mock
 from pathlib import Path
 import pygit2
 import shutil
+from palm.plugins.dbt import dbt_containerizer
 from palm.plugins.dbt.dbt_containerizer import DbtContainerizer
 from palm.environment import Environment
 from palm.plugin_manager import PluginManager
@@ -66,9 +67,70 @@ def test_run(tmp_path, environment):
     assert Path(tmp_path, 'Dockerfile').exists()
     assert Path(tmp_path, 'requirements.txt').exists()
     assert Path(tmp_path, 'scripts', 'entrypoint.sh').exists()
+    assert Path(tmp_path, 'scripts', 'dbt_deps.sh').exists()
+    assert Path(tmp_path, 'scripts', 'palm_entrypoint.sh').exists()
+    assert Path(tmp_path, 'scripts', 'palm_dbt_server.py').exists()
     assert Path(tmp_path, 'profiles.yml').exists()
 
 
+def test_run_generates_layered_dockerfile(tmp_path, environment, monkeypatch):
+    templates_dir = (
+        Path(__file__).parents[2] / 'palm/plugins/dbt/templates/containerize'
+    )
+    os.chdir(tmp_path)
+    Path('.env').touch()
+    Path('requirements.txt').touch()
+    ctx = MockContext(obj=environment)
+    DbtContainerizer(ctx, templates_dir).run()
+
+    dockerfile = Path(tmp_path, 'Dockerfile').read_text()
+    # Dependencies are installed before the project is copied
+    assert dockerfile.index('COPY requirements.txt') < dockerfile.index('COPY . /app/')
+    assert dockerfile.index('dbt_deps.sh') < dockerfile.index('COPY . /app/')
+    assert '--mount=type=cache,target=/root/.cache/pip' in dockerfile
+    assert 'FROM scratch' not in dockerfile
+    assert Path(tmp_path, '.dockerignore').exists()
+
+    monkeypatch.setattr(dbt_containerizer, 'get_image_env', lambda image: {})
+    DbtContainerizer(ctx, templates_dir, slim=True).run()
+    dockerfile = Path(tmp_path, 'Dockerfile').read_text()
+    assert 'FROM scratch AS runtime' in dockerfile
+    assert 'COPY --from=base /usr/local /usr/local' in dockerfile
+
+
+def test_slim_dockerfile_keeps_the_base_image_env(tmp_path, environment, monkeypatch):
+    templates_dir = (
+        Path(__file__).parents[2] / 'palm/plugins/dbt/templates/containerize'
+    )
+    os.chdir(tmp_path)
+    Path('.env').touch()
+    Path('requirements.txt').touch()
+    images = []
+    image_env = {
+        'PATH': '/usr/local/bin:/usr/bin:/bin',
+        'LANG': 'C.UTF-8',
+        'PYTHON_VERSION': '3.11.2',
+        'PYTHON_GET_PIP_URL': 'https://example.com/$get "pip"',
+    }
+    monkeypatch.setattr(
+        dbt_containerizer,
+        'get_image_env',
+        lambda image: images.append(image) or image_env,
+    )
+    ctx = MockContext(obj=environment)
+    DbtContainerizer(ctx, templates_dir, '1.2.0', slim=True).run()
+
+    assert images == ['ghcr.io/dbt-labs/dbt-core:1.2.0']
+    dockerfile = Path(tmp_path, 'Dockerfile').read_text()
+    runtime = dockerfile[dockerfile.index('FROM scratch AS runtime') :]
+    env = runtime[runtime.index('\nENV ') + 1 : runtime.index('WORKDIR')]
+    assert 'PYTHON_VERSION="3.11.2"' in env
+    assert 'PATH="/usr/local/bin:/usr/bin:/bin"' in env
+    assert 'PYTHONIOENCODING="utf-8"' in env
+    assert 'PYTHON_GET_PIP_URL="https://example.com/\\$get \\"pip\\""' in env
+    assert all(line.endswith(' \\') for line in env.strip().splitlines()[:-1])
+
+
 def test_validate_dbt_version(environment):
     templates_dir = (
         Path(__file__).parents[2] / 'palm/plugins/dbt/templates/containerize'
@@ -0,0 +1,199 @@
+import os
+import pytest
+import importlib.util
+from pathlib import Path
+from types import SimpleNamespace
+from palm.plugins.dbt import dbt_daemon, dbt_executor
+from palm.plugins.dbt.dbt_daemon import DbtDaemon
+
+
+def test_container_name():
+    daemon = DbtDaemon('my_project', 'FEATURE/DATA-100/update-widget')
+    assert daemon.container_name == 'palm_dbt_my_project_feature_data-100_update-widget'
+
+
+def test_fingerprint_changes_with_image_and_env(tmp_path, monkeypatch):
+    os.chdir(tmp_path)
+    image_id = {'id': 'sha256:a'}
+    monkeypatch.setattr(dbt_daemon, 'get_image_id', lambda _: image_id['id'])
+    Path('.env').write_text("FOO=bar\n")
+    daemon = DbtDaemon('my_project', 'my_branch')
+
+    fingerprint = daemon.fingerprint()
+    assert daemon.fingerprint() == fingerprint
+
+    Path('.env').write_text("FOO=baz\n")
+    env_changed = daemon.fingerprint()
+    assert env_changed != fingerprint
+
+    image_id['id'] = 'sha256:b'
+    assert daemon.fingerprint() not in (fingerprint, env_changed)
+
+
+def test_exec_args_inject_env_vars(tmp_path):
+    daemon = DbtDaemon('my_project', 'my_branch', tmp_path)
+    args = daemon.exec_args('dbt run', {'pdp_dev_schema': 'me_my_branch'})
+    assert args[:2] == ['docker', 'exec']
+    assert args[args.index('-e') + 1] == 'PDP_DEV_SCHEMA=me_my_branch'
+    assert args[-4:] == [daemon.container_name, '/bin/bash', '-c', 'dbt run']
+
+
+def test_exec_args_use_server_when_available(tmp_path):
+    daemon = DbtDaemon('my_project', 'my_branch', tmp_path)
+    Path(tmp_path, 'scripts').mkdir()
+    Path(tmp_path, 'scripts', 'palm_dbt_server.py').touch()
+    args = daemon.exec_args('dbt run && dbt test')
+    assert args[-4:] == [
+        'python',
+        'scripts/palm_dbt_server.py',
+        'exec',
+        'dbt run && dbt test',
+    ]
+
+
+def _load_server_module(tmp_path):
+    """The server is shipped as a template, strip the jinja raw block to import it"""
+    template = (
+        Path(__file__).parents[2]
+        / 'palm/plugins/dbt/templates/containerize/palm_dbt_server.py.txt'
+    )
+    source = template.read_text().replace('{% raw %}', '').replace('{% endraw %}', '')
+    module_path = Path(tmp_path, 'palm_dbt_server.py')
+    module_path.write_text(source)
+    spec = importlib.util.spec_from_file_location('palm_dbt_server', module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_server_client_falls_back_to_subprocess(tmp_path, monkeypatch):
+    server = _load_server_module(tmp_path)
+    monkeypatch.setattr(server, 'SOCKET_PATH', str(tmp_path / 'missing.sock'))
+    assert server.run_client('true && true') == 0
+    assert server.run_client('true && false && true') == 1
+    # && inside quotes, like in --vars or --args, doesn't chain commands
+    assert server.run_client("test 'a && b' = \"a && b\" && true") == 0
+    assert server.run_client("test 'a && b' = 'a' && true") == 1
+
+
+def test_server_client_chained_commands(tmp_path):
+    server = _load_server_module(tmp_path)
+    assert server._chained_commands("dbt seed && dbt run") == ["dbt seed ", " dbt run"]
+    assert server._chained_commands(
+        "dbt run-operation m --args '{\"a\": \"x && y; z\"}' && dbt run"
+    ) == ["dbt run-operation m --args '{\"a\": \"x && y; z\"}' ", " dbt run"]
+    assert server._chained_commands("dbt run --vars \"{a: 'b'}\"") == [
+        "dbt run --vars \"{a: 'b'}\""
+    ]
+    assert server._chained_commands("dbt run; dbt test") is None
+    assert server._chained_commands("dbt run || dbt test") is None
+    assert server._chained_commands("dbt run > out.log") is None
+    assert server._chained_commands("dbt run --vars '{a: b}") is None
+
+
+def test_server_project_fingerprint(tmp_path, monkeypatch):
+    server = _load_server_module(tmp_path)
+    os.chdir(tmp_path)
+    Path('dbt_project.yml').write_text('name: test_project\n')
+    Path('models').mkdir()
+    Path('models', 'my_model.sql').write_text('select 1')
+
+    fingerprint = server.project_fingerprint()
+    assert server.project_fingerprint() == fingerprint
+
+    Path('models', 'my_model.sql').write_text('select 1 as id')
+    changed = server.project_fingerprint()
+    assert changed != fingerprint
+
+    monkeypatch.setenv('PDP_DEV_SCHEMA', 'me_other_branch')
+    assert server.project_fingerprint() != changed
+
+
+def test_start_inspects_and_fingerprints_once(tmp_path, monkeypatch):
+    commands = []
+    image_ids = []
+
+    def fake_run_on_host(cmd, capture_output=False):
+        commands.append(cmd.split()[:3])
+        if cmd.startswith('docker inspect'):
+            return (0, 'true old-fingerprint\n', '')
+        return (0, '', '')
+
+    monkeypatch.setattr(dbt_daemon, 'run_on_host', fake_run_on_host)
+    monkeypatch.setattr(
+        dbt_daemon, 'get_image_id', lambda _: image_ids.append(1) or 'sha256:a'
+    )
+    success, msg = DbtDaemon('my_project', 'my_branch', tmp_path).start()
+    assert success
+    assert commands == [
+        ['docker', 'inspect', '--format'],
+        ['docker', 'rm', '-f'],
+        ['docker', 'compose', 'run'],
+    ]
+    assert len(image_ids) == 1
+
+
+def test_run_dbt_without_daemon_skips_fingerprint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    inspected = []
+    monkeypatch.setattr(
+        dbt_daemon,
+        'run_on_host',
+        lambda cmd, capture_output=False: inspected.append(cmd) or (1, '', 'missing'),
+    )
+    monkeypatch.setattr(
+        dbt_daemon, 'get_image_id', lambda _: pytest.fail("fingerprinted")
+    )
+    monkeypatch.setattr(dbt_executor, 'restore_packages', lambda version: None)
+    monkeypatch.setattr(
+        dbt_executor,
+        'stream_command',
+        lambda args, log_path, header=None, on_line=None: SimpleNamespace(
+            success=True, summary=lambda: "Success!"
+        ),
+    )
+    environment = SimpleNamespace(
+        palm=SimpleNamespace(image_name='proj', branch='my_branch'),
+        plugin_config=lambda name: SimpleNamespace(
+            dbt_version='1.5.2', dbt_artifacts_local=str(tmp_path / 'target')
+        ),
+    )
+    assert dbt_executor.run_dbt(environment, 'dbt run') == (True, "Success!")
+    assert len(inspected) == 1
+
+
+def test_server_manifest_follows_parse_flags(tmp_path, monkeypatch):
+    server = _load_server_module(tmp_path)
+    os.chdir(tmp_path)
+    Path('dbt_project.yml').write_text('name: test_project\n')
+    invocations = []
+
+    class FakeRunner:
+        def __init__(self, manifest=None):
+            self.manifest = manifest
+
+        def invoke(self, args):
+            invocations.append((args, self.manifest))
+            return SimpleNamespace(success=True, exception=None, result=tuple(args))
+
+    dbt_server = server.DbtServer.__new__(server.DbtServer)
+    dbt_server.runner_class = FakeRunner
+    dbt_server.manifest = None
+    dbt_server.fingerprint = None
+
+    assert server.parse_flags(['run', '--target=prod', '-s', 'a']) == [
+        '--target',
+        'prod',
+    ]
+    dbt_server.invoke(['run', '--target', 'prod'])
+    dbt_server.invoke(['test', '--target', 'prod'])
+    dbt_server.invoke(['run', '--target', 'dev'])
+    dbt_server.invoke(['run', '--project-dir', 'other'])
+    assert invocations == [
+        (['parse', '--target', 'prod'], None),
+        (['run', '--target', 'prod'], ('parse', '--target', 'prod')),
+        (['test', '--target', 'prod'], ('parse', '--target', 'prod')),
+        (['parse', '--target', 'dev'], None),
+        (['run', '--target', 'dev'], ('parse', '--target', 'dev')),
+        (['run', '--project-dir', 'other'], None),
+    ]
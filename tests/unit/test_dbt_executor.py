@@ -0,0 +1,96 @@
+import subprocess
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from palm.plugins.dbt import dbt_executor
+from palm.plugins.dbt.dbt_executor import (
+    compose_run_args,
+    line_color,
+    run_dbt_parallel,
+    stream_command,
+)
+
+
+def test_line_color():
+    assert line_color("1 of 3 OK created sql view model a [OK in 0.50s]") == "green"
+    assert line_color("2 of 3 ERROR creating sql table model b") == "red"
+    assert line_color("3 of 3 WARN 1 not_null_b_id [WARN 1 in 0.2s]") == "yellow"
+    assert line_color("Done. PASS=2 WARN=0 ERROR=1 SKIP=0 TOTAL=3") == "red"
+    assert line_color("Done. PASS=3 WARN=0 ERROR=0 SKIP=0 TOTAL=3") == "green"
+    assert line_color("Running with dbt=1.5.2") is None
+
+
+def test_stream_command_keeps_bounded_tail(tmp_path, monkeypatch):
+    monkeypatch.setattr(dbt_executor, 'TAIL_LINES', 5)
+    log_path = Path(tmp_path, 'palm_logs', 'palm_dbt.log')
+    result = stream_command(
+        ['/bin/bash', '-c', 'for i in $(seq 1 20); do echo line $i; done; exit 3'],
+        log_path,
+        header='dbt run',
+    )
+
+    assert result.exit_code == 3
+    assert not result.success
+    assert list(result.tail) == [f"line {i}" for i in range(16, 21)]
+
+    logged = log_path.read_text().splitlines()
+    assert logged[0].endswith('dbt run')
+    assert logged[1:] == [f"line {i}" for i in range(1, 21)]
+
+
+def test_stream_result_summary(tmp_path):
+    result = stream_command(
+        ['/bin/bash', '-c', 'echo "1 of 1 ERROR creating model a"; exit 1'],
+        Path(tmp_path, 'palm_dbt.log'),
+    )
+    summary = result.summary().splitlines()
+    assert summary[0] == "Fail! Palm exited with code 1"
+    assert "1 of 1 ERROR creating model a" in summary
+    assert summary[-1] == f"Full log: {Path(tmp_path, 'palm_dbt.log')}"
+
+
+def test_compose_run_args():
+    args = compose_run_args('my_project', 'dbt run', {'pdp_env': 'DEVELOPMENT'})
+    assert args[:5] == ['docker', 'compose', 'run', '--rm', '-T']
+    assert '--service-ports' not in args
+    assert 'palm_dbt_parse_state_my_project:/palm_parse_state' in args
+    assert 'PDP_ENV=DEVELOPMENT' in args
+    assert args[-4:] == ['my_project', '/bin/bash', '-c', 'dbt run']
+
+
+def test_compose_run_args_long_command(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cmd = f"printf %s {'a' * 200000} > out.txt"
+    args = compose_run_args('my_project', cmd, {})
+    assert args[-1].startswith('bash .palm/cache/commands/')
+    assert len(args[-1]) < 100
+    # The project is mounted at the same relative path in the container
+    subprocess.run(['bash', '-c', args[-1]], check=True)
+    assert (tmp_path / 'out.txt').read_text() == 'a' * 200000
+
+
+def test_run_dbt_parallel_fail_fast(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Run the commands on the host instead of in docker compose
+    monkeypatch.setattr(
+        dbt_executor, 'compose_run_args', lambda image, cmd, env: ['bash', '-c', cmd]
+    )
+    environment = SimpleNamespace(
+        palm=SimpleNamespace(image_name='proj'),
+        plugin_config=lambda name: SimpleNamespace(
+            dbt_version='1.5.2', dbt_artifacts_local=str(tmp_path / 'target')
+        ),
+    )
+
+    started = time.monotonic()
+    runs = run_dbt_parallel(
+        environment, ['echo ok', 'sleep 1; exit 1', 'sleep 30'], fail_fast=True
+    )
+    assert time.monotonic() - started < 20
+    assert [run.success for run in runs] == [True, False, False]
+    assert runs[0].target_path == 'target/palm_parallel/split_1'
+    assert list(runs[0].result.tail) == ['ok']
+    assert (tmp_path / 'target' / 'palm_logs' / 'palm_dbt_split_1.log').exists()
+
+    runs = run_dbt_parallel(environment, ['exit 1', 'echo ok'])
+    assert [run.success for run in runs] == [False, True]
@@ -0,0 +1,99 @@
+import os
+import yaml
+from pathlib import Path
+from palm.plugins.dbt import dbt_version_detection
+from palm.plugins.dbt.dbt_version_detection import (
+    _get_site_packages_path,
+    get_image_env,
+    parse_dist_info_versions,
+    resolve_dbt_versions,
+)
+
+
+def test_parse_dist_info_versions():
+    names = [
+        'site-packages',
+        'site-packages/dbt',
+        'site-packages/dbt_core-1.5.2.dist-info',
+        'site-packages/dbt_core-1.5.2.dist-info/METADATA',
+        'site-packages/dbt_snowflake-1.5.1.dist-info/RECORD',
+        'site-packages/dbt_extractor-0.4.1.dist-info',
+        'site-packages/agate-1.7.0.dist-info',
+    ]
+    assert parse_dist_info_versions(names) == {
+        'dbt-core': '1.5.2',
+        'dbt-snowflake': '1.5.1',
+        'dbt-extractor': '0.4.1',
+    }
+
+
+def test_resolve_dbt_versions_uses_cache(tmp_path, monkeypatch):
+    os.chdir(tmp_path)
+    probes = []
+
+    def probe(image_id):
+        probes.append(image_id)
+        return {'dbt-core': '1.5.2', 'dbt-snowflake': '1.5.1'}
+
+    monkeypatch.setattr(dbt_version_detection, 'get_image_id', lambda _: 'sha256:a')
+    monkeypatch.setattr(dbt_version_detection, '_read_versions_from_image', probe)
+
+    assert resolve_dbt_versions('my_image')['dbt-core'] == '1.5.2'
+    assert resolve_dbt_versions('my_image')['dbt-snowflake'] == '1.5.1'
+    assert probes == ['sha256:a']
+
+    cache = yaml.safe_load(Path('.palm/cache/dbt_versions.yaml').read_text())
+    assert 'sha256:a' in cache['images']
+    assert Path('.palm/cache/.gitignore').exists()
+
+    # A rebuilt image has a new ID, so it is inspected again
+    monkeypatch.setattr(dbt_version_detection, 'get_image_id', lambda _: 'sha256:b')
+    resolve_dbt_versions('my_image')
+    assert probes == ['sha256:a', 'sha256:b']
+
+
+def test_resolve_dbt_versions_falls_back_to_container(tmp_path, monkeypatch):
+    os.chdir(tmp_path)
+    monkeypatch.setattr(dbt_version_detection, 'get_image_id', lambda _: None)
+    monkeypatch.setattr(
+        dbt_version_detection,
+        'run_in_docker',
+        lambda *args, **kwargs: (True, "dbt-core      1.4.6\ndbt-postgres  1.4.6\n"),
+    )
+    assert resolve_dbt_versions('my_image') == {
+        'dbt-core': '1.4.6',
+        'dbt-postgres': '1.4.6',
+    }
+
+
+def test_get_image_env_pulls_missing_images(monkeypatch):
+    commands = []
+    pulled = []
+
+    def run_on_host(cmd, capture_output=False):
+        commands.append(cmd)
+        if cmd.startswith('docker pull'):
+            pulled.append(cmd)
+            return 0, '', ''
+        if not pulled:
+            return 1, '', 'No such image'
+        return 0, '["PATH=/usr/bin","PYTHON_VERSION=3.11.2","EMPTY="]\n', ''
+
+    monkeypatch.setattr(dbt_version_detection, 'run_on_host', run_on_host)
+    assert get_image_env('dbt-core:1.5.2') == {
+        'PATH': '/usr/bin',
+        'PYTHON_VERSION': '3.11.2',
+        'EMPTY': '',
+    }
+    assert pulled == ['docker pull -q dbt-core:1.5.2']
+    assert _get_site_packages_path('sha256:a') == (
+        '/usr/local/lib/python3.11/site-packages'
+    )
+
+    monkeypatch.setattr(
+        dbt_version_detection,
+        'run_on_host',
+        lambda cmd, capture_output=False: (1, '', ''),
+    )
+    assert get_image_env('dbt-core:1.5.2') == {}
+    assert _get_site_packages_path('sha256:a') is None
@@ -0,0 +1,156 @@
+import subprocess
+from pathlib import Path
+import click
+import re
+import pytest
+from palm.plugins.dbt import deps_cache
+from palm.plugins.dbt.deps_cache import (
+    DEPS_CACHE_MOUNT,
+    DepsCache,
+    clean_command,
+    deps_cache_enabled,
+    deps_key,
+    restore_packages,
+)
+
+TEMPLATES_DIR = Path(__file__).parents[2] / 'palm/plugins/dbt/templates/containerize'
+DEPS_SCRIPT = TEMPLATES_DIR / 'dbt_deps.sh.txt'
+ENTRYPOINT_SCRIPT = TEMPLATES_DIR / 'palm_entrypoint.sh.txt'
+
+
+@pytest.fixture
+def project(project):
+    with (project / 'dbt_project.yml').open('a') as dbt_project_yml:
+        dbt_project_yml.write("clean-targets: [target, dbt_packages, logs]\n")
+    (project / 'packages.yml').write_text("packages:\n  - package: a/b\n")
+    (project / 'docker-compose.yaml').write_text(
+        f"volumes:\n  - ./{DEPS_CACHE_MOUNT}:/app/dbt_packages\n"
+    )
+    return project
+
+
+def test_deps_key(project):
+    key = deps_key('1.5.2')
+    assert key.startswith('dbt-1.5.2-')
+    assert key == deps_key('1.5.2')
+    assert key != deps_key('1.6.0')
+
+    (project / 'package-lock.yml').write_text("sha1_hash: abc\n")
+    assert key != deps_key('1.5.2')
+
+
+def test_restore_switches_between_cached_packages(project):
+    cache = DepsCache()
+    assert not cache.restore('key-a')
+    (cache.active_path / 'a').mkdir()
+    cache.mark_installed('key-a')
+    assert cache.restore('key-a')
+
+    assert not cache.restore('key-b')
+    assert list(cache.active_path.iterdir()) == []
+    (cache.active_path / 'b').mkdir()
+    cache.mark_installed('key-b')
+
+    assert cache.restore('key-a')
+    assert [p.name for p in cache.active_path.iterdir()] == ['a']
+    assert cache.restore('key-b')
+    assert [p.name for p in cache.active_path.iterdir()] == ['b']
+
+
+def test_uninstalled_packages_are_not_cached(project):
+    cache = DepsCache()
+    assert not cache.restore('key-a')
+    # dbt deps failed, nothing was marked installed
+    (cache.active_path / 'partial').mkdir()
+    assert not cache.restore('key-b')
+    assert not cache.restore('key-a')
+    assert list(cache.active_path.iterdir()) == []
+
+
+def test_restore_fails_when_active_packages_survive(project, monkeypatch):
+    cache = DepsCache()
+    assert not cache.restore('key-a')
+    (cache.active_path / 'root_owned').mkdir()
+    # rmtree ignores the permission errors of files written as root
+    monkeypatch.setattr(deps_cache.shutil, 'rmtree', lambda *args, **kwargs: None)
+    with pytest.raises(click.ClickException, match=re.escape(str(cache.active_path))):
+        cache.restore('key-b')
+
+
+def test_restore_packages(project):
+    key = restore_packages('1.5.2')
+    assert key == deps_key('1.5.2')
+    DepsCache().mark_installed(key)
+    assert restore_packages('1.5.2') is None
+
+    (project / 'docker-compose.yaml').write_text("volumes:\n  - /app/dbt_packages\n")
+    assert not deps_cache_enabled()
+    assert restore_packages('1.6.0') is None
+
+
+def test_clean_command_keeps_packages(project):
+    assert clean_command() == "rm -rf target logs"
+
+
+def test_build_script_uses_the_same_key(project, tmp_path):
+    """scripts/dbt_deps.sh copies the cached packages instead of running dbt deps"""
+    script = project / 'dbt_deps.sh'
+    script.write_text(
+        DEPS_SCRIPT.read_text().replace('{{packages_dir}}', 'dbt_packages')
+    )
+    # Stand-in for dbt, echoes the command it was called with
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    (bin_dir / 'dbt').write_text("#!/bin/bash\necho dbt $@\n")
+    (bin_dir / 'dbt').chmod(0o755)
+    env = {'PATH': f"{bin_dir}:/usr/bin:/bin"}
+
+    cache = DepsCache()
+    cache.restore(deps_key('1.5.2'))
+    (cache.active_path / 'dbt_utils').mkdir()
+    cache.mark_installed(deps_key('1.5.2'))
+
+    hit = subprocess.run(
+        ['bash', str(script), '1.5.2'], capture_output=True, text=True, env=env
+    )
+    assert hit.returncode == 0, hit.stderr
+    assert 'dbt deps' not in hit.stdout
+    assert (project / 'dbt_packages' / 'dbt_utils').is_dir()
+
+    miss = subprocess.run(
+        ['bash', str(script), '1.6.0'], capture_output=True, text=True, env=env
+    )
+    assert 'dbt deps' in miss.stdout
+
+
+def test_entrypoint_fills_empty_cache_with_image_packages(project, tmp_path):
+    """Containers that don't restore packages through palm see the image's"""
+    script = project / 'dbt_deps.sh'
+    script.write_text(
+        DEPS_SCRIPT.read_text().replace('{{packages_dir}}', 'dbt_packages')
+    )
+    image_dir = tmp_path / 'image'
+    # The image build installed the packages and kept a copy
+    (project / 'dbt_packages' / 'dbt_utils').mkdir(parents=True)
+    subprocess.run(
+        ['bash', str(script), '1.5.2', str(tmp_path / 'build_cache'), str(image_dir)],
+        check=True,
+        capture_output=True,
+    )
+    assert (image_dir / 'packages' / 'dbt_utils').is_dir()
+    assert (image_dir / 'key').read_text().strip() == deps_key('1.5.2')
+
+    env = {'PALM_APP_DIR': str(project), 'PALM_IMAGE_PACKAGES': str(image_dir)}
+    entrypoint = ['bash', str(ENTRYPOINT_SCRIPT), 'echo', 'ran']
+    result = subprocess.run(entrypoint, capture_output=True, text=True, env=env)
+    assert result.stdout == "ran\n"
+    cache = DepsCache()
+    assert (cache.active_path / 'dbt_utils').is_dir()
+    assert cache.active_key == deps_key('1.5.2')
+    # palm restores the packages without dbt deps
+    assert restore_packages('1.5.2') is None
+
+    # A filled cache is left alone
+    (image_dir / 'packages' / 'other_package').mkdir()
+    subprocess.run(entrypoint, check=True, capture_output=True, env=env)
+    assert not (cache.active_path / 'other_package').exists()
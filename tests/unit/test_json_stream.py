@@ -0,0 +1,62 @@
+import io
+import json
+import pytest
+from palm.plugins.dbt.parsers import Manifest
+from palm.plugins.dbt.parsers.json_stream import JsonStreamReader
+from palm.plugins.dbt.parsers.manifest_parser import read_manifest
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1024])
+def test_reader_across_chunk_boundaries(chunk_size):
+    document = {
+        'big_number': 1234567890123,
+        'skipped': {'a': [1, 2, {'b': 'c'}], 'd': 'x' * 50},
+        'nested': {'one': {'value': 1.5}, 'two': [True, None, "é \" }"]},
+        'empty': {},
+    }
+    reader = JsonStreamReader(io.StringIO(json.dumps(document, indent=2)), chunk_size)
+
+    read = {}
+    for key in reader.items():
+        if key == 'skipped':
+            reader.skip()
+        elif key in ('nested', 'empty'):
+            read[key] = {inner: reader.value() for inner in reader.items()}
+        else:
+            read[key] = reader.value()
+
+    del document['skipped']
+    assert read == document
+    assert reader.peek() == ''
+
+
+def test_read_manifest_matches_full_parse(write_manifest):
+    manifest_path = write_manifest(
+        {
+            'source.proj.raw.orders': [],
+            'model.proj.orders': {
+                'depends_on': ['source.proj.raw.orders'],
+                'config': {'materialized': 'table'},
+                'tags': ['finance'],
+            },
+        }
+    )
+    data = json.loads(manifest_path.read_text())
+    data['macros'] = {'macro.proj.m': {'macro_sql': '{% macro m() %}{% endmacro %}'}}
+    data['parent_map'] = {'model.proj.orders': ['source.proj.raw.orders']}
+
+    streamed = read_manifest(io.StringIO(json.dumps(data)))
+    parsed = Manifest(**data)
+
+    assert streamed.dbt_version == '1.5.2'
+    assert list(streamed.nodes) == list(parsed.nodes)
+    assert (
+        streamed.parent_map
+        == parsed.parent_map
+        == {
+            'model.proj.orders': ['source.proj.raw.orders'],
+            'source.proj.raw.orders': [],
+        }
+    )
+    assert streamed.nodes['model.proj.orders'].materialized == 'table'
+    assert streamed.child_map['source.proj.raw.orders'] == ['model.proj.orders']
@@ -0,0 +1,131 @@
+import os
+import pytest
+from palm.plugins.dbt.manifest_index import (
+    ManifestIndex,
+    UnsupportedSelectorError,
+    load_manifest_index,
+    manifest_is_fresh,
+)
+from palm.plugins.dbt.parsers import parse_manifest
+
+NODES = {
+    'source.proj.raw.orders': [],
+    'model.proj.stg_orders': {
+        'depends_on': ['source.proj.raw.orders'],
+        'fqn': ['proj', 'staging', 'stg_orders'],
+        'original_file_path': 'models/staging/stg_orders.sql',
+        'tags': ['nightly'],
+        'checksum': {'checksum': 'a'},
+    },
+    'model.proj.orders': {
+        'depends_on': ['model.proj.stg_orders'],
+        'fqn': ['proj', 'finance', 'orders'],
+        'original_file_path': 'models/finance/orders.sql',
+        'tags': ['finance'],
+        'config': {'materialized': 'table'},
+        'checksum': {'checksum': 'b'},
+    },
+    'model.proj.revenue': {
+        'depends_on': ['model.proj.orders'],
+        'fqn': ['proj', 'finance', 'revenue'],
+        'original_file_path': 'models/finance/revenue.sql',
+        'tags': ['finance'],
+        'checksum': {'checksum': 'c'},
+    },
+    'test.proj.not_null_orders_id': ['model.proj.orders'],
+}
+
+
+@pytest.fixture
+def index(write_manifest):
+    return ManifestIndex(parse_manifest(write_manifest(NODES)))
+
+
+def names(index, nodes):
+    return [index.names[i] for i in nodes]
+
+
+def test_select_methods_and_graph_operators(index):
+    assert names(index, index.select(['orders'])) == [
+        'orders',
+        'not_null_orders_id',
+    ]
+    assert names(index, index.select(['tag:finance'], resource_types=['model'])) == [
+        'orders',
+        'revenue',
+    ]
+    assert names(index, index.select(['models/staging'])) == ['stg_orders']
+    assert names(index, index.select(['proj.finance.*'], ['revenue'])) == [
+        'orders',
+        'not_null_orders_id',
+    ]
+    assert names(index, index.select(['+orders'], resource_types=['model'])) == [
+        'orders',
+        'stg_orders',
+    ]
+    assert [
+        index.unique_ids[i] for i in index.select(['1+revenue', 'source:raw+1'])
+    ] == [
+        'model.proj.orders',
+        'model.proj.revenue',
+        'model.proj.stg_orders',
+        'source.proj.raw.orders',
+        'test.proj.not_null_orders_id',
+    ]
+    assert names(index, index.select(['tag:finance,config.materialized:table'])) == [
+        'orders',
+        'not_null_orders_id',
+    ]
+    assert index.select(['tag:nightly'], ['stg_orders']) == []
+    assert index.label(index.select(['source:raw'])[0]) == 'source:proj.raw.orders'
+
+
+def test_state_selection(index, write_manifest, tmp_path):
+    nodes = dict(NODES)
+    nodes['model.proj.orders'] = {**nodes['model.proj.orders'], 'checksum': {}}
+    del nodes['model.proj.revenue']
+    prod = ManifestIndex(
+        parse_manifest(write_manifest(nodes, path=tmp_path / 'prod' / 'manifest.json'))
+    )
+    selected = index.select(['state:modified'], state=prod, resource_types=['model'])
+    assert names(index, selected) == ['orders', 'revenue']
+
+    with pytest.raises(UnsupportedSelectorError):
+        index.select(['state:modified'], state=prod, strict=True)
+    with pytest.raises(UnsupportedSelectorError):
+        index.select(['test_name:not_null'])
+
+
+def test_index_cache_is_reused_until_the_manifest_changes(tmp_path, write_manifest):
+    manifest_path = write_manifest(NODES)
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    index = load_manifest_index(manifest_path, cache_dir)
+    index_path = next(cache_dir.glob('manifest_index_*.pickle'))
+    built_at = index_path.stat().st_mtime_ns
+
+    assert load_manifest_index(manifest_path, cache_dir).unique_ids == index.unique_ids
+    assert index_path.stat().st_mtime_ns == built_at
+
+    nodes = dict(NODES)
+    del nodes['model.proj.revenue']
+    write_manifest(nodes)
+    os.utime(manifest_path, ns=(built_at + 10**9, built_at + 10**9))
+    assert len(load_manifest_index(manifest_path, cache_dir)) == len(index) - 1
+
+
+def test_manifest_is_fresh(tmp_path, write_manifest):
+    (tmp_path / 'dbt_project.yml').write_text(
+        "name: proj\nversion: '1.0'\nprofile: proj\nconfig-version: 2\n"
+    )
+    (tmp_path / 'models').mkdir()
+    model = tmp_path / 'models' / 'orders.sql'
+    model.write_text("select 1")
+    manifest_path = write_manifest(NODES)
+    mtime = manifest_path.stat().st_mtime
+    for path in (tmp_path / 'dbt_project.yml', tmp_path / 'models', model):
+        os.utime(path, (mtime - 10, mtime - 10))
+    assert manifest_is_fresh(manifest_path, tmp_path)
+
+    os.utime(model, (mtime + 10, mtime + 10))
+    assert not manifest_is_fresh(manifest_path, tmp_path)
@@ -0,0 +1,87 @@
+from pathlib import Path
+import pytest
+import yaml
+from palm.plugins.dbt.model_docs import (
+    BatchSummary,
+    build_docs_index,
+    document_models,
+    model_column_names,
+    model_files,
+)
+
+ORDERS_SQL = """
+select
+    order_id,
+    customer_id,
+    amount as order_amount
+from {{ ref('stg_orders') }}
+"""
+
+
+@pytest.fixture
+def project(project):
+    with (project / 'dbt_project.yml').open('a') as dbt_project_yml:
+        dbt_project_yml.write("docs-paths: [docs]\n")
+    (project / 'docs' / 'models' / 'marts').mkdir(parents=True)
+    (project / 'docs' / 'columns').mkdir(parents=True)
+    (project / 'docs' / 'columns' / 'customer_id.md').write_text(
+        "{% docs customer_id %}"
+    )
+    marts = project / 'models' / 'marts'
+    marts.mkdir(parents=True)
+    for i in range(6):
+        (marts / f'orders_{i}.sql').write_text(ORDERS_SQL)
+    (marts / 'broken.sql').write_text("select count(*)")
+    return project
+
+
+def test_docs_index(project):
+    index = build_docs_index()
+    assert index.column_docs == {'customer_id'}
+    assert index.potential_doc_dirs(Path('models/marts/finance/orders.sql')) == [
+        Path('docs/models/marts')
+    ]
+    assert index.potential_doc_dirs(Path('models/staging/stg_orders.sql')) == []
+
+
+def test_model_column_names(project):
+    names = model_column_names(project / 'models' / 'marts' / 'orders_0.sql')
+    assert names == ['order_id', 'customer_id', 'order_amount']
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_document_models(project, workers):
+    paths = model_files(['models/marts'])
+    assert len(paths) == 7
+    summary = BatchSummary()
+    for result in document_models(paths, build_docs_index(), workers=workers):
+        summary.add(result)
+
+    assert [str(result.model_path) for result in summary.failures] == [
+        'models/marts/broken.sql'
+    ]
+    assert summary.message().startswith("Documented 6 of 7 models in ")
+    model = yaml.safe_load((project / 'models/marts/orders_3.yml').read_text())
+    assert model['models'][0]['columns'] == [
+        {'name': 'order_id', 'description': 'TODO: Add description'},
+        {'name': 'customer_id', 'description': '{{ doc("customer_id") }}'},
+        {'name': 'order_amount', 'description': 'TODO: Add description'},
+    ]
+    md = (project / 'docs/models/marts/orders_3.md').read_text()
+    assert md.startswith("{% docs orders_3 %}")
+    assert "**Grain**: TODO: Add grain" in md
+
+
+def test_document_models_keeps_existing_docs(project):
+    existing = project / 'models' / 'marts' / 'orders_0.yml'
+    existing.write_text("version: 2\n")
+    paths = [Path('models/marts/orders_0.sql')]
+
+    (result,) = document_models(paths, build_docs_index())
+    assert result.yml_path is None
+    assert result.md_path == Path('docs/models/marts/orders_0.md')
+    assert existing.read_text() == "version: 2\n"
+
+    (result,) = document_models(paths, build_docs_index(), overwrite=True)
+    assert result.yml_path == Path('models/marts/orders_0.yml')
+    assert 'order_amount' in existing.read_text()
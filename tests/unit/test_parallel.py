@@ -0,0 +1,65 @@
+import json
+from types import SimpleNamespace
+from palm.plugins.dbt import dbt_executor
+from palm.plugins.dbt.parallel import run_stages
+from palm.plugins.dbt.parsers import parse_run_results
+
+
+def _write_results(unique_id, status, exit_code=0):
+    """A stand-in for dbt: writes run_results.json to its target path"""
+    results = {
+        'metadata': {'invocation_id': unique_id},
+        'args': {'which': 'test'},
+        'results': [{'unique_id': unique_id, 'status': status, 'execution_time': 1.0}],
+    }
+    return (
+        'mkdir -p "$DBT_TARGET_PATH" && '
+        f"echo '{json.dumps(results)}' > \"$DBT_TARGET_PATH/run_results.json\"; "
+        f"exit {exit_code}"
+    )
+
+
+def test_run_stages_merges_results(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Run the commands on the host, with their env vars, instead of in docker
+    monkeypatch.setattr(
+        dbt_executor,
+        'compose_run_args',
+        lambda image, cmd, env: ['env', *(f"{k}={v}" for k, v in env.items())]
+        + ['bash', '-c', cmd],
+    )
+    environment = SimpleNamespace(
+        palm=SimpleNamespace(image_name='proj'),
+        plugin_config=lambda name: SimpleNamespace(
+            dbt_version='1.5.2', dbt_artifacts_local=str(tmp_path / 'target')
+        ),
+    )
+
+    success, msg = run_stages(
+        environment,
+        [[_write_results('test.p.a', 'pass'), _write_results('test.p.b', 'pass')]],
+        {},
+        fail_fast=True,
+        name='shard',
+    )
+    assert success
+    lines = msg.splitlines()
+    assert lines[0].startswith('shard 1/2: ') and lines[0].endswith('PASS=1')
+    assert lines[-1] == 'Success! Palm ran 2 of 2 shards'
+    merged = parse_run_results(tmp_path / 'target' / 'run_results.json')
+    assert sorted(r.unique_id for r in merged.results) == ['test.p.a', 'test.p.b']
+
+    success, msg = run_stages(
+        environment,
+        [
+            [_write_results('model.p.a', 'error', 1)],
+            [_write_results('model.p.b', 'success')],
+        ],
+        {},
+        fail_fast=False,
+        name='split',
+    )
+    assert not success
+    assert 'wave_1_split 1/1: ' in msg and 'ERROR=1' in msg
+    assert 'Skipped 1 later stage(s) after a failure' in msg
+    assert msg.splitlines()[-1] == 'Fail! Palm ran 1 of 2 splits'
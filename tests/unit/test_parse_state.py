@@ -0,0 +1,94 @@
+import subprocess
+import pytest
+from palm.plugins.dbt import parse_state
+from palm.plugins.dbt.parse_state import (
+    ParseMonitor,
+    parse_state_key,
+    parse_state_volume,
+    prune_parse_state_command,
+    with_parse_state,
+)
+
+
+@pytest.fixture
+def project(project):
+    (project / '.env').write_text("DBT_TARGET=dev\n")
+    return project
+
+
+def test_parse_state_key(project):
+    key = parse_state_key('1.5.2', {'PDP_DEV_SCHEMA': 'me_branch'})
+    assert key.startswith('dbt-1.5.2-')
+    assert key == parse_state_key('1.5.2', {'PDP_DEV_SCHEMA': 'me_branch'})
+    assert key != parse_state_key('1.5.2', {'PDP_DEV_SCHEMA': 'me_other_branch'})
+    assert key != parse_state_key('1.6.0', {'PDP_DEV_SCHEMA': 'me_branch'})
+
+    (project / '.env').write_text("DBT_TARGET=ci\n")
+    assert key != parse_state_key('1.5.2', {'PDP_DEV_SCHEMA': 'me_branch'})
+
+
+def test_with_parse_state_restores_and_saves(project, monkeypatch):
+    monkeypatch.setattr(parse_state, 'PARSE_STATE_MOUNT', str(project / 'volume'))
+    # Stand-in for dbt: checks the restored state, then writes new state
+    fake_dbt = (
+        "cat target/partial_parse.msgpack 2>/dev/null || echo none; "
+        "echo {state} > target/partial_parse.msgpack; exit {exit_code}"
+    )
+
+    def run(key, state, exit_code=0):
+        cmd = with_parse_state(fake_dbt.format(state=state, exit_code=exit_code), key)
+        return subprocess.run(['bash', '-c', cmd], capture_output=True, text=True)
+
+    first = run('key-a', 'state-1')
+    assert first.stdout.strip() == 'none'
+
+    (project / 'target' / 'partial_parse.msgpack').unlink()  # dbt clean
+    failed = run('key-a', 'state-2', exit_code=2)
+    assert failed.stdout.strip() == 'state-1'
+    assert failed.returncode == 2
+
+    assert run('key-b', 'state-3').stdout.strip() == 'state-2'
+    assert run('key-a', 'state-4').stdout.strip() == 'state-2'
+    assert (project / 'volume' / 'key-b' / 'partial_parse.msgpack').read_text() == (
+        'state-3\n'
+    )
+
+
+def test_parse_state_volume_per_project():
+    assert parse_state_volume('my_project') == 'palm_dbt_parse_state_my_project'
+    assert parse_state_volume('Org/Project') == 'palm_dbt_parse_state_org_project'
+
+
+def test_prune_parse_state(project, monkeypatch):
+    volume = project / 'volume'
+    monkeypatch.setattr(parse_state, 'PARSE_STATE_MOUNT', str(volume))
+    for key in ('old', 'recent'):
+        (volume / key).mkdir(parents=True)
+        (volume / key / 'partial_parse.msgpack').write_text(key)
+    subprocess.run(['touch', '-d', '30 days ago', str(volume / 'old')], check=True)
+    # Using the state touches its key
+    subprocess.run(['touch', '-d', '30 days ago', str(volume / 'recent')], check=True)
+    subprocess.run(['bash', '-c', with_parse_state('true', 'recent')], check=True)
+
+    subprocess.run(['bash', '-c', prune_parse_state_command(14)], check=True)
+    assert sorted(path.name for path in volume.iterdir()) == ['recent']
+
+
+def test_parse_monitor(capsys):
+    monitor = ParseMonitor()
+    for line in [
+        "12:00:00  Running with dbt=1.5.2",
+        "12:00:01  Unable to do partial parsing because saved manifest not found. "
+        "Starting full parse.",
+        "12:00:09  Found 120 models, 300 tests, 0 snapshots",
+        "12:00:10  1 of 1 OK created sql view model a",
+        "12:00:11  Running with dbt=1.5.2",
+        "12:00:12  Found 120 models, 300 tests, 0 snapshots",
+    ]:
+        monitor(line)
+
+    assert [p['miss'] for p in monitor.parses] == ['saved manifest not found', None]
+    monitor.report()
+    output = capsys.readouterr().out.splitlines()
+    assert output[0].startswith("Partial parse: miss (saved manifest not found)")
+    assert output[1].startswith("Partial parse: hit")
@@ -0,0 +1,96 @@
+from palm.plugins.dbt.manifest_index import ManifestIndex
+from palm.plugins.dbt.parsers import parse_manifest
+from palm.plugins.dbt.partitioning import (
+    balance,
+    plan_split,
+    selected_parents,
+    shard_tests,
+)
+
+
+def _index(write_manifest, nodes):
+    return ManifestIndex(parse_manifest(write_manifest(nodes)))
+
+
+def _unique_ids(index, plan):
+    return [
+        [sorted(index.unique_ids[i] for i in partition) for partition in stage]
+        for stage in plan.stages
+    ]
+
+
+def test_balance():
+    bins = balance(['a', 'b', 'c', 'd'], [5.0, 4.0, 3.0, 2.0], 2)
+    assert sorted(sorted(b) for b in bins) == [['a', 'd'], ['b', 'c']]
+    assert balance(['a'], [1.0], 3) == [['a']]
+
+
+def test_selected_parents_pass_through_unselected_nodes(write_manifest):
+    index = _index(
+        write_manifest,
+        {'model.p.a': [], 'model.p.b': ['model.p.a'], 'model.p.c': ['model.p.b']},
+    )
+    a, b, c = (index.unique_ids.index(f'model.p.{n}') for n in 'abc')
+    assert selected_parents(index, [a, c]) == {a: set(), c: {a}}
+
+
+def test_independent_components_run_at_once(write_manifest):
+    index = _index(
+        write_manifest,
+        {
+            'model.p.a1': [],
+            'model.p.a2': ['model.p.a1'],
+            'model.p.b1': [],
+            'model.p.b2': ['model.p.b1'],
+        },
+    )
+    plan = plan_split(index, index.select(), 2)
+    assert plan.strategy == 'components'
+    assert sorted(_unique_ids(index, plan)[0]) == [
+        ['model.p.a1', 'model.p.a2'],
+        ['model.p.b1', 'model.p.b2'],
+    ]
+
+
+def test_dominant_component_runs_in_waves(write_manifest):
+    # One wide component: a root, many slow independent children, one leaf
+    children = [f'model.p.mid_{i}' for i in range(8)]
+    nodes = {'model.p.root': [], 'model.p.leaf': children}
+    nodes.update({child: ['model.p.root'] for child in children})
+    index = _index(write_manifest, nodes)
+    durations = {child: 60.0 for child in children}
+
+    plan = plan_split(index, index.select(), 4, durations)
+    assert plan.strategy == 'waves'
+    stages = _unique_ids(index, plan)
+    assert stages[0] == [['model.p.root']]
+    assert len(stages[1]) == 4
+    assert all(len(partition) == 2 for partition in stages[1])
+    assert stages[2] == [['model.p.leaf']]
+
+    # Without the durations the waves are not worth their container overhead
+    assert plan_split(index, index.select(), 4).strategy == 'components'
+
+
+def test_empty_selection(write_manifest):
+    index = _index(write_manifest, {'model.p.a': []})
+    assert plan_split(index, [], 2).stages == []
+
+
+def test_shard_tests_by_duration(write_manifest):
+    tests = {f'test.p.t{i}': ['model.p.a'] for i in range(5)}
+    index = _index(write_manifest, {'model.p.a': [], **tests})
+    selected = index.select(resource_types=['test'])
+    durations = {'test.p.t0': 10.0, 'test.p.t1': 6.0, 'test.p.t2': 4.0}
+
+    shards = [
+        [index.unique_ids[i] for i in shard]
+        for shard in shard_tests(index, selected, 2, durations)
+    ]
+    # t3 and t4 have no history and count for a second each
+    assert [sum(durations.get(t, 1.0) for t in shard) for shard in shards] == [
+        11.0,
+        11.0,
+    ]
+    assert 'test.p.t0' in shards[0] and 'test.p.t1' in shards[1]
+    assert len(shard_tests(index, selected, 10)) == 5
@@ -0,0 +1,81 @@
+import pytest
+from palm.plugins.dbt.parsers import parse_manifest, parse_run_results
+from palm.plugins.dbt.perf.critical_path import CriticalPathAnalysis
+
+
+@pytest.fixture
+def analysis(write_manifest, write_run_results):
+    manifest = write_manifest(
+        {
+            'seed.proj.a': [],
+            'model.proj.b': ['seed.proj.a'],
+            'model.proj.c': ['seed.proj.a'],
+            'model.proj.d': ['model.proj.b', 'model.proj.c'],
+            'model.proj.x': ['model.proj.b'],
+            'model.proj.e': ['model.proj.x'],
+            'test.proj.t': ['model.proj.d'],
+        },
+    )
+    run_results = write_run_results(
+        {
+            'seed.proj.a': 1.0,
+            'model.proj.b': 5.0,
+            'model.proj.c': 1.0,
+            'model.proj.d': 2.0,
+            'model.proj.e': 3.0,
+            'test.proj.t': 0.5,
+        },
+        elapsed_time=9.5,
+    )
+    return CriticalPathAnalysis(
+        parse_manifest(manifest), parse_run_results(run_results)
+    )
+
+
+def test_critical_path(analysis):
+    assert analysis.length == 9.0
+    assert [n.unique_id for n in analysis.critical_path] == [
+        'seed.proj.a',
+        'model.proj.b',
+        'model.proj.e',
+    ]
+    # model.proj.x didn't run, e still waits on b
+    assert analysis.nodes['model.proj.e'].parents == ['model.proj.b']
+    assert analysis.nodes['model.proj.b'].slack == 0.0
+    assert analysis.nodes['model.proj.c'].slack == 4.5
+    assert analysis.nodes['model.proj.d'].slack == 0.5
+
+
+def test_bottlenecks(analysis):
+    bottlenecks = analysis.bottlenecks(limit=2)
+    assert [n.unique_id for n in bottlenecks] == ['model.proj.b', 'seed.proj.a']
+    assert bottlenecks[0].fan_out == 2
+    assert bottlenecks[0].downstream == 3
+
+    report = analysis.format_report()
+    assert 'critical path 9.00s' in report
+    assert '3 of 6 nodes on the critical path' in report
+
+
+def test_large_graph(write_manifest, write_run_results):
+    # Layers of 100 models, each depending on two models of the previous layer
+    nodes = {}
+    for layer in range(30):
+        for i in range(100):
+            nodes[f'model.proj.m_{layer}_{i}'] = (
+                [
+                    f'model.proj.m_{layer - 1}_{i}',
+                    f'model.proj.m_{layer - 1}_{(i + 1) % 100}',
+                ]
+                if layer
+                else []
+            )
+    analysis = CriticalPathAnalysis(
+        parse_manifest(write_manifest(nodes)),
+        parse_run_results(write_run_results({uid: 1.0 for uid in nodes})),
+    )
+    assert analysis.length == 30.0
+    assert analysis.nodes['model.proj.m_29_0'].downstream == 0
+    assert analysis.nodes['model.proj.m_28_0'].downstream == 2
+    # Each layer adds one more: 2 + 3 + ... + 30
+    assert analysis.nodes['model.proj.m_0_0'].downstream == 464
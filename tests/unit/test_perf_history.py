@@ -0,0 +1,75 @@
+import pytest
+
+from palm.plugins.dbt.parsers import parse_run_results
+from palm.plugins.dbt.perf import history as history_module
+from palm.plugins.dbt.perf.history import RunHistory
+
+
+@pytest.fixture(params=[True, False], ids=['window', 'subquery'])
+def window_functions(request, monkeypatch):
+    monkeypatch.setattr(history_module, 'WINDOW_FUNCTIONS', request.param)
+
+
+def _record(history, write_run_results, timings, invocation_id, generated_at):
+    path = write_run_results(
+        timings, invocation_id=invocation_id, generated_at=generated_at
+    )
+    return history.record(
+        parse_run_results(path), branch='my_branch', selection={'select': ['a']}
+    )
+
+
+def test_record_is_idempotent(tmp_path, write_run_results):
+    with RunHistory(tmp_path / 'history.db') as history:
+        run_id = _record(
+            history, write_run_results, {'model.p.a': 1.0}, 'inv-1', '2023-01-01'
+        )
+        assert run_id is not None
+        assert (
+            _record(
+                history, write_run_results, {'model.p.a': 1.0}, 'inv-1', '2023-01-01'
+            )
+            is None
+        )
+
+
+def test_node_history_and_regressions(tmp_path, write_run_results, window_functions):
+    with RunHistory(tmp_path / 'history.db') as history:
+        for day in range(1, 6):
+            _record(
+                history,
+                write_run_results,
+                {'model.p.steady': 2.0, 'model.p.regressed': 2.0},
+                f'inv-{day}',
+                f'2023-01-0{day}',
+            )
+        _record(
+            history,
+            write_run_results,
+            {'model.p.steady': 2.0, 'model.p.regressed': 20.0},
+            'inv-6',
+            '2023-01-06',
+        )
+
+        trend = history.node_history('regressed', limit=3)
+        assert [row['execution_time'] for row in trend] == [20.0, 2.0, 2.0]
+        assert trend[0]['branch'] == 'my_branch'
+
+        regressions = history.top_regressions(limit=5)
+        assert regressions[0]['node_id'] == 'model.p.regressed'
+        assert regressions[0]['ratio'] == 10.0
+        assert regressions[1]['ratio'] == 1.0
+
+
+def test_average_durations(tmp_path, write_run_results, window_functions):
+    with RunHistory(tmp_path / 'history.db') as history:
+        for day, timing in enumerate((2.0, 4.0, (30.0, 'error')), start=1):
+            _record(
+                history,
+                write_run_results,
+                {'model.p.a': timing, 'model.p.b': 1.0},
+                f'inv-{day}',
+                f'2023-01-0{day}',
+            )
+        assert history.average_durations() == {'model.p.a': 3.0, 'model.p.b': 1.0}
+        assert history.average_durations(['model.p.b'], window=1) == {'model.p.b': 1.0}
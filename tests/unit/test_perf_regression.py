@@ -0,0 +1,57 @@
+import pytest
+from pathlib import Path
+from palm.plugins.dbt.parsers import parse_run_results
+from palm.plugins.dbt.perf.regression import RegressionReport, resolve_baseline_path
+
+
+def test_regression_report_flags_slow_nodes(tmp_path, write_run_results):
+    baseline = write_run_results(
+        {
+            'model.proj.steady': 10.0,
+            'model.proj.slower': 2.0,
+            'model.proj.tiny': 0.1,
+            'model.proj.failed': 1.0,
+        },
+        path=tmp_path / 'prod' / 'run_results.json',
+    )
+    current = write_run_results(
+        {
+            'model.proj.steady': 14.0,
+            'model.proj.slower': 20.0,
+            'model.proj.tiny': 0.9,
+            'model.proj.failed': (30.0, 'error'),
+            'model.proj.new': 50.0,
+        }
+    )
+    report = RegressionReport(
+        parse_run_results(current), parse_run_results(baseline), max_ratio=2.0
+    )
+
+    assert [c.unique_id for c in report.comparisons] == [
+        'model.proj.slower',
+        'model.proj.steady',
+        'model.proj.tiny',
+    ]
+    assert [c.unique_id for c in report.regressions] == ['model.proj.slower']
+    assert report.regressions[0].ratio == 10.0
+    assert '1 of 3 comparable nodes regressed' in report.format_diff()
+
+    strict = RegressionReport(
+        parse_run_results(current), parse_run_results(baseline), max_increase=3.0
+    )
+    assert {c.unique_id for c in strict.regressions} == {
+        'model.proj.slower',
+        'model.proj.steady',
+    }
+
+
+def test_resolve_baseline_path(tmp_path):
+    assert resolve_baseline_path('prod', 'prod_artifacts') == Path(
+        'prod_artifacts/run_results.json'
+    )
+    assert resolve_baseline_path(str(tmp_path), None) == tmp_path / 'run_results.json'
+    assert resolve_baseline_path('old/run_results.json', None) == Path(
+        'old/run_results.json'
+    )
+    with pytest.raises(FileNotFoundError):
+        resolve_baseline_path('prod', None)
@@ -0,0 +1,50 @@
+import csv
+import json
+from pathlib import Path
+from palm.plugins.dbt.parsers import parse_run_results
+from palm.plugins.dbt.perf.report import TimingReport
+
+
+def test_timing_report_ranks_and_summarises(write_run_results):
+    path = write_run_results(
+        {
+            'model.proj.fast': 1.0,
+            'model.proj.slow': 6.0,
+            'test.proj.not_null_slow_id.abc': (1.0, 'fail'),
+        },
+        elapsed_time=4.0,
+    )
+    report = TimingReport(parse_run_results(path))
+
+    rows = report.rows()
+    assert [r['unique_id'] for r in rows][0] == 'model.proj.slow'
+    assert rows[0]['rank'] == 1
+    assert rows[0]['share_of_thread_time'] == 0.75
+    assert rows[-1]['status'] == 'fail'
+
+    summary = report.summary()
+    assert summary['thread_time'] == 8.0
+    assert summary['wall_time'] == 4.0
+    assert summary['parallelism'] == 2.0
+    assert summary['threads'] == 2
+
+    table = report.format_table(limit=1)
+    assert 'model.proj.slow' in table
+    assert 'model.proj.fast' not in table
+    assert 'parallelism 2.00x' in table
+
+
+def test_timing_report_exports(tmp_path, write_run_results):
+    path = write_run_results({'model.proj.a': 2.0, 'model.proj.b': 1.0})
+    report = TimingReport(parse_run_results(path))
+
+    report.to_json(tmp_path / 'report.json')
+    exported = json.loads(Path(tmp_path / 'report.json').read_text())
+    assert exported['summary']['nodes'] == 2
+    assert exported['nodes'][0]['unique_id'] == 'model.proj.a'
+
+    report.to_csv(tmp_path / 'report.csv', limit=1)
+    with open(tmp_path / 'report.csv') as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    assert len(rows) == 1
+    assert rows[0]['unique_id'] == 'model.proj.a'
@@ -0,0 +1,40 @@
+import json
+import subprocess
+import sys
+
+# palm imports the plugin on every invocation and every command for `palm --help`
+SCRIPT = """
+import importlib.util, json, sys
+import palm.plugins.dbt as plugin
+for name in plugin.Plugin.all_commands():
+    spec = plugin.Plugin.get_command(name)
+    spec.loader.exec_module(importlib.util.module_from_spec(spec))
+print(json.dumps({
+    'version': plugin.Plugin.version,
+    'modules': [m for m in ('pkg_resources', 'semver', 'sqlparse') if m in sys.modules],
+    'local_user_lookup': type(plugin.local_user_lookup).__name__,
+}))
+"""
+
+
+def test_palm_help_imports_no_slow_modules():
+    output = subprocess.run(
+        [sys.executable, '-c', SCRIPT], check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(output.splitlines()[-1])
+    assert result['modules'] == []
+    assert result['version'] != 'unknown'
+    # Still the function after the commands imported its submodule
+    assert result['local_user_lookup'] == 'function'
+
+
+def test_lazy_exports():
+    import palm.plugins.dbt as plugin
+    from palm.plugins.dbt.dbt_palm_utils import dbt_env_vars
+    from palm.plugins.dbt.local_user_lookup import local_user_lookup
+    from palm.plugins.dbt.sql_to_dbt import sql_to_md
+
+    assert plugin.dbt_env_vars is dbt_env_vars
+    assert plugin.sql_to_md is sql_to_md
+    assert plugin.local_user_lookup is local_user_lookup
+    assert 'palm_cache_dir' in dir(plugin)
@@ -0,0 +1,96 @@
+import os
+import pytest
+from palm.plugins.dbt import parsers
+from palm.plugins.dbt.parsers import Project, parse_project
+
+PROJECT = """
+name: proj
+version: '1.0'
+profile: proj
+config-version: 2
+model-paths: models
+on-run-end: "{{ log('done') }}"
+models:
+  +persist_docs:
+    relation: true
+  proj:
+    +materialized: view
+    +tags: base
+    staging:
+      +schema: staging
+      +meta:
+        owner: data
+      stg_orders:
+        +materialized: table
+        +tags: [orders]
+    marts:
+      materialized: table
+      enabled: true
+      meta:
+        team: finance
+"""
+
+
+def test_project_defaults():
+    project = Project(name='proj')
+    assert project.config_version == 2
+    assert project.model_paths == ['models']
+    assert project.clean_targets == ['target']
+    assert project.models == {}
+    assert project.on_run_start == []
+
+
+def test_resolved_model_config():
+    project = Project(**parsers.yaml.safe_load(PROJECT))
+    assert project.model_paths == ['models']
+    assert project.on_run_end == ["{{ log('done') }}"]
+    assert project.model_config('models/staging/stg_orders.sql') == {
+        'persist_docs': {'relation': True},
+        'materialized': 'table',
+        'tags': ['base', 'orders'],
+        'schema': 'staging',
+        'meta': {'owner': 'data'},
+    }
+    assert project.model_config('models/marts/revenue.sql') == {
+        'persist_docs': {'relation': True},
+        'materialized': 'table',
+        'tags': ['base'],
+        'enabled': True,
+        'meta': {'team': 'finance'},
+    }
+    assert project.resolved_config('models', ['other_package', 'model']) == {
+        'persist_docs': {'relation': True}
+    }
+
+
+def test_parse_project_is_cached(tmp_path, monkeypatch):
+    path = tmp_path / 'dbt_project.yml'
+    path.write_text(PROJECT)
+    loads = []
+    load = parsers.yaml.load
+    monkeypatch.setattr(
+        parsers.yaml,
+        'load',
+        lambda *args, **kwargs: loads.append(1) or load(*args, **kwargs),
+    )
+
+    project = parse_project(path)
+    assert parse_project(path) is project
+    # Touched, same content
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**10))
+    assert parse_project(path) is project
+    assert parse_project(path) is project
+    assert len(loads) == 1
+
+    # Changed within the same mtime
+    path.write_text(PROJECT.replace('proj', 'prj'))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**10))
+    changed = parse_project(path)
+    assert changed.name == 'prj'
+    assert len(loads) == 2
+
+
+def test_parse_project_missing(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        parse_project(tmp_path / 'dbt_project.yml')
@@ -0,0 +1,46 @@
+import click
+from click.testing import CliRunner
+
+from palm.plugins.dbt.parsers import parse_run_results
+from palm.plugins.dbt.run_hooks import merge_run_results, perf_options
+
+
+def test_perf_options():
+    @click.command()
+    @perf_options
+    def cli(**options):
+        click.echo(sorted(options.items()))
+
+    result = CliRunner().invoke(cli, ['--perf-baseline', 'prod', '--perf-warn-only'])
+    assert result.output.strip() == str(
+        [
+            ('perf_baseline', 'prod'),
+            ('perf_max_increase', None),
+            ('perf_max_ratio', 2.0),
+            ('perf_warn_only', True),
+        ]
+    )
+    help_text = CliRunner().invoke(cli, ['--help']).output
+    assert help_text.index('--perf-baseline') < help_text.index('--perf-warn-only')
+
+
+def test_merge_run_results(tmp_path, write_run_results):
+    first = write_run_results(
+        {'model.p.a': 1.0}, path=tmp_path / 'split_1' / 'run_results.json'
+    )
+    second = write_run_results(
+        {'model.p.b': (2.0, 'error')}, path=tmp_path / 'split_2' / 'run_results.json'
+    )
+    output = tmp_path / 'target' / 'run_results.json'
+
+    merged_path = merge_run_results(
+        [first, second, tmp_path / 'split_3' / 'run_results.json'], output, 5.0
+    )
+    assert merged_path == output
+    merged = parse_run_results(output)
+    assert [r.unique_id for r in merged.results] == ['model.p.a', 'model.p.b']
+    assert merged.elapsed_time == 5.0
+    assert merged.command == 'run'
+    assert merged.invocation_id != parse_run_results(first).invocation_id
+
+    assert merge_run_results([tmp_path / 'missing.json'], output, 1.0) is None
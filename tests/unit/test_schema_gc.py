@@ -0,0 +1,204 @@
+import json
+import shlex
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import click
+import pytest
+from palm.plugins.dbt import schema_gc
+from palm.plugins.dbt.schema_gc import (
+    BranchSchemas,
+    branch_schema_users,
+    collect_schema_garbage,
+    gc_candidates,
+    parse_age,
+)
+from palm.plugins.dbt.schema_state import SchemaState
+
+NOW = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def days_ago(days):
+    return NOW - timedelta(days=days)
+
+
+def test_parse_age():
+    assert parse_age("14d") == timedelta(days=14)
+    assert parse_age("12h") == timedelta(hours=12)
+    assert parse_age("2w") == timedelta(weeks=2)
+    with pytest.raises(click.BadParameter):
+        parse_age("14 days")
+
+
+def test_branch_schemas():
+    collector = BranchSchemas()
+    collector("12:00:00  Running with dbt=1.5.2")
+    collector("12:00:01  PALM_SCHEMA: ALICE_FEATURE 2024-02-01T10:00:00.123000-08:00")
+    collector("12:00:01  PALM_SCHEMA: BOB_FIX 2024-02-03T10:00:00")
+    collector("12:00:01  PALM_SCHEMA: CAROL_WIP ")
+    assert collector.schemas == {
+        'ALICE_FEATURE': datetime(
+            2024, 2, 1, 18, 0, 0, 123000, tzinfo=timezone.utc
+        ).astimezone(timezone(timedelta(hours=-8))),
+        'BOB_FIX': datetime(2024, 2, 3, 10, tzinfo=timezone.utc),
+        'CAROL_WIP': None,
+    }
+
+
+def test_gc_candidates():
+    schemas = {
+        'ALICE_FEATURE_LOGIN_FORM': days_ago(1),
+        'ALICE_FEATURE_LOGIN_FORM_MARTS': days_ago(1),
+        'CI_BOB_SMITH_FEATURE_LOGIN_FORM': days_ago(1),
+        # Another branch that starts with the merged branch's name
+        'ALICE_FEATURE_LOGIN_FORM_V2': days_ago(1),
+        'BOB_OLD_WORK': days_ago(30),
+        'BOB_NEW_WORK': days_ago(3),
+        'CAROL_UNKNOWN': None,
+        'ME_MY_BRANCH': days_ago(60),
+        'ME_MY_BRANCH_MARTS': days_ago(60),
+        'CI_ME_MY_BRANCH': days_ago(60),
+        # Merged branches are whole segments after a user
+        'ALICE_HOT_FIX': days_ago(1),
+        'ALICE_FIX_TYPO': days_ago(1),
+        'RAW_DATA': days_ago(1),
+        # Not branch schemas, however old
+        'RAW_EVENTS': days_ago(90),
+        'ANALYTICS': days_ago(90),
+    }
+    candidates = gc_candidates(
+        schemas,
+        timedelta(days=14),
+        merged=['feature/login-form', 'fix', 'data'],
+        customs=['marts', 'staging'],
+        users=['alice', 'bob', 'bob_smith', 'carol', 'me'],
+        keep='me_my_branch',
+        now=NOW,
+    )
+    assert candidates == {
+        'ALICE_FEATURE_LOGIN_FORM': 'branch feature/login-form is merged',
+        'ALICE_FEATURE_LOGIN_FORM_MARTS': 'branch feature/login-form is merged',
+        'CI_BOB_SMITH_FEATURE_LOGIN_FORM': 'branch feature/login-form is merged',
+        'BOB_OLD_WORK': 'unchanged for 30 days',
+    }
+
+
+def test_branch_schema_users():
+    schemas = [
+        'ALICE_FEATURE_LOGIN_FORM',
+        'ALICE_HOT_FIX',
+        'CI_BOB_SMITH_FEATURE_LOGIN_FORM',
+        'CI_BOB_SMITH_DATA_MARTS',
+        # One schema ending with a branch name doesn't make a user
+        'RAW_DATA',
+        'CAROL_FIX',
+        'DAVE_UNKNOWN_BRANCH',
+        'DAVE_OTHER_BRANCH',
+    ]
+    branches = ['feature/login-form', 'hot-fix', 'fix', 'data', 'main']
+    assert branch_schema_users(schemas, branches, ['marts'], 'Me') == {
+        'me',
+        'alice',
+        'bob_smith',
+    }
+    assert branch_schema_users(schemas, [], ['marts'], 'me') == {'me'}
+
+
+def test_drop_schemas_in_duckdb(render_macros):
+    duckdb = pytest.importorskip('duckdb')
+    connection = duckdb.connect()
+    connection.execute("attach ':memory:' as \"TEST\"")
+    schemas = [f'ME_BRANCH_{i}' for i in range(150)]
+    for schema in schemas + ['KEEP']:
+        connection.execute(f'create schema "TEST"."{schema}"')
+        connection.execute(f'create table "TEST"."{schema}".t as select 1 as id')
+    queries = []
+
+    def run_query(sql):
+        queries.append(str(sql))
+        connection.execute(str(sql))
+
+    render_macros(
+        'palm_drop_schemas.sql',
+        target=SimpleNamespace(database='TEST'),
+        run_query=run_query,
+        log=lambda msg, info=False: None,
+    ).palm_drop_schemas(schemas)
+
+    # Two requests of up to 100 drops
+    assert len(queries) == 2
+    remaining = connection.execute(
+        "select schema_name from information_schema.schemata "
+        "where catalog_name = 'TEST' and schema_name not in ('main')"
+    ).fetchall()
+    assert remaining == [('KEEP',)]
+
+
+def test_drop_schemas_snowflake_sql(render_macros):
+    macros = render_macros('palm_drop_schemas.sql')
+    sql = str(macros.snowflake__palm_drop_schemas_sql('TEST', ['A_B', 'A_B_MARTS']))
+    assert sql.split() == [
+        'execute',
+        'immediate',
+        '$$',
+        'begin',
+        *'drop schema if exists "TEST"."A_B" cascade;'.split(),
+        *'drop schema if exists "TEST"."A_B_MARTS" cascade;'.split(),
+        'end;',
+        '$$',
+    ]
+
+
+@pytest.fixture
+def environment(environment):
+    environment.run_on_host = lambda cmd, check=False, capture_output=False: (
+        (0, 'origin/main\n', '')
+        if 'symbolic-ref' in cmd
+        else (0, "refs/heads/my_branch\nrefs/remotes/origin/old-feature\n", '')
+        if '--merged' in cmd
+        else (0, BRANCH_REFS, '')
+    )
+    return environment
+
+
+BRANCH_REFS = """refs/heads/my_branch
+refs/remotes/origin/HEAD
+refs/remotes/origin/old-feature
+refs/remotes/origin/new-feature
+refs/remotes/origin/stale
+refs/remotes/origin/active
+"""
+
+
+def test_collect_schema_garbage(project, environment, monkeypatch):
+    commands = []
+    recent = datetime.now(timezone.utc).isoformat()
+
+    def fake_dbt(environment, cmd, env_vars, on_line=None):
+        commands.append(cmd)
+        if on_line:
+            on_line(f"PALM_SCHEMA: ALICE_OLD_FEATURE {recent}")
+            on_line(f"PALM_SCHEMA: ALICE_NEW_FEATURE {recent}")
+            on_line("PALM_SCHEMA: BOB_STALE 2020-01-01T00:00:00+00:00")
+            on_line(f"PALM_SCHEMA: BOB_ACTIVE {recent}")
+            on_line("PALM_SCHEMA: RAW_STALE 2020-01-01T00:00:00+00:00")
+        return True, "Success!"
+
+    monkeypatch.setattr(schema_gc, 'run_dbt', fake_dbt)
+    env_vars = {'PDP_DEV_SCHEMA': 'me_my_branch', 'PALM_DBT_ENV': 'DEVELOPMENT'}
+
+    success, msg = collect_schema_garbage(
+        environment, env_vars, timedelta(days=14), dry_run=True
+    )
+    assert success
+    assert msg == "Dry run, would drop 2 of 5 schemas"
+    assert commands == ["dbt run-operation palm_branch_schemas"]
+
+    SchemaState('bob_stale').record({'model.proj.a': 'build-1'}, {}, {})
+    success, msg = collect_schema_garbage(
+        environment, env_vars, timedelta(days=14), yes=True
+    )
+    assert msg == "Dropped 2 of 5 schemas"
+    args = json.loads(shlex.split(commands[-1])[-1])
+    assert commands[-1].startswith("dbt run-operation palm_drop_schemas --args")
+    assert args == {'schemas': ['ALICE_OLD_FEATURE', 'BOB_STALE']}
+    assert SchemaState('bob_stale').builds == {}
@@ -0,0 +1,103 @@
+import os
+import shutil
+import subprocess
+import pytest
+import shlex
+import yaml
+from palm.plugins.dbt.seed_cache import (
+    FULL_SEED_CMD,
+    SeedCache,
+    cached_seed_command,
+    invalidate_seeds,
+    record_seeds,
+    seed_hashes,
+)
+
+ENV_VARS = {'PDP_DEV_SCHEMA': 'me_my_branch'}
+
+
+@pytest.fixture
+def project(project):
+    with (project / 'dbt_project.yml').open('a') as dbt_project_yml:
+        dbt_project_yml.write("seeds:\n  proj:\n    +quote_columns: false\n")
+    (project / 'seeds').mkdir()
+    (project / 'seeds' / 'countries.csv').write_text("code,name\nNL,Netherlands\n")
+    (project / 'seeds' / 'currencies.csv').write_text("code\nEUR\n")
+    return project
+
+
+def test_seed_hashes_track_content_and_config(project):
+    hashes = seed_hashes()
+    assert sorted(hashes) == ['countries', 'currencies']
+
+    (project / 'seeds' / 'countries.csv').write_text("code,name\nBE,Belgium\n")
+    changed = seed_hashes()
+    assert changed['countries'] != hashes['countries']
+    assert changed['currencies'] == hashes['currencies']
+
+    (project / 'seeds' / 'properties.yml').write_text("version: 2\nseeds: []\n")
+    assert seed_hashes()['currencies'] != hashes['currencies']
+
+
+def test_cached_seed_command(project):
+    cmd, hashes = cached_seed_command(ENV_VARS)
+    assert cmd == FULL_SEED_CMD
+
+    record_seeds(ENV_VARS, hashes)
+    assert SeedCache('me_my_branch').unchanged(hashes) == ['countries', 'currencies']
+    assert SeedCache('other_branch').changed(hashes) == ['countries', 'currencies']
+
+    (project / 'seeds' / 'countries.csv').write_text("code,name\nBE,Belgium\n")
+    cmd, _ = cached_seed_command(ENV_VARS)
+    assert """--args '{"seeds": ["currencies"]}'""" in cmd
+    assert cached_seed_command(ENV_VARS, no_cache=True)[0] == FULL_SEED_CMD
+
+    invalidate_seeds(ENV_VARS)
+    assert cached_seed_command(ENV_VARS)[0] == FULL_SEED_CMD
+
+
+@pytest.mark.skipif(not shutil.which('bash'), reason="requires bash")
+@pytest.mark.parametrize(
+    'operation_output, operation_exit_code, selected',
+    [
+        ('12:00:00  PALM_MISSING_SEEDS: ', 0, 'countries'),
+        ('12:00:00  PALM_MISSING_SEEDS: currencies', 0, 'countries currencies'),
+        ('Compilation Error', 1, 'countries currencies'),
+    ],
+)
+def test_cached_seed_command_in_bash(
+    project, operation_output, operation_exit_code, selected
+):
+    record_seeds(ENV_VARS, seed_hashes())
+    (project / 'seeds' / 'countries.csv').write_text("code,name\nBE,Belgium\n")
+    cmd, _ = cached_seed_command(ENV_VARS)
+
+    # A fake dbt on the PATH, it echoes the seed command
+    bin_dir = project / 'bin'
+    bin_dir.mkdir()
+    fake_dbt = bin_dir / 'dbt'
+    fake_dbt.write_text(
+        "#!/bin/bash\n"
+        'if [ "$1" = "run-operation" ]; then\n'
+        f"  echo '{operation_output}'; exit {operation_exit_code}\n"
+        "fi\n"
+        'echo "$@"\n'
+    )
+    fake_dbt.chmod(0o755)
+    env = {**os.environ, 'PATH': f"{bin_dir}{os.pathsep}{os.environ['PATH']}"}
+    output = subprocess.run(
+        ['bash', '-c', cmd], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    assert output.split() == ['seed', '--full-refresh', '--select'] + selected.split()
+
+
+def test_cached_seed_command_args_are_yaml_strings(project):
+    for name in ('off', '2020'):
+        (project / 'seeds' / f'{name}.csv').write_text("code\nA\n")
+    record_seeds(ENV_VARS, seed_hashes())
+    (project / 'seeds' / 'countries.csv').write_text("code,name\nBE,Belgium\n")
+    cmd, _ = cached_seed_command(ENV_VARS)
+
+    operation = cmd[cmd.index('dbt run-operation') : cmd.index(' | sed')]
+    args = shlex.split(operation)[-1]
+    assert yaml.safe_load(args) == {'seeds': ['2020', 'currencies', 'off']}
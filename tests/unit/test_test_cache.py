@@ -0,0 +1,179 @@
+import json
+import pytest
+from palm.plugins.dbt import dbt_palm_utils, test_cache
+from palm.plugins.dbt.parsers import parse_run_results
+from palm.plugins.dbt.schema_state import (
+    SchemaState,
+    invalidate_schema_state,
+    record_invocation,
+)
+from palm.plugins.dbt.test_cache import skip_cached_tests
+
+ENV_VARS = {'PDP_DEV_SCHEMA': 'me_my_branch'}
+NOT_NULL = 'test.proj.not_null_orders_id'
+RELATIONSHIPS = 'test.proj.relationships_orders_country'
+SOURCE_TEST = 'test.proj.source_not_null_events_id'
+
+
+def nodes(compiled=None):
+    compiled = compiled or {}
+    return {
+        'model.proj.orders': {'checksum': {'checksum': 'orders-v1'}},
+        'seed.proj.countries': {'checksum': {'checksum': 'countries-v1'}},
+        'source.proj.raw.events': [],
+        NOT_NULL: {
+            'depends_on': ['model.proj.orders'],
+            'compiled_code': compiled.get(NOT_NULL),
+        },
+        RELATIONSHIPS: {
+            'depends_on': ['model.proj.orders', 'seed.proj.countries'],
+            'compiled_code': compiled.get(RELATIONSHIPS),
+        },
+        SOURCE_TEST: {
+            'depends_on': ['source.proj.raw.events'],
+            'compiled_code': compiled.get(SOURCE_TEST),
+        },
+    }
+
+
+SQL = {
+    NOT_NULL: "select * from orders where id is null",
+    RELATIONSHIPS: "select * from orders left join countries using (code)",
+    SOURCE_TEST: "select * from raw.events where id is null",
+}
+
+
+@pytest.fixture
+def project(project, write_manifest):
+    write_manifest(nodes())
+    return project
+
+
+def build(write_run_results, invocation_id, statuses):
+    timings = {unique_id: (1.0, status) for unique_id, status in statuses.items()}
+    path = write_run_results(timings, invocation_id=invocation_id, which='build')
+    artifact = json.loads(path.read_text())
+    for result in artifact['results']:
+        result['compiled_code'] = SQL.get(result['unique_id'])
+    path.write_text(json.dumps(artifact))
+    return parse_run_results(path)
+
+
+def test_test_cache(
+    project, environment, write_run_results, write_manifest, monkeypatch
+):
+    compiled = dict(SQL)
+    compiles = []
+
+    def fake_compile(environment, cmd, env_vars):
+        compiles.append(cmd)
+        write_manifest(nodes(compiled))
+        return True, "Success!"
+
+    monkeypatch.setattr(test_cache, 'run_dbt', fake_compile)
+
+    record_invocation(
+        environment,
+        ENV_VARS,
+        build(
+            write_run_results,
+            'build-1',
+            {
+                'model.proj.orders': 'success',
+                'seed.proj.countries': 'success',
+                NOT_NULL: 'pass',
+                RELATIONSHIPS: 'pass',
+                SOURCE_TEST: 'pass',
+            },
+        ),
+    )
+    state = SchemaState('me_my_branch')
+    assert state.builds['model.proj.orders'] == 'build-1'
+    # Source data changes without palm, tests reading it are never cached
+    assert sorted(state.passed_tests) == [NOT_NULL, RELATIONSHIPS]
+
+    cached, run = skip_cached_tests(environment, ENV_VARS, [], [])
+    assert sorted(cached) == [
+        'proj.not_null_orders_id',
+        'proj.relationships_orders_country',
+    ]
+    assert len(run) == 1
+    assert compiles == [
+        "dbt compile --select proj.not_null_orders_id proj.relationships_orders_country"
+    ]
+
+    compiled[RELATIONSHIPS] = "select * from orders left join countries using (id)"
+    cached, _ = skip_cached_tests(environment, ENV_VARS, [], [])
+    assert cached == ['proj.not_null_orders_id']
+
+    # A rebuild changes the inputs, the tests aren't even compiled
+    record_invocation(
+        environment,
+        ENV_VARS,
+        build(write_run_results, 'build-2', {'model.proj.orders': 'success'}),
+    )
+    compiles.clear()
+    assert skip_cached_tests(environment, ENV_VARS, [], []) == ([], [])
+    assert compiles == []
+
+    record_invocation(
+        environment, ENV_VARS, build(write_run_results, 'test-1', {NOT_NULL: 'pass'})
+    )
+    assert skip_cached_tests(environment, ENV_VARS, [], [])[0] == [
+        'proj.not_null_orders_id'
+    ]
+    record_invocation(
+        environment, ENV_VARS, build(write_run_results, 'test-2', {NOT_NULL: 'fail'})
+    )
+    assert skip_cached_tests(environment, ENV_VARS, [], [])[0] == []
+
+    record_invocation(
+        environment, ENV_VARS, build(write_run_results, 'test-3', {NOT_NULL: 'pass'})
+    )
+    invalidate_schema_state(ENV_VARS)
+    assert skip_cached_tests(environment, ENV_VARS, [], [])[0] == []
+
+
+def test_test_cache_selection_limit(
+    project, environment, write_run_results, write_manifest, monkeypatch
+):
+    compiles = []
+
+    def fake_compile(environment, cmd, env_vars):
+        compiles.append(cmd)
+        write_manifest(nodes(dict(SQL)))
+        return True, "Success!"
+
+    monkeypatch.setattr(test_cache, 'run_dbt', fake_compile)
+    statuses = {NOT_NULL: 'pass', RELATIONSHIPS: 'pass', 'model.proj.orders': 'success'}
+    record_invocation(
+        environment, ENV_VARS, build(write_run_results, 'build-1', statuses)
+    )
+    tests = skip_cached_tests(environment, ENV_VARS, [], [])
+    assert len(tests.cached) == 2
+    # Selecting the one test to run is shorter than excluding the cached ones
+    assert tests.test_selection([], []) == (tests.run, [])
+
+    # Too long to skip in one command, the compile uses the user's selection
+    monkeypatch.setattr(dbt_palm_utils, 'MAX_SELECTION_BYTES', 12)
+    monkeypatch.setattr(test_cache, 'MAX_SELECTION_BYTES', 12)
+    assert skip_cached_tests(environment, ENV_VARS, ['proj'], ['x']) == ([], [])
+    assert compiles[-1] == "dbt compile --select proj --exclude x"
+
+
+def test_record_invocation_of_a_deep_chain(
+    project, environment, write_run_results, write_manifest
+):
+    # Deeper than Python's recursion limit
+    chain = [f'model.proj.model_{i}' for i in range(3000)]
+    write_manifest({unique_id: chain[i - 1 : i] for i, unique_id in enumerate(chain)})
+    path = write_run_results(
+        {unique_id: 1.0 for unique_id in reversed(chain)}, which='build'
+    )
+    artifact = json.loads(path.read_text())
+    for result in artifact['results']:
+        result['compiled_code'] = f"select 1 as {result['unique_id'].split('.')[-1]}"
+    path.write_text(json.dumps(artifact))
+
+    record_invocation(environment, ENV_VARS, parse_run_results(path))
+    assert len(SchemaState('me_my_branch').fingerprints) == len(chain)